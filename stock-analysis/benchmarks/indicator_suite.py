@@ -0,0 +1,239 @@
+"""
+技术指标基准测试与黄金值回归检查
+
+对 utils/technical_analysis.py 中全部 calculate_*/analyze_* 函数（以及共享上下文的完整分析），
+在固定种子生成的 250、2,500、25,000 根合成日K线上计时（取多次最好成绩）并用 tracemalloc 记录峰值内存，
+输出与 benchmarks/golden/indicator_suite.json 中的黄金值比较：
+    python benchmarks/indicator_suite.py                    # 检查，有回归时退出码为1
+    python benchmarks/indicator_suite.py --update           # 重新生成黄金值（结果有意变化或换了基准机器时）
+    python benchmarks/indicator_suite.py --skip-timing      # 只检查结果（在与基准机器不同的环境中）
+
+结果数值按相对误差 --rtol 比较；耗时、峰值内存超过黄金值的 (1 + 阈值) 倍且超过绝对噪声下限时视为性能回归。
+黄金值记录了生成时是否安装 talib：与当前环境不一致时跳过数值比较（talib 的 MACD/布林带定义不同）。
+"""
+import argparse
+import functools
+import inspect
+import json
+import logging
+import math
+import platform
+import time
+import tracemalloc
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from utils import technical_analysis
+from utils.bars import Bars
+from utils.indicator_context import IndicatorContext
+from utils.kernels import HAS_NUMBA
+from utils.synthetic_market import generate_market
+from services.indicator_registry import indicator_registry
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'indicator_suite.json')
+SIZES = (250, 2500, 25000)
+SEED = 20240101
+FIRST_DATE = 1_262_304_000  # 2010-01-01 UTC
+
+# 绝对噪声下限：差值低于这些值时不算性能回归
+MIN_TIME_DELTA = 0.002   # 秒
+MIN_MEMORY_DELTA = 256   # KB
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--update', action='store_true', help='重新生成黄金值文件')
+    parser.add_argument('--golden', default=GOLDEN_PATH)
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=5, help='每个函数计时的次数（取最好成绩）')
+    parser.add_argument('--rtol', type=float, default=1e-6, help='数值比较的相对误差')
+    parser.add_argument('--time-threshold', type=float, default=0.5, help='耗时超过黄金值的比例')
+    parser.add_argument('--memory-threshold', type=float, default=0.5, help='峰值内存超过黄金值的比例')
+    parser.add_argument('--skip-timing', action='store_true', help='不检查耗时和内存')
+    return parser.parse_args()
+
+
+def make_bars(size: int) -> Bars:
+    """固定种子的合成日K线（单只股票）"""
+    market = generate_market(1, size, seed=SEED + size)
+    dates = FIRST_DATE + np.arange(size, dtype=np.int64) * 86400
+    return Bars.from_arrays(dates, market['open'][0], market['high'][0], market['low'][0],
+                            market['close'][0], market['volume'][0], symbol='BENCH')
+
+
+@functools.lru_cache(maxsize=None)
+def make_benchmarks(size: int) -> dict:
+    """与 make_bars 同日期的固定种子合成指数，墨菲市场间分析用作比较基准"""
+    market = generate_market(1, size, seed=SEED + size + 1)
+    dates = FIRST_DATE + np.arange(size, dtype=np.int64) * 86400
+    index = Bars.from_arrays(dates, market['open'][0], market['high'][0], market['low'][0],
+                             market['close'][0], market['volume'][0], symbol='INDEX', name='INDEX')
+    return {'INDEX': index}
+
+
+def benchmark_functions():
+    """{名称: fn(bars)}：technical_analysis 中全部 calculate_*/analyze_* 函数，以及共享上下文的完整分析"""
+    special = {
+        'calculate_ema': lambda bars: technical_analysis.calculate_ema(pd.Series(bars.close), 12),
+        'calculate_turnover_rate': lambda bars: technical_analysis.calculate_turnover_rate(bars, float(bars.close[-1])),
+        'analyze_murphy_intermarket': lambda bars: technical_analysis.analyze_murphy_intermarket(
+            bars, make_benchmarks(len(bars))),
+    }
+    functions = {}
+    for name, fn in inspect.getmembers(technical_analysis, inspect.isfunction):
+        if fn.__module__ != technical_analysis.__name__:
+            continue
+        if name.startswith('calculate_') or name.startswith('analyze_'):
+            functions[name] = special.get(name, fn)
+    functions['full_analysis'] = lambda bars: indicator_registry.evaluate(
+        IndicatorContext(bars), current_price=float(bars.close[-1]), benchmarks=make_benchmarks(len(bars)))
+    return functions
+
+
+def normalize(value):
+    """把结果转为可写入JSON的形式；数组和Series只保留长度、NaN个数、总和和最后3个值"""
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, (pd.Series, np.ndarray)):
+        values = np.asarray(value, dtype=np.float64)
+        return {'length': int(values.size), 'nan': int(np.isnan(values).sum()),
+                'sum': normalize(float(np.nansum(values))), 'tail': normalize(values[-3:].tolist())}
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return value if math.isfinite(value) else str(value)
+    return value
+
+
+def compare(expected, actual, rtol: float, path: str = '') -> list:
+    """返回差异描述列表"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual or key not in expected:
+                diffs.append(f"{path}/{key}: {'missing' if key not in actual else 'unexpected'}")
+            else:
+                diffs.extend(compare(expected[key], actual[key], rtol, f"{path}/{key}"))
+        return diffs
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: length {len(expected)} -> {len(actual)}"]
+        diffs = []
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            diffs.extend(compare(a, b, rtol, f"{path}[{i}]"))
+        return diffs
+    numeric = (int, float)
+    if isinstance(expected, numeric) and isinstance(actual, numeric) \
+            and not isinstance(expected, bool) and not isinstance(actual, bool):
+        if math.isclose(expected, actual, rel_tol=rtol, abs_tol=rtol):
+            return []
+    elif expected == actual:
+        return []
+    return [f"{path}: {expected!r} -> {actual!r}"]
+
+
+def measure(fn, bars: Bars, repeat: int):
+    """返回 (结果, 最好耗时秒数, 峰值内存KB)"""
+    result = fn(bars)
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(bars)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(bars)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak / 1024
+
+
+def run(sizes, repeat: int) -> dict:
+    functions = benchmark_functions()
+    results = {}
+    for size in sizes:
+        bars = make_bars(size)
+        print(f"{size} bars")
+        results[str(size)] = {}
+        for name, fn in functions.items():
+            output, seconds, peak_kb = measure(fn, bars, repeat)
+            results[str(size)][name] = {'output': normalize(output), 'seconds': seconds, 'peak_kb': round(peak_kb, 1)}
+            print(f"  {name:<32} {seconds * 1000:9.2f} ms  {peak_kb:10.1f} KB")
+    return results
+
+
+def check(golden: dict, results: dict, args) -> list:
+    failures = []
+    check_values = golden['meta'].get('has_talib') == technical_analysis.HAS_TALIB
+    if not check_values:
+        print("talib availability differs from the golden run, skipping value comparison")
+    for size, functions in results.items():
+        expected_functions = golden['results'].get(size)
+        if expected_functions is None:
+            print(f"No golden values for {size} bars, skipped")
+            continue
+        for name, current in functions.items():
+            expected = expected_functions.get(name)
+            if expected is None:
+                failures.append(f"{size}/{name}: no golden value (run with --update)")
+                continue
+            if check_values:
+                diffs = compare(expected['output'], current['output'], args.rtol)
+                failures.extend(f"{size}/{name}{diff}" for diff in diffs[:5])
+            if args.skip_timing:
+                continue
+            if current['seconds'] > expected['seconds'] * (1 + args.time_threshold) \
+                    and current['seconds'] - expected['seconds'] > MIN_TIME_DELTA:
+                failures.append(f"{size}/{name}: time {expected['seconds'] * 1000:.2f} ms -> "
+                                f"{current['seconds'] * 1000:.2f} ms")
+            if current['peak_kb'] > expected['peak_kb'] * (1 + args.memory_threshold) \
+                    and current['peak_kb'] - expected['peak_kb'] > MIN_MEMORY_DELTA:
+                failures.append(f"{size}/{name}: peak memory {expected['peak_kb']:.0f} KB -> "
+                                f"{current['peak_kb']:.0f} KB")
+    return failures
+
+
+def main():
+    args = parse_args()
+    # 指标函数出错时会记录日志并返回默认值，基准测试只关心结果本身
+    logging.disable(logging.CRITICAL)
+    results = run(args.sizes, args.repeat)
+
+    if args.update:
+        os.makedirs(os.path.dirname(args.golden), exist_ok=True)
+        golden = {
+            'meta': {'seed': SEED, 'has_talib': technical_analysis.HAS_TALIB, 'has_numba': HAS_NUMBA,
+                     'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                     'machine': platform.machine()},
+            'results': results
+        }
+        with open(args.golden, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"Golden values written to {args.golden}")
+        return 0
+
+    if not os.path.exists(args.golden):
+        print(f"Golden file not found: {args.golden} (run with --update)")
+        return 1
+    with open(args.golden, encoding='utf-8') as f:
+        golden = json.load(f)
+    failures = check(golden, results, args)
+    if failures:
+        print(f"{len(failures)} regression(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
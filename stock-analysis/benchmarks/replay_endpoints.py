@@ -0,0 +1,132 @@
+"""
+接口回放基准测试
+
+先在有网络的机器上录制一次上游响应：
+    python benchmarks/replay_endpoints.py --record
+之后在任意机器上离线回放，对 /analyze、/watchlist、/alerts/check 计时：
+    python benchmarks/replay_endpoints.py --rounds 5 --latency 0.05 --failure-rate 0.1
+
+每一轮开始前清空行情快照、历史缓存、价格缓存、分析结果缓存和数据源健康状态，并使用临时K线库，
+因此每轮都完整经过上游请求路径；相同参数下的回放结果相同。
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'stock_analysis.db')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--record', action='store_true', help='请求真实上游并录制响应')
+    parser.add_argument('--archive', default=None, help='录制目录，默认 database/replay')
+    parser.add_argument('--symbols', nargs='*', default=None, help='/analyze 的股票代码，默认使用自选股')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=None, help='回放固定延迟（秒），默认使用录制时的耗时')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+def configure_transport(args):
+    """传输层在导入服务模块时创建，必须先设置环境变量"""
+    os.environ['STOCK_DATA_TRANSPORT'] = 'record' if args.record else 'replay'
+    # 每轮都从冷启动开始计时，关闭后台缓存预热
+    os.environ['STOCK_WARMUP'] = '0'
+    if args.archive:
+        os.environ['STOCK_DATA_ARCHIVE'] = args.archive
+    if args.latency is not None:
+        os.environ['STOCK_REPLAY_LATENCY'] = str(args.latency)
+    os.environ['STOCK_REPLAY_JITTER'] = str(args.jitter)
+    os.environ['STOCK_REPLAY_FAILURE_RATE'] = str(args.failure_rate)
+    os.environ['STOCK_REPLAY_SEED'] = str(args.seed)
+
+
+def reset_state(store_dir: str):
+    """清空所有进程内缓存，回到冷启动状态"""
+    from services.async_data_service import async_data_service
+    from services.history_store import HistoryStore
+    from services.index_service import index_service
+    from services.live_indicators import live_indicators
+    from services.market_scan_service import market_scan_service
+    from services.source_health import source_health
+    from routers import stock_router, watchlist_router
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    async_data_service.sync_service.history_store = HistoryStore(store_dir)
+    async_data_service.sync_service.history_cache.clear()
+    index_service.store = HistoryStore(os.path.join(store_dir, 'index'))
+    index_service.clear()
+    async_data_service.snapshot.clear()
+    watchlist_router.price_cache.clear()
+    stock_router.analysis_cache.clear()
+    live_indicators.clear()
+    market_scan_service.clear()
+    source_health.reset()
+
+
+def run_round(client, symbols):
+    timings = {}
+
+    def timed(name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+        if response.status_code != 200:
+            print(f"  {method} {url} -> {response.status_code}")
+
+    for symbol in symbols:
+        timed('/analyze', 'POST', '/analyze', json={'symbol': symbol})
+    timed('/watchlist', 'GET', '/watchlist')
+    timed('/alerts/check', 'GET', '/alerts/check')
+    return timings
+
+
+def main():
+    args = parse_args()
+    configure_transport(args)
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+    from services.database_service import DatabaseService
+    from services.source_health import source_health
+
+    symbols = args.symbols or [item['symbol'] for item in DatabaseService().get_watchlist()]
+    rounds = 1 if args.record else args.rounds
+    store_dir = tempfile.mkdtemp(prefix='replay_history_')
+    # /alerts/check 会更新预警状态，结束后恢复数据库
+    db_backup = f"{DB_PATH}.bench"
+    shutil.copy2(DB_PATH, db_backup)
+
+    all_timings = {}
+    try:
+        with TestClient(app_module.app) as client:
+            for i in range(rounds):
+                reset_state(store_dir)
+                shutil.copy2(db_backup, DB_PATH)
+                start = time.perf_counter()
+                for name, values in run_round(client, symbols).items():
+                    all_timings.setdefault(name, []).extend(values)
+                print(f"round {i + 1}: {time.perf_counter() - start:.3f}s")
+    finally:
+        shutil.move(db_backup, DB_PATH)
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    print(f"{'endpoint':<16}{'calls':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, values in all_timings.items():
+        values = np.array(values) * 1000
+        print(f"{name:<16}{len(values):>6}{np.percentile(values, 50):>10.1f}"
+              f"{np.percentile(values, 95):>10.1f}{values.max():>10.1f}")
+    print("source health:", {name: (s['state'], s['total_calls'], s['total_failures'])
+                             for name, s in source_health.stats().items()})
+
+
+if __name__ == '__main__':
+    main()
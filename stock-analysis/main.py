@@ -4,10 +4,18 @@
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers.stock_router import router as stock_router
-from routers.watchlist_router import router as watchlist_router
+from routers.stock_router import router as stock_router, run_analysis
+from routers.watchlist_router import router as watchlist_router, get_stock_data_many_with_cache
 from routers.backtest_router import router as backtest_router
+from services.async_data_service import async_data_service
+from services.warmup_service import WarmupService
+from services.symbol_master import symbol_master
+from services.index_service import index_service
+from services.market_scan_service import market_scan_service
+from utils.kernels import warm_up as warm_up_kernels
+import asyncio
 import logging
+import os
 import uvicorn
 
 # 配置日志
@@ -39,6 +47,42 @@ async def health_check():
     """健康检查端点"""
     return {"status": "healthy", "service": "stock-analysis-api"}
 
+# 自选股缓存预热：行情写入自选股价格缓存，分析结果写入分析缓存（定时强制刷新）
+warmup_service = WarmupService(
+    data_service=async_data_service,
+    quote_loader=get_stock_data_many_with_cache,
+    analyzer=lambda symbol: run_analysis(symbol, use_cache=False)
+)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """编译指标内核，启动缓存预热、指数、全市场指标和代码表定时刷新（STOCK_WARMUP=0 时关闭，例如基准测试需要冷启动）"""
+    # 安装了numba时首次调用需要JIT编译，在接受请求之前完成
+    await asyncio.to_thread(warm_up_kernels)
+    if os.environ.get('STOCK_WARMUP', '1') != '0':
+        warmup_service.start()
+        # 大盘指数全部股票共享，关闭时在第一次分析请求时加载
+        index_service.start()
+        # 全市场指标只读取本地K线库，定时重新计算
+        market_scan_service.start()
+        # 代码表后台刷新（读取全市场行情快照），有变化时重建搜索索引；关闭时只使用本地代码表快照
+        symbol_master.start()
+
+@app.get("/warmup/status")
+async def warmup_status():
+    """缓存预热状态"""
+    return warmup_service.stats()
+
+@app.on_event("shutdown")
+async def close_data_service():
+    """停止后台任务并关闭行情HTTP连接池"""
+    await warmup_service.stop()
+    await symbol_master.stop()
+    await index_service.stop()
+    await market_scan_service.stop()
+    await async_data_service.aclose()
+
+
 # 注册路由
 app.include_router(stock_router, tags=["股票分析"])
 app.include_router(watchlist_router, tags=["自选股和预警"])
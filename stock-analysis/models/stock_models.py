@@ -10,6 +10,8 @@ class StockAnalysisRequest(BaseModel):
     """股票分析请求模型"""
     symbol: str
     period: str = "1y"
+    timeframe: str = "1d"  # 1d 日K线，1m/5m/15m/30m/60m 分钟K线
+    indicators: Optional[List[str]] = None  # 需要的指标，如 ["macd", "rsi"]，默认全部
 
 
 class BacktestRequest(BaseModel):
@@ -34,20 +36,20 @@ class WatchlistRequest(BaseModel):
 
 
 class TechnicalIndicators(BaseModel):
-    """技术指标模型"""
-    macd: Dict[str, Any]
-    kdj: Dict[str, Any]
-    rsi: Dict[str, Any]
-    boll: Dict[str, Any]
-    wr: Dict[str, Any]
-    gann: Dict[str, Any]
-    ma: Dict[str, Any]
-    volume: Dict[str, Any]
-    turnover_rate: Dict[str, Any]  # 换手率分析
-    elliott_wave: Dict[str, Any]   # 艾略特波浪理论分析
-    edwards_trend: Dict[str, Any]  # 爱德华兹趋势分析
-    murphy_intermarket: Dict[str, Any]  # 墨菲市场间分析
-    japanese_candlestick: Dict[str, Any]  # 日本蜡烛图分析
+    """技术指标模型（按请求选择计算，未计算的指标为None）"""
+    macd: Optional[Dict[str, Any]] = None
+    kdj: Optional[Dict[str, Any]] = None
+    rsi: Optional[Dict[str, Any]] = None
+    boll: Optional[Dict[str, Any]] = None
+    wr: Optional[Dict[str, Any]] = None
+    gann: Optional[Dict[str, Any]] = None
+    ma: Optional[Dict[str, Any]] = None
+    volume: Optional[Dict[str, Any]] = None
+    turnover_rate: Optional[Dict[str, Any]] = None  # 换手率分析
+    elliott_wave: Optional[Dict[str, Any]] = None   # 艾略特波浪理论分析
+    edwards_trend: Optional[Dict[str, Any]] = None  # 爱德华兹趋势分析
+    murphy_intermarket: Optional[Dict[str, Any]] = None  # 墨菲市场间分析
+    japanese_candlestick: Optional[Dict[str, Any]] = None  # 日本蜡烛图分析
 
 
 class StockAnalysisResponse(BaseModel):
@@ -7,97 +7,196 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.stock_models import StockAnalysisRequest, StockAnalysisResponse
-from services.data_service import StockDataService
+from services.async_data_service import async_data_service
 from services.analysis_service import StockAnalysisService
+from services.indicator_registry import indicator_registry
+from services.live_indicators import live_indicators
+from services.market_scan_service import market_scan_service
+from services.index_service import index_service
+from services.source_health import source_health
+from services.symbol_master import symbol_master
+from utils.bars import as_bars
+from utils.indicator_context import IndicatorContext
+from utils.resample import parse_timeframe, SESSION_MINUTES
+from utils.technical_analysis import indicator_series, SERIES_INDICATORS
+import numpy as np
+import asyncio
 import logging
+import time
+from collections import OrderedDict
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
 # 添加注释触发重新加载
 
 router = APIRouter()
-data_service = StockDataService()
+data_service = async_data_service
 analysis_service = StockAnalysisService()
 
 
+# 分析结果缓存：{(股票代码, 周期, 指标选择): (结果, 时间戳)}，指标选择为排序后的元组，全部指标为None；
+# 启动预热和定时预热写入全部指标的结果。按最近使用排序，写入时清理过期条目，超过上限时淘汰最久未使用的条目
+analysis_cache: 'OrderedDict[tuple, tuple]' = OrderedDict()
+ANALYSIS_CACHE_DURATION = 60  # 与历史行情缓存一致
+ANALYSIS_CACHE_MAX_ENTRIES = 1024
+
+
+def selection_key(indicators: Optional[List[str]]) -> Optional[tuple]:
+    """指标选择的缓存键，None 表示全部指标"""
+    return None if indicators is None else tuple(sorted(set(indicators)))
+
+
+def get_cached_analysis(symbol: str, timeframe: str = "1d", indicators: Optional[List[str]] = None):
+    """获取缓存的分析结果，缓存过期则返回None；只需部分指标时也可以从全部指标的结果中取出"""
+    keys = [(symbol, timeframe, selection_key(indicators))]
+    if indicators is not None:
+        keys.append((symbol, timeframe, None))
+    for key in keys:
+        if key in analysis_cache:
+            cached_result, timestamp = analysis_cache[key]
+            if time.time() - timestamp < ANALYSIS_CACHE_DURATION:
+                analysis_cache.move_to_end(key)
+                if key[2] is None and indicators is not None:
+                    return analysis_service.select_indicators(cached_result, indicators)
+                return cached_result
+            del analysis_cache[key]
+    return None
+
+
+def set_cached_analysis(symbol: str, timeframe: str, result: StockAnalysisResponse,
+                        indicators: Optional[List[str]] = None):
+    """设置分析结果缓存（条目数不超过 ANALYSIS_CACHE_MAX_ENTRIES）"""
+    key = (symbol, timeframe, selection_key(indicators))
+    now = time.time()
+    analysis_cache[key] = (result, now)
+    analysis_cache.move_to_end(key)
+    if len(analysis_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+        # 先清理过期条目，仍超过上限时按最近最少使用淘汰
+        expired = [cached_key for cached_key, (_, timestamp) in analysis_cache.items()
+                   if now - timestamp >= ANALYSIS_CACHE_DURATION]
+        for cached_key in expired:
+            del analysis_cache[cached_key]
+        while len(analysis_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+            analysis_cache.popitem(last=False)
+
+
+async def run_analysis(symbol: str, timeframe: str = "1d", use_cache: bool = True,
+                       indicators: Optional[List[str]] = None) -> StockAnalysisResponse:
+    """获取行情和K线并执行技术分析，timeframe 或 indicators 不合法时抛出 ValueError，
+    分钟周期没有分钟K线时抛出 LookupError（分钟周期不使用模拟数据）"""
+    minutes = parse_timeframe(timeframe)
+    if indicators is not None:
+        indicators = indicator_registry.validate(indicators)
+    if use_cache:
+        cached_result = get_cached_analysis(symbol, timeframe, indicators)
+        if cached_result is not None:
+            return cached_result
+
+    # 获取股票基本信息
+    stock_data = await data_service.get_stock_info(symbol)
+    
+    if stock_data:
+        stock_name = stock_data['name']
+        current_price = stock_data['current_price']
+        change_percent = stock_data['change_percent']
+        use_mock_data = False
+        logger.info(f"Got real data for {symbol}: {stock_name}")
+    else:
+        # 所有数据源都失败，使用模拟数据
+        logger.warning(f"All data sources failed for {symbol}, using mock data")
+        stock_name = f"模拟股票-{symbol}"
+        current_price = 100.0
+        change_percent = 0.5
+        use_mock_data = True
+    
+    # 获取历史数据
+    hist_data = None
+    
+    if not use_mock_data:
+        if minutes is None:
+            hist_data = await data_service.get_historical_bars(symbol)
+        else:
+            # 指标计算与周期无关，分钟K线直接复用同一套分析
+            hist_data = await data_service.get_intraday_bars(symbol, minutes, days=5)
+    
+    # 如果没有获取到历史数据，日K线使用模拟数据；模拟数据是日K线，不能代替分钟K线
+    if hist_data is None or hist_data.empty:
+        if minutes is not None:
+            raise LookupError(f"No intraday data for {symbol}")
+        hist_data = data_service.generate_mock_data(symbol, current_price)
+        use_mock_data = True
+    
+    # 墨菲市场间分析与指数比较：日K线使用全部股票共享的指数缓存，分钟K线和模拟数据不做比较
+    benchmarks = None
+    if not use_mock_data and minutes is None and 'murphy_intermarket' in indicator_registry.plan(indicators):
+        benchmarks = await index_service.get_benchmarks(symbol)
+
+    # 执行技术分析（纯CPU计算，放到线程中执行，不阻塞事件循环上的其他请求和预热任务）
+    analysis_result = await asyncio.to_thread(
+        analysis_service.analyze_stock,
+        symbol, stock_name, current_price, change_percent, hist_data, indicators, benchmarks
+    )
+    # 模拟数据的结果不缓存，数据源恢复后立即使用真实数据
+    if not use_mock_data:
+        set_cached_analysis(symbol, timeframe, analysis_result, indicators)
+    return analysis_result
+
+
 @router.post("/analyze", response_model=StockAnalysisResponse)
 async def analyze_stock(request: StockAnalysisRequest):
     """股票技术分析"""
     try:
         logger.info(f"Analyzing stock: {request.symbol}")
+        try:
+            parse_timeframe(request.timeframe)
+            if request.indicators is not None:
+                indicator_registry.validate(request.indicators)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # 获取股票基本信息
-        stock_data = data_service.get_stock_info(request.symbol)
-        
-        if stock_data:
-            stock_name = stock_data['name']
-            current_price = stock_data['current_price']
-            change_percent = stock_data['change_percent']
-            use_mock_data = False
-            logger.info(f"Got real data for {request.symbol}: {stock_name}")
-        else:
-            # 所有数据源都失败，使用模拟数据
-            logger.warning(f"All data sources failed for {request.symbol}, using mock data")
-            stock_name = f"模拟股票-{request.symbol}"
-            current_price = 100.0
-            change_percent = 0.5
-            use_mock_data = True
-        
-        # 获取历史数据
-        hist_data = None
-        
-        if not use_mock_data:
-            hist_data = data_service.get_historical_data(request.symbol)
-        
-        # 如果没有获取到历史数据，使用模拟数据
-        if hist_data is None or hist_data.empty:
-            hist_data = data_service.generate_mock_data(request.symbol, current_price)
-        
-        # 执行技术分析
-        analysis_result = analysis_service.analyze_stock(
-            request.symbol, stock_name, current_price, change_percent, hist_data
-        )
+        try:
+            analysis_result = await run_analysis(request.symbol, request.timeframe, indicators=request.indicators)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
         
         logger.info(f"Analysis completed for {request.symbol}")
         return analysis_result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Analysis error for {request.symbol}: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+@router.get("/analyze/indicators")
+async def list_analysis_indicators():
+    """/analyze 可选择的指标及其依赖和使用的K线字段"""
+    return {"indicators": indicator_registry.describe()}
+
+
 @router.get("/history/{symbol}")
 async def get_stock_history(symbol: str, days: int = 30):
     """获取股票历史数据"""
     try:
-        hist_data = data_service.get_historical_data(symbol, days)
+        hist_data = await data_service.get_historical_bars(symbol, days)
         
         if hist_data is None or hist_data.empty:
             # 使用模拟数据
-            stock_data = data_service.get_stock_info(symbol)
+            stock_data = await data_service.get_stock_info(symbol)
             current_price = stock_data['current_price'] if stock_data else 100.0
             hist_data = data_service.generate_mock_data(symbol, current_price, days)
         
-        # 转换为JSON格式
-        result = []
-        for _, row in hist_data.iterrows():
-            # 处理日期字段，确保正确格式化
-            date_value = row['日期']
-            if hasattr(date_value, 'strftime'):
-                # 如果是datetime对象
-                date_str = date_value.strftime('%Y-%m-%d')
-            else:
-                # 如果是字符串，直接使用
-                date_str = str(date_value)
-
-            result.append({
-                'date': date_str,
-                'open': float(row['开盘']),
-                'high': float(row['最高']),
-                'low': float(row['最低']),
-                'close': float(row['收盘']),
-                'volume': float(row['成交量'])
-            })
+        # 转换为JSON格式（按列整体转换）
+        bars = as_bars(hist_data)
+        result = [
+            {'date': date, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+            for date, open_, high, low, close, volume in zip(
+                bars.date_strings().tolist(), bars.open.tolist(), bars.high.tolist(), bars.low.tolist(),
+                bars.close.tolist(), bars.volume.astype(float).tolist()
+            )
+        ]
         
         return {
             'symbol': symbol,
@@ -109,32 +208,199 @@ async def get_stock_history(symbol: str, days: int = 30):
         raise HTTPException(status_code=500, detail=f"Failed to get history data: {str(e)}")
 
 
-@router.get("/search/{query}")
-async def search_stocks(query: str):
-    """搜索股票"""
+@router.get("/intraday/{symbol}")
+async def get_stock_intraday(symbol: str, timeframe: str = "1m", days: int = 1):
+    """获取分钟K线（1m/5m/15m/30m/60m），更高周期由1分钟K线合成"""
     try:
-        # 模拟搜索结果
-        mock_results = [
-            {'symbol': '000001', 'name': '平安银行', 'market': '深圳'},
-            {'symbol': '000002', 'name': '万科A', 'market': '深圳'},
-            {'symbol': '600036', 'name': '招商银行', 'market': '上海'},
-            {'symbol': '600519', 'name': '贵州茅台', 'market': '上海'},
-            {'symbol': '000858', 'name': '五粮液', 'market': '深圳'}
+        minutes = parse_timeframe(timeframe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if minutes is None:
+        raise HTTPException(status_code=400, detail="Use /history for daily bars")
+
+    try:
+        bars = await data_service.get_intraday_bars(symbol, minutes, days)
+        if bars is None or bars.empty:
+            raise HTTPException(status_code=404, detail=f"No intraday data for {symbol}")
+
+        result = [
+            {'date': date, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+            for date, open_, high, low, close, volume in zip(
+                bars.date_strings().tolist(), bars.open.tolist(), bars.high.tolist(), bars.low.tolist(),
+                bars.close.tolist(), bars.volume.astype(float).tolist()
+            )
         ]
-        
-        # 简单的模糊匹配
-        results = []
-        for stock in mock_results:
-            if (query.lower() in stock['symbol'].lower() or 
-                query in stock['name'] or 
-                query.lower() in stock['name'].lower()):
-                results.append(stock)
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'data': result
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Intraday data error for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get intraday data: {str(e)}")
+
+
+@router.get("/intraday/{symbol}/live")
+async def get_live_indicators(symbol: str, timeframe: str = "5m"):
+    """盘中实时指标：分钟K线增量推入流式指标，最后一根未完成的K线每次替换"""
+    try:
+        minutes = parse_timeframe(timeframe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if minutes is None:
+        raise HTTPException(status_code=400, detail="Live indicators are only available for minute timeframes")
+
+    try:
+        result = await live_indicators.get(symbol, minutes)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"No intraday data for {symbol}")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Live indicators error for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get live indicators: {str(e)}")
+
+
+# 序列接口在输出窗口之前额外获取的K线数，保证MA60等长周期指标在第一根输出K线处已有值
+SERIES_LOOKBACK_BARS = 120
+
+
+def to_column(values: np.ndarray, decimals: int = 4) -> list:
+    """数组转换为JSON列，NaN/inf 输出为 null"""
+    column = np.round(np.asarray(values, dtype=np.float64), decimals).astype(object)
+    column[~np.isfinite(np.asarray(values, dtype=np.float64))] = None
+    return column.tolist()
+
+
+@router.get("/indicators/{symbol}/series")
+async def get_indicator_series(symbol: str, timeframe: str = "1d", limit: int = 120, indicators: str = None):
+    """获取K线和指标完整序列（列式输出，图表一次请求即可绘制）
+
+    indicators 为逗号分隔的 macd/kdj/rsi/boll/wr/ma/sar/zigzag/trend，默认全部。
+    """
+    try:
+        minutes = parse_timeframe(timeframe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    names = [name.strip() for name in indicators.split(',') if name.strip()] if indicators else None
+    unknown = [name for name in names or [] if name not in SERIES_INDICATORS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unsupported indicators: {', '.join(unknown)}")
+    limit = max(1, min(limit, 1000))
+
+    try:
+        bars_needed = limit + SERIES_LOOKBACK_BARS
+        if minutes is None:
+            # 自然日换算：约 250 个交易日 / 365 天
+            hist_data = await data_service.get_historical_bars(symbol, int(bars_needed * 365 / 250) + 10)
+            if hist_data is None or hist_data.empty:
+                stock_data = await data_service.get_stock_info(symbol)
+                current_price = stock_data['current_price'] if stock_data else 100.0
+                hist_data = data_service.generate_mock_data(symbol, current_price, bars_needed)
+        else:
+            bars_per_day = SESSION_MINUTES // minutes
+            days = min(-(-bars_needed // bars_per_day), data_service.sync_service.INTRADAY_RETENTION_DAYS)
+            hist_data = await data_service.get_intraday_bars(symbol, minutes, days)
+            if hist_data is None or hist_data.empty:
+                raise HTTPException(status_code=404, detail=f"No intraday data for {symbol}")
+
+        bars = as_bars(hist_data)
+        # 在完整区间上计算，只输出最后 limit 根
+        series = indicator_series(IndicatorContext(bars), names)
+        window = slice(max(len(bars) - limit, 0), None)
+
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'dates': bars.date_strings()[window].tolist(),
+            'bars': {
+                'open': to_column(bars.open[window]),
+                'high': to_column(bars.high[window]),
+                'low': to_column(bars.low[window]),
+                'close': to_column(bars.close[window]),
+                'volume': bars.volume[window].tolist()
+            },
+            'indicators': {
+                name: {line: to_column(values[window]) for line, values in lines.items()}
+                for name, lines in series.items()
+            }
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Indicator series error for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get indicator series: {str(e)}")
+
+
+@router.get("/search/{query}")
+async def search_stocks(query: str, limit: int = 10):
+    """搜索股票（代码、拼音首字母或名称，按匹配程度排序）"""
+    try:
+        results = symbol_master.search(query, min(limit, 50))
         
         return {
             'query': query,
-            'results': results[:10]  # 限制返回10个结果
+            'results': [
+                {'symbol': item['symbol'], 'name': item['name'], 'market': item['market']}
+                for item in results
+            ]
         }
         
     except Exception as e:
         logger.error(f"Search error for {query}: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+@router.get("/search/index/stats")
+async def get_search_index_stats():
+    """获取代码表索引状态"""
+    return symbol_master.stats()
+
+
+@router.get("/sources/health")
+async def get_sources_health():
+    """获取各数据源的健康状态（延迟、错误率、熔断状态）"""
+    try:
+        stats = source_health.stats()
+        return {
+            'sources': stats,
+            'quote_fallback_order': source_health.order(data_service.sync_service.FALLBACK_QUOTE_SOURCES),
+            'history_order': source_health.order(data_service.sync_service.HISTORY_SOURCES)
+        }
+
+    except Exception as e:
+        logger.error(f"Get sources health error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get sources health: {str(e)}")
+
+
+@router.get("/market/scan")
+async def get_market_scan(refresh: bool = False):
+    """全市场指标、信号和蜡烛图形态（本地K线库中的全部股票一次向量化计算，后台定时刷新；refresh=true 时立即重新计算）"""
+    try:
+        return await market_scan_service.get(refresh)
+    except Exception as e:
+        logger.error(f"Market scan error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to scan market: {str(e)}")
+
+
+@router.get("/market/scan/stats")
+async def get_market_scan_stats():
+    """全市场扫描任务状态"""
+    return market_scan_service.stats()
+
+
+@router.get("/history/cache/stats")
+async def get_history_cache_stats():
+    """获取历史行情内存缓存统计（命中率、占用内存、淘汰次数）"""
+    try:
+        return data_service.sync_service.history_cache.stats()
+
+    except Exception as e:
+        logger.error(f"Get history cache stats error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get history cache stats: {str(e)}")
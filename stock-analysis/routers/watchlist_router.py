@@ -7,18 +7,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.stock_models import WatchlistRequest, AlertRequest, WatchlistItem, AlertRule
-from services.data_service import StockDataService
+from services.async_data_service import async_data_service
 from services.database_service import DatabaseService
 from datetime import datetime
 import logging
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-data_service = StockDataService()
+data_service = async_data_service
 db_service = DatabaseService()
 
 # 简单的内存缓存，缓存股票价格数据
@@ -37,7 +35,7 @@ def set_cached_stock_data(symbol: str, data: dict):
     """设置股票数据缓存"""
     price_cache[symbol] = (data, time.time())
 
-def get_stock_data_with_cache(symbol: str):
+async def get_stock_data_with_cache(symbol: str):
     """带缓存的股票数据获取"""
     # 先尝试从缓存获取
     cached_data = get_cached_stock_data(symbol)
@@ -45,11 +43,29 @@ def get_stock_data_with_cache(symbol: str):
         return cached_data
 
     # 缓存未命中，从API获取
-    stock_data = data_service.get_stock_info(symbol)
+    stock_data = await data_service.get_stock_info(symbol)
     if stock_data:
         set_cached_stock_data(symbol, stock_data)
     return stock_data
 
+async def get_stock_data_many_with_cache(symbols):
+    """带缓存的批量股票数据获取，缓存未命中的股票合并为批量请求"""
+    results = {}
+    missing = []
+    for symbol in symbols:
+        cached_data = get_cached_stock_data(symbol)
+        if cached_data:
+            results[symbol] = cached_data
+        else:
+            missing.append(symbol)
+
+    if missing:
+        fetched = await data_service.get_stock_info_many(missing)
+        for symbol, stock_data in fetched.items():
+            set_cached_stock_data(symbol, stock_data)
+        results.update(fetched)
+    return results
+
 # 现在使用SQLite数据库存储自选股和预警数据
 
 
@@ -65,48 +81,30 @@ async def get_watchlist():
         if not watchlist_items:
             return {'watchlist': []}
 
-        # 使用线程池并发获取股票数据
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # 创建并发任务
-            future_to_item = {
-                executor.submit(get_stock_data_with_cache, item['symbol']): item
-                for item in watchlist_items
-            }
+        # 批量获取股票数据（缓存未命中的股票合并为多股票请求）
+        stock_data_map = await get_stock_data_many_with_cache([item['symbol'] for item in watchlist_items])
 
-            updated_watchlist = []
-            for future in future_to_item:
-                item = future_to_item[future]
-                try:
-                    stock_data = future.result(timeout=5)  # 5秒超时
-                    if stock_data:
-                        updated_item = {
-                            'symbol': item['symbol'],
-                            'name': stock_data['name'],
-                            'price': stock_data['current_price'],
-                            'change': stock_data['change_percent'],
-                            'added_at': item['added_at']
-                        }
-                    else:
-                        # 如果无法获取实时数据，使用数据库中的名称
-                        updated_item = {
-                            'symbol': item['symbol'],
-                            'name': item['name'],
-                            'price': 0.0,
-                            'change': 0.0,
-                            'added_at': item['added_at']
-                        }
-                    updated_watchlist.append(updated_item)
-                except Exception as e:
-                    logger.warning(f"Failed to get data for {item['symbol']}: {e}")
-                    # 使用默认数据
-                    updated_item = {
-                        'symbol': item['symbol'],
-                        'name': item['name'],
-                        'price': 0.0,
-                        'change': 0.0,
-                        'added_at': item['added_at']
-                    }
-                    updated_watchlist.append(updated_item)
+        updated_watchlist = []
+        for item in watchlist_items:
+            stock_data = stock_data_map.get(item['symbol'])
+            if stock_data:
+                updated_item = {
+                    'symbol': item['symbol'],
+                    'name': stock_data['name'],
+                    'price': stock_data['current_price'],
+                    'change': stock_data['change_percent'],
+                    'added_at': item['added_at']
+                }
+            else:
+                # 如果无法获取实时数据，使用数据库中的名称
+                updated_item = {
+                    'symbol': item['symbol'],
+                    'name': item['name'],
+                    'price': 0.0,
+                    'change': 0.0,
+                    'added_at': item['added_at']
+                }
+            updated_watchlist.append(updated_item)
 
         # 按添加时间排序（最新添加的在前）
         updated_watchlist.sort(key=lambda x: x['added_at'], reverse=True)
@@ -165,37 +163,25 @@ async def get_watchlist_prices():
         if not watchlist_items:
             return {'prices': {}}
 
-        # 使用线程池并发获取价格数据
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_symbol = {
-                executor.submit(get_stock_data_with_cache, item['symbol']): item['symbol']
-                for item in watchlist_items
-            }
+        # 批量获取价格数据
+        symbols = [item['symbol'] for item in watchlist_items]
+        stock_data_map = await get_stock_data_many_with_cache(symbols)
 
-            prices = {}
-            for future in future_to_symbol:
-                symbol = future_to_symbol[future]
-                try:
-                    stock_data = future.result(timeout=3)  # 3秒超时
-                    if stock_data:
-                        prices[symbol] = {
-                            'price': stock_data['current_price'],
-                            'change': stock_data['change_percent'],
-                            'name': stock_data['name']
-                        }
-                    else:
-                        prices[symbol] = {
-                            'price': 0.0,
-                            'change': 0.0,
-                            'name': symbol
-                        }
-                except Exception as e:
-                    logger.warning(f"Failed to get price for {symbol}: {e}")
-                    prices[symbol] = {
-                        'price': 0.0,
-                        'change': 0.0,
-                        'name': symbol
-                    }
+        prices = {}
+        for symbol in symbols:
+            stock_data = stock_data_map.get(symbol)
+            if stock_data:
+                prices[symbol] = {
+                    'price': stock_data['current_price'],
+                    'change': stock_data['change_percent'],
+                    'name': stock_data['name']
+                }
+            else:
+                prices[symbol] = {
+                    'price': 0.0,
+                    'change': 0.0,
+                    'name': symbol
+                }
 
         end_time = time.time()
         logger.info(f"Batch price query completed in {end_time - start_time:.2f} seconds")
@@ -263,7 +249,7 @@ async def add_to_watchlist(symbol: str, name: str = None):
             raise HTTPException(status_code=400, detail="Stock already in watchlist")
 
         # 获取股票信息
-        stock_data = data_service.get_stock_info(symbol)
+        stock_data = await data_service.get_stock_info(symbol)
         if stock_data:
             stock_name = stock_data['name']
         else:
@@ -311,10 +297,13 @@ async def get_alerts():
         # 从数据库获取预警列表
         alerts = db_service.get_alerts()
 
+        # 批量获取预警股票的当前价格
+        stock_data_map = await data_service.get_stock_info_many([alert['symbol'] for alert in alerts])
+
         # 更新预警的当前价格
         updated_alerts = []
         for alert in alerts:
-            stock_data = data_service.get_stock_info(alert['symbol'])
+            stock_data = stock_data_map.get(alert['symbol'])
             if stock_data:
                 alert['current_price'] = stock_data['current_price']
                 alert['name'] = stock_data['name']
@@ -334,7 +323,7 @@ async def create_alert(request: AlertRequest):
     """创建价格预警"""
     try:
         # 获取股票信息
-        stock_data = data_service.get_stock_info(request.symbol)
+        stock_data = await data_service.get_stock_info(request.symbol)
         if stock_data:
             stock_name = stock_data['name']
         else:
@@ -389,9 +378,12 @@ async def check_alerts():
         alerts = db_service.get_alerts()
         active_alerts = [alert for alert in alerts if alert['status'] == 'active']
 
+        # 批量获取当前价格
+        stock_data_map = await data_service.get_stock_info_many([alert['symbol'] for alert in active_alerts])
+
         for alert in active_alerts:
             # 获取当前价格
-            stock_data = data_service.get_stock_info(alert['symbol'])
+            stock_data = stock_data_map.get(alert['symbol'])
             if not stock_data:
                 continue
 
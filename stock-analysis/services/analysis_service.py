@@ -2,22 +2,33 @@
 股票分析服务
 """
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Union
 import logging
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.stock_models import TechnicalIndicators, StockAnalysisResponse
-from utils.technical_analysis import (
-    calculate_macd, calculate_kdj, calculate_rsi, calculate_bollinger_bands,
-    calculate_williams_r, calculate_gann_lines, calculate_moving_averages,
-    calculate_volume_analysis, calculate_turnover_rate, calculate_elliott_wave,
-    analyze_edwards_trend, analyze_murphy_intermarket, analyze_japanese_candlestick
-)
+from utils.bars import Bars, as_bars
+from utils.indicator_context import IndicatorContext
+from services.indicator_registry import indicator_registry
 
 logger = logging.getLogger(__name__)
 
+# 分析结果中的建议：技术面、基本面和综合建议
+RECOMMENDATION_FORMAT = "技术面: {technical} | 基本面: {fundamental} | 综合: {overall}"
+RECOMMENDATION_LABELS = {"技术面": "technical", "基本面": "fundamental", "综合": "overall"}
+
+
+def parse_recommendation(recommendation: str) -> Dict[str, str]:
+    """拆分 RECOMMENDATION_FORMAT 格式的建议，返回 {technical/fundamental/overall: 建议}"""
+    parts = {}
+    for part in recommendation.split(" | "):
+        label, _, value = part.partition(": ")
+        if label in RECOMMENDATION_LABELS:
+            parts[RECOMMENDATION_LABELS[label]] = value
+    return parts
+
 
 class StockAnalysisService:
     """股票分析服务类"""
@@ -26,41 +37,18 @@ class StockAnalysisService:
         pass
 
     def analyze_stock(self, symbol: str, name: str, current_price: float,
-                     change_percent: float, hist_data: pd.DataFrame) -> StockAnalysisResponse:
-        """执行完整的股票技术分析"""
+                     change_percent: float, hist_data: Union[pd.DataFrame, Bars],
+                     indicators: Optional[List[str]] = None,
+                     benchmarks: Optional[Dict[str, Bars]] = None) -> StockAnalysisResponse:
+        """执行股票技术分析，indicators 为需要的指标名列表（见 indicator_registry），默认全部；
+        benchmarks 为墨菲市场间分析使用的指数日K线 {指数名称: Bars}（见 index_service）"""
         try:
             logger.info(f"Starting analysis for {symbol} - {name}")
-            # 计算各项技术指标
-            macd = calculate_macd(hist_data)
-            kdj = calculate_kdj(hist_data)
-            rsi = calculate_rsi(hist_data)
-            boll = calculate_bollinger_bands(hist_data)
-            wr = calculate_williams_r(hist_data)
-            gann = calculate_gann_lines(hist_data)
-            ma = calculate_moving_averages(hist_data)
-            volume = calculate_volume_analysis(hist_data)
-            turnover_rate = calculate_turnover_rate(hist_data, current_price)
-            elliott_wave = calculate_elliott_wave(hist_data)
-            edwards_trend = analyze_edwards_trend(hist_data)
-            murphy_intermarket = analyze_murphy_intermarket(hist_data)
-            japanese_candlestick = analyze_japanese_candlestick(hist_data)
-
-            # 创建技术指标对象
-            technical_analysis = TechnicalIndicators(
-                macd=macd,
-                kdj=kdj,
-                rsi=rsi,
-                boll=boll,
-                wr=wr,
-                gann=gann,
-                ma=ma,
-                volume=volume,
-                turnover_rate=turnover_rate,
-                elliott_wave=elliott_wave,
-                edwards_trend=edwards_trend,
-                murphy_intermarket=murphy_intermarket,
-                japanese_candlestick=japanese_candlestick
-            )
+            # 各指标共用同一份K线数组和同一个计算上下文，滚动窗口、EMA等基础量只计算一次
+            ctx = IndicatorContext(as_bars(hist_data))
+            # 按依赖图只计算请求的指标（默认全部），共享的中间量只计算一次
+            results = indicator_registry.evaluate(ctx, indicators, current_price=current_price,
+                                                  benchmarks=benchmarks)
 
             # 基本面分析（使用模拟数据）
             logger.info("Starting fundamental analysis...")
@@ -69,51 +57,8 @@ class StockAnalysisService:
             fundamental_recommendation = self._get_mock_fundamental_recommendation(symbol)
             logger.info(f"Fundamental analysis completed: {fundamental_recommendation}")
 
-            # 生成技术信号
-            technical_signals = self._generate_signals(technical_analysis)
-
-            # 生成技术建议
-            technical_recommendation = self._generate_recommendation(technical_analysis)
-
-            # 综合建议
-            overall_recommendation = self._generate_overall_recommendation(
-                technical_recommendation, fundamental_recommendation
-            )
-
-            # 合并分析数据
-            technical_dict = technical_analysis.dict()
-            # 转换numpy类型为Python原生类型
-            technical_dict = self._convert_numpy_types(technical_dict)
-
-            # 生成综合分析
-            comprehensive_analysis = self._get_comprehensive_analysis(
-                technical_dict,
-                fundamental_data,
-                current_price
-            )
-
-            combined_analysis = {
-                "technical": technical_dict,
-                "fundamental": fundamental_data,
-                "comprehensive": comprehensive_analysis
-            }
-
-            # 合并信号
-            combined_signals = {
-                "technical_signals": technical_signals.get("signals", []),
-                "fundamental_signals": fundamental_signals,
-                "all_signals": technical_signals.get("signals", []) + fundamental_signals
-            }
-
-            return StockAnalysisResponse(
-                symbol=symbol,
-                name=name,
-                current_price=current_price,
-                change_percent=change_percent,
-                analysis=combined_analysis,
-                signals=combined_signals,
-                recommendation=f"技术面: {technical_recommendation} | 基本面: {fundamental_recommendation} | 综合: {overall_recommendation}"
-            )
+            return self._build_response(symbol, name, current_price, change_percent, results,
+                                        fundamental_data, fundamental_signals, fundamental_recommendation)
             
         except Exception as e:
             logger.error(f"Stock analysis error: {e}")
@@ -122,62 +67,143 @@ class StockAnalysisService:
             # 返回默认分析结果
             return self._get_default_analysis(symbol, name, current_price, change_percent)
     
+    def _build_response(self, symbol: str, name: str, current_price: float, change_percent: float,
+                        results: Dict[str, Any], fundamental_data: dict, fundamental_signals: list,
+                        fundamental_recommendation: str) -> StockAnalysisResponse:
+        """由技术指标结果和基本面数据生成信号、建议和综合分析"""
+        # 创建技术指标对象，未请求的指标为None
+        technical_analysis = TechnicalIndicators(**results)
+
+        # 生成技术信号
+        technical_signals = self._generate_signals(technical_analysis)
+
+        # 生成技术建议
+        technical_recommendation = self._generate_recommendation(technical_analysis)
+
+        # 综合建议
+        overall_recommendation = self._generate_overall_recommendation(
+            technical_recommendation, fundamental_recommendation
+        )
+
+        # 合并分析数据
+        technical_dict = technical_analysis.dict(exclude_none=True)
+        # 转换numpy类型为Python原生类型
+        technical_dict = self._convert_numpy_types(technical_dict)
+
+        # 生成综合分析
+        comprehensive_analysis = self._get_comprehensive_analysis(
+            technical_dict,
+            fundamental_data,
+            current_price
+        )
+
+        combined_analysis = {
+            "technical": technical_dict,
+            "fundamental": fundamental_data,
+            "comprehensive": comprehensive_analysis
+        }
+
+        # 合并信号
+        combined_signals = {
+            "technical_signals": technical_signals.get("signals", []),
+            "fundamental_signals": fundamental_signals,
+            "all_signals": technical_signals.get("signals", []) + fundamental_signals
+        }
+
+        return StockAnalysisResponse(
+            symbol=symbol,
+            name=name,
+            current_price=current_price,
+            change_percent=change_percent,
+            analysis=combined_analysis,
+            signals=combined_signals,
+            recommendation=RECOMMENDATION_FORMAT.format(
+                technical=technical_recommendation, fundamental=fundamental_recommendation,
+                overall=overall_recommendation
+            )
+        )
+
+    def select_indicators(self, result: StockAnalysisResponse, indicators: List[str]) -> StockAnalysisResponse:
+        """从全部指标的分析结果中取出部分指标，信号、技术建议和综合分析按这些指标重新生成
+
+        与只计算这些指标的结果一致（基本面为模拟数据，沿用原结果）。
+        """
+        technical = result.analysis.get("technical", {})
+        fundamental = result.analysis.get("fundamental", {})
+        if not fundamental:
+            # 默认分析结果没有基本面数据，直接按原样返回
+            return result
+        selected = {name: technical[name] for name in indicators if name in technical}
+        return self._build_response(
+            result.symbol, result.name, result.current_price, result.change_percent, selected,
+            fundamental, result.signals.get("fundamental_signals", []),
+            parse_recommendation(result.recommendation).get("fundamental", "持有")
+        )
+
     def _generate_signals(self, analysis: TechnicalIndicators) -> Dict[str, List[str]]:
         """生成技术信号"""
         signals = []
         
         try:
             # MACD信号
-            if analysis.macd["trend"] == "bullish":
-                signals.append("MACD呈多头趋势")
-            elif analysis.macd["trend"] == "bearish":
-                signals.append("MACD呈空头趋势")
+            if analysis.macd is not None:
+                if analysis.macd["trend"] == "bullish":
+                    signals.append("MACD呈多头趋势")
+                elif analysis.macd["trend"] == "bearish":
+                    signals.append("MACD呈空头趋势")
             
             # KDJ信号
-            if analysis.kdj["overbought"]:
-                signals.append("KDJ指标显示超买")
-            elif analysis.kdj["oversold"]:
-                signals.append("KDJ指标显示超卖")
+            if analysis.kdj is not None:
+                if analysis.kdj["overbought"]:
+                    signals.append("KDJ指标显示超买")
+                elif analysis.kdj["oversold"]:
+                    signals.append("KDJ指标显示超卖")
             
             # RSI信号
-            if analysis.rsi["overbought"]:
-                signals.append("RSI指标显示超买")
-            elif analysis.rsi["oversold"]:
-                signals.append("RSI指标显示超卖")
+            if analysis.rsi is not None:
+                if analysis.rsi["overbought"]:
+                    signals.append("RSI指标显示超买")
+                elif analysis.rsi["oversold"]:
+                    signals.append("RSI指标显示超卖")
             
             # 布林带信号
-            if analysis.boll["position"] == "upper":
-                signals.append("价格触及布林带上轨")
-            elif analysis.boll["position"] == "lower":
-                signals.append("价格触及布林带下轨")
-            elif analysis.boll["squeeze"]:
-                signals.append("布林带收窄")
+            if analysis.boll is not None:
+                if analysis.boll["position"] == "upper":
+                    signals.append("价格触及布林带上轨")
+                elif analysis.boll["position"] == "lower":
+                    signals.append("价格触及布林带下轨")
+                elif analysis.boll["squeeze"]:
+                    signals.append("布林带收窄")
             
             # 威廉指标信号
-            if analysis.wr["overbought"]:
-                signals.append("威廉指标显示超买")
-            elif analysis.wr["oversold"]:
-                signals.append("威廉指标显示超卖")
+            if analysis.wr is not None:
+                if analysis.wr["overbought"]:
+                    signals.append("威廉指标显示超买")
+                elif analysis.wr["oversold"]:
+                    signals.append("威廉指标显示超卖")
             
             # 均线信号
-            if analysis.ma["cross_signal"] == "golden_cross":
-                signals.append("均线金叉")
-            elif analysis.ma["cross_signal"] == "death_cross":
-                signals.append("均线死叉")
-            elif analysis.ma["bullish_alignment"]:
-                signals.append("均线多头排列")
+            if analysis.ma is not None:
+                if analysis.ma["cross_signal"] == "golden_cross":
+                    signals.append("均线金叉")
+                elif analysis.ma["cross_signal"] == "death_cross":
+                    signals.append("均线死叉")
+                elif analysis.ma["bullish_alignment"]:
+                    signals.append("均线多头排列")
             
             # 量能信号
-            if analysis.volume["volume_price_signal"] == "bullish":
-                signals.append("量价齐升")
-            elif analysis.volume["volume_price_signal"] == "bearish":
-                signals.append("量价背离")
+            if analysis.volume is not None:
+                if analysis.volume["volume_price_signal"] == "bullish":
+                    signals.append("量价齐升")
+                elif analysis.volume["volume_price_signal"] == "bearish":
+                    signals.append("量价背离")
             
             # 江恩线信号
-            if analysis.gann["trend"] == "bullish":
-                signals.append("江恩线显示上升趋势")
-            elif analysis.gann["trend"] == "bearish":
-                signals.append("江恩线显示下降趋势")
+            if analysis.gann is not None:
+                if analysis.gann["trend"] == "bullish":
+                    signals.append("江恩线显示上升趋势")
+                elif analysis.gann["trend"] == "bearish":
+                    signals.append("江恩线显示下降趋势")
             
         except Exception as e:
             logger.error(f"Signal generation error: {e}")
@@ -192,52 +218,60 @@ class StockAnalysisService:
             bearish_signals = 0
             
             # MACD评分
-            if analysis.macd["trend"] == "bullish":
-                bullish_signals += 1
-            elif analysis.macd["trend"] == "bearish":
-                bearish_signals += 1
+            if analysis.macd is not None:
+                if analysis.macd["trend"] == "bullish":
+                    bullish_signals += 1
+                elif analysis.macd["trend"] == "bearish":
+                    bearish_signals += 1
             
             # KDJ评分
-            if analysis.kdj["oversold"]:
-                bullish_signals += 1
-            elif analysis.kdj["overbought"]:
-                bearish_signals += 1
+            if analysis.kdj is not None:
+                if analysis.kdj["oversold"]:
+                    bullish_signals += 1
+                elif analysis.kdj["overbought"]:
+                    bearish_signals += 1
             
             # RSI评分
-            if analysis.rsi["oversold"]:
-                bullish_signals += 1
-            elif analysis.rsi["overbought"]:
-                bearish_signals += 1
+            if analysis.rsi is not None:
+                if analysis.rsi["oversold"]:
+                    bullish_signals += 1
+                elif analysis.rsi["overbought"]:
+                    bearish_signals += 1
             
             # 布林带评分
-            if analysis.boll["position"] == "lower":
-                bullish_signals += 1
-            elif analysis.boll["position"] == "upper":
-                bearish_signals += 1
+            if analysis.boll is not None:
+                if analysis.boll["position"] == "lower":
+                    bullish_signals += 1
+                elif analysis.boll["position"] == "upper":
+                    bearish_signals += 1
             
             # 威廉指标评分
-            if analysis.wr["oversold"]:
-                bullish_signals += 1
-            elif analysis.wr["overbought"]:
-                bearish_signals += 1
+            if analysis.wr is not None:
+                if analysis.wr["oversold"]:
+                    bullish_signals += 1
+                elif analysis.wr["overbought"]:
+                    bearish_signals += 1
             
             # 均线评分
-            if analysis.ma["cross_signal"] == "golden_cross" or analysis.ma["bullish_alignment"]:
-                bullish_signals += 1
-            elif analysis.ma["cross_signal"] == "death_cross":
-                bearish_signals += 1
+            if analysis.ma is not None:
+                if analysis.ma["cross_signal"] == "golden_cross" or analysis.ma["bullish_alignment"]:
+                    bullish_signals += 1
+                elif analysis.ma["cross_signal"] == "death_cross":
+                    bearish_signals += 1
             
             # 量能评分
-            if analysis.volume["volume_price_signal"] == "bullish":
-                bullish_signals += 1
-            elif analysis.volume["volume_price_signal"] == "bearish":
-                bearish_signals += 1
+            if analysis.volume is not None:
+                if analysis.volume["volume_price_signal"] == "bullish":
+                    bullish_signals += 1
+                elif analysis.volume["volume_price_signal"] == "bearish":
+                    bearish_signals += 1
             
             # 江恩线评分
-            if analysis.gann["trend"] == "bullish":
-                bullish_signals += 1
-            elif analysis.gann["trend"] == "bearish":
-                bearish_signals += 1
+            if analysis.gann is not None:
+                if analysis.gann["trend"] == "bullish":
+                    bullish_signals += 1
+                elif analysis.gann["trend"] == "bearish":
+                    bearish_signals += 1
             
             # 生成建议
             if bullish_signals > bearish_signals + 1:
@@ -0,0 +1,220 @@
+"""
+异步股票数据获取服务
+"""
+import pandas as pd
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+import asyncio
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.data_service import StockDataService, history_start
+from services.quote_snapshot import MarketQuoteSnapshot, market_snapshot
+from services.single_flight import AsyncSingleFlight
+from services.transport import Transport, transport as default_transport
+from services.source_health import SourceHealthTracker, CircuitOpenError, source_health
+from utils.bars import Bars
+from utils.quote_parsers import format_symbol_for_api, parse_tencent_quotes, parse_sina_quotes, quotes_to_dict
+
+logger = logging.getLogger(__name__)
+
+QuoteSource = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+class AsyncStockDataService:
+    """异步股票数据服务类
+
+    实时行情通过传输层的 httpx.AsyncClient 连接池获取，不阻塞事件循环；
+    主数据源在 HEDGE_DELAY 秒内没有返回时同时请求下一个数据源，取先返回的结果。
+    """
+
+    HEDGE_DELAY = 0.3        # 对冲请求延迟（秒）
+    REQUEST_TIMEOUT = 5.0    # 单个HTTP请求超时（秒）
+    QUOTE_BATCH_SIZE = StockDataService.QUOTE_BATCH_SIZE
+
+    def __init__(self, snapshot: Optional[MarketQuoteSnapshot] = None,
+                 sync_service: Optional[StockDataService] = None,
+                 tencent_url: str = StockDataService.TENCENT_QUOTE_URL,
+                 sina_url: str = StockDataService.SINA_QUOTE_URL,
+                 hedge_delay: float = HEDGE_DELAY, timeout: float = REQUEST_TIMEOUT,
+                 health: Optional[SourceHealthTracker] = None,
+                 transport: Optional[Transport] = None):
+        self.snapshot = snapshot or market_snapshot
+        self.health = health or source_health
+        # HTTP连接池由传输层持有，可替换为录制或回放
+        self.transport = transport or default_transport
+        # 历史数据依赖efinance同步接口和本地K线库，放到线程中执行
+        self.sync_service = sync_service or StockDataService(snapshot=self.snapshot, health=self.health,
+                                                             transport=self.transport)
+        # 行情接口地址可替换为本地桩服务，便于测试
+        self.tencent_url = tencent_url
+        self.sina_url = sina_url
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+
+        self._quote_flight = AsyncSingleFlight()
+        self._history_flight = AsyncSingleFlight()
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self.transport.aclose()
+
+    async def get_stock_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """获取股票基本信息"""
+        results = await self.get_stock_info_many([symbol])
+        return results.get(symbol)
+
+    async def get_stock_info_many(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取股票基本信息，返回 {代码: 股票数据}，获取失败的股票不在结果中
+
+        并发请求中相同股票只会向上游请求一次，其余协程等待并共享结果。
+        """
+        if not symbols:
+            return {}
+        return await self._quote_flight.do_many(symbols, self._fetch_stock_info_many)
+
+    async def _fetch_stock_info_many(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """对冲请求各数据源"""
+        fetchers = {
+            'tencent': self._get_tencent_quotes,
+            'sina': self._get_sina_quotes
+        }
+        # efinance快照是内存查询，始终最先尝试；备用数据源按健康状况排序
+        sources = [('efinance', self._get_snapshot_quotes)] + [
+            (name, fetchers[name]) for name in self.health.order(StockDataService.FALLBACK_QUOTE_SOURCES)
+        ]
+        results = await self._hedged_fetch(sources, symbols)
+        logger.info(f"Async quote lookup: {len(results)}/{len(symbols)} symbols resolved")
+        return results
+
+    async def get_historical_data(self, symbol: str, days: int = 365) -> Optional[pd.DataFrame]:
+        """获取历史数据DataFrame（efinance列名，兼容旧接口）
+
+        to_frame() 会复制缓存中的K线，项目内的调用方都使用 get_historical_bars。
+        """
+        bars = await self.get_historical_bars(symbol, days)
+        return bars.to_frame() if bars is not None else None
+
+    async def get_historical_bars(self, symbol: str, days: int = 365) -> Optional[Bars]:
+        """获取历史K线（在线程中执行，不阻塞事件循环；相同请求合并为一次）"""
+        # 内存缓存命中时无需切换到线程
+        cached = self.sync_service.history_cache.get(symbol, history_start(days))
+        if cached is not None:
+            return cached
+        return await self.refresh_historical_bars(symbol, days)
+
+    async def refresh_historical_bars(self, symbol: str, days: int = 365) -> Optional[Bars]:
+        """不查内存缓存重新加载历史K线并写入缓存（缓存预热用它在条目过期前刷新）"""
+        return await self._history_flight.do(
+            (symbol, days), lambda: asyncio.to_thread(self.sync_service.load_historical_bars, symbol, days)
+        )
+
+    async def get_intraday_bars(self, symbol: str, minutes: int = 1, days: int = 1) -> Optional[Bars]:
+        """获取分钟K线（在线程中执行）"""
+        return await asyncio.to_thread(self.sync_service.get_intraday_bars, symbol, minutes, days)
+
+    def generate_mock_data(self, symbol: str, current_price: float, days: int = 252) -> pd.DataFrame:
+        """生成模拟历史数据"""
+        return self.sync_service.generate_mock_data(symbol, current_price, days)
+
+    async def _hedged_fetch(self, sources: List[Tuple[str, QuoteSource]], symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """按顺序对冲请求多个数据源
+
+        当前数据源在 hedge_delay 内没有返回、失败或只返回部分股票时，
+        立即对剩余股票发起下一个数据源的请求；所有股票都有结果后取消其余请求。
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        remaining_sources = list(sources)
+        pending: Dict[asyncio.Task, str] = {}
+
+        def missing() -> List[str]:
+            return [symbol for symbol in symbols if symbol not in results]
+
+        def launch_next() -> bool:
+            if not remaining_sources:
+                return False
+            name, source = remaining_sources.pop(0)
+            pending[asyncio.create_task(source(missing()))] = name
+            return True
+
+        launch_next()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending.keys(),
+                    timeout=self.hedge_delay if remaining_sources else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # 主数据源迟迟未返回，追加请求下一个数据源
+                    logger.info(f"Hedging quote request after {self.hedge_delay}s")
+                    launch_next()
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        for symbol, stock_data in task.result().items():
+                            results.setdefault(symbol, stock_data)
+                    except Exception as e:
+                        logger.warning(f"{name} API failed: {e}")
+
+                if not missing():
+                    break
+                if not pending:
+                    launch_next()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return results
+
+    async def _get_snapshot_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """efinance全市场快照（刷新时会调用同步接口，放到线程中执行）"""
+        return await asyncio.to_thread(self.snapshot.get_many, symbols)
+
+    async def _get_tencent_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """腾讯财经批量行情"""
+        headers = {
+            'Referer': 'http://stockapp.finance.qq.com/',
+            'Accept': '*/*',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
+        }
+        return await self._get_quotes_batched('tencent', self.tencent_url, headers, symbols, parse_tencent_quotes)
+
+    async def _get_sina_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """新浪财经批量行情"""
+        headers = {
+            'Referer': 'http://finance.sina.com.cn/',
+            'Accept': '*/*'
+        }
+        return await self._get_quotes_batched('sina', self.sina_url, headers, symbols, parse_sina_quotes)
+
+    async def _get_quotes_batched(self, source: str, base_url: str, headers: Dict[str, str],
+                                  symbols: List[str], parser) -> Dict[str, Dict[str, Any]]:
+        """分组并发请求多股票行情接口并合并解析结果"""
+        chunks = [symbols[i:i + self.QUOTE_BATCH_SIZE] for i in range(0, len(symbols), self.QUOTE_BATCH_SIZE)]
+
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+            url = base_url + ','.join(format_symbol_for_api(symbol) for symbol in chunk)
+            if not self.health.allow(source):
+                raise CircuitOpenError(f"{source} circuit open")
+            with self.health.track(source):
+                response = await self.transport.aget(url, headers=headers, timeout=self.timeout)
+                if response.status_code != 200:
+                    raise Exception(f"{source} API returned status {response.status_code}")
+            # 两个接口都返回GBK系编码，GB18030兼容GBK
+            return quotes_to_dict(parser(response.content.decode('gb18030', errors='replace')))
+
+        results = {}
+        for chunk_result in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True):
+            if isinstance(chunk_result, Exception):
+                logger.warning(f"{source} API failed: {chunk_result}")
+                continue
+            results.update(chunk_result)
+        return results
+
+
+# 全局共享的异步数据服务，所有路由共用同一个连接池
+async_data_service = AsyncStockDataService()
@@ -61,6 +61,29 @@ class DatabaseService:
             logger.error(f"Failed to get watchlist: {e}")
             return []
     
+    def get_all_watchlist_symbols(self) -> List[str]:
+        """获取所有用户自选股的股票代码（去重，最近添加的在前）"""
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT symbol, MAX(added_at) AS last_added
+                FROM watchlist 
+                GROUP BY symbol 
+                ORDER BY last_added DESC
+            ''')
+            
+            symbols = [row['symbol'] for row in cursor.fetchall()]
+            conn.close()
+            
+            logger.info(f"Retrieved {len(symbols)} distinct watchlist symbols")
+            return symbols
+            
+        except Exception as e:
+            logger.error(f"Failed to get watchlist symbols: {e}")
+            return []
+    
     def add_to_watchlist(self, symbol: str, name: str, user_id: str = 'default') -> bool:
         """添加股票到自选股"""
         try:
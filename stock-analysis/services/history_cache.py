@@ -0,0 +1,108 @@
+"""
+历史行情内存缓存服务
+"""
+import numpy as np
+from typing import Optional, Dict, Any
+from collections import OrderedDict
+import logging
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bars import Bars
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    """单只股票已缓存的最宽日期区间"""
+    __slots__ = ('bars', 'start', 'fetched_at', 'nbytes')
+
+    def __init__(self, bars: Bars, start: np.datetime64):
+        self.bars = bars
+        self.start = start
+        self.fetched_at = time.time()
+        self.nbytes = bars.nbytes
+
+
+class HistoryCache:
+    """按股票缓存的历史行情
+
+    每只股票只保留已获取过的最宽区间，较短的 days 请求直接按日期切片返回 Bars 视图（切片本身不复制数据）；
+    超过 max_bytes 时按最近最少使用淘汰，条目超过 ttl 秒视为过期。
+    返回的K线数组与缓存共享内存，调用方不应原地修改。只有直接使用 Bars 的调用方（get_historical_bars）
+    不产生复制；需要DataFrame的兼容接口（get_historical_data）每次调用都会经 to_frame() 复制一份。
+    """
+
+    MAX_BYTES = 64 * 1024 * 1024
+    TTL = 60
+
+    def __init__(self, max_bytes: int = MAX_BYTES, ttl: float = TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, symbol: str, start: np.datetime64) -> Optional[Bars]:
+        """返回 start 至今的缓存数据，未缓存、区间不够宽或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None or entry.start > start or time.time() - entry.fetched_at >= self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(symbol)
+            self.hits += 1
+        return entry.bars.since(start)
+
+    def widest_start(self, symbol: str) -> Optional[np.datetime64]:
+        """已缓存区间的起始日期（包括过期条目），用于刷新时保持最宽区间"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            return entry.start if entry is not None else None
+
+    def put(self, symbol: str, bars: Bars, start: np.datetime64):
+        """缓存 start 至今的数据，已有更宽且未过期的区间时保留原条目"""
+        if bars is None or bars.empty:
+            return
+        entry = _CacheEntry(bars, start)
+        with self._lock:
+            current = self._entries.get(symbol)
+            if current is not None:
+                if current.start < start and time.time() - current.fetched_at < self.ttl:
+                    return
+                self._bytes -= current.nbytes
+                del self._entries[symbol]
+            if entry.nbytes > self.max_bytes:
+                logger.warning(f"History for {symbol} ({entry.nbytes} bytes) exceeds cache capacity, not cached")
+                return
+            self._entries[symbol] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                evicted_symbol, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+                logger.debug(f"Evicted cached history for {evicted_symbol}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
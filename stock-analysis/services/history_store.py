@@ -0,0 +1,118 @@
+"""
+本地历史K线存储服务
+"""
+import pandas as pd
+import numpy as np
+from typing import Optional, Dict, Any, List, Tuple
+from collections import defaultdict
+import logging
+import threading
+import json
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 默认存储目录：database/history，每只股票一个 .npy 文件加一个 .json 元数据文件
+DEFAULT_STORE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'history'
+)
+
+# efinance历史行情中的数值列 -> 存储字段名（.npy 头部只用ASCII字段名）
+BAR_FIELDS = {
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'pct_change',
+    '涨跌额': 'change',
+    '换手率': 'turnover'
+}
+
+BAR_DTYPE = np.dtype([('date', 'datetime64[D]')] + [(field, np.float64) for field in BAR_FIELDS.values()])
+# 分钟K线精确到秒，日期为K线结束时间
+MINUTE_BAR_DTYPE = np.dtype([('date', 'datetime64[s]')] + [(field, np.float64) for field in BAR_FIELDS.values()])
+
+
+class HistoryStore:
+    """按股票存储的本地列式K线库
+
+    K线以结构化NumPy数组保存为 .npy 文件，读取时使用内存映射；
+    元数据（股票名称、已覆盖的起始日期、最后更新时间）保存在同名 .json 文件中。
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR, dtype: np.dtype = BAR_DTYPE):
+        self.store_dir = store_dir
+        self.dtype = dtype
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    def lock(self, symbol: str) -> threading.Lock:
+        """获取单只股票的读写锁，避免并发更新同一个文件"""
+        return self._locks[symbol]
+
+    def symbols(self) -> List[str]:
+        """已存储的全部股票代码（不含子目录中的指数、分钟K线库）"""
+        return sorted(name[:-4] for name in os.listdir(self.store_dir) if name.endswith('.npy'))
+
+    def _paths(self, symbol: str) -> Tuple[str, str]:
+        base = os.path.join(self.store_dir, symbol)
+        return f"{base}.npy", f"{base}.json"
+
+    def load(self, symbol: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """读取已存储的K线和元数据，不存在时返回None"""
+        bars_path, meta_path = self._paths(symbol)
+        if not os.path.exists(bars_path) or not os.path.exists(meta_path):
+            return None
+
+        try:
+            bars = np.load(bars_path, mmap_mode='r')
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return bars, meta
+        except Exception as e:
+            logger.warning(f"Failed to load stored history for {symbol}: {e}")
+            return None
+
+    def save(self, symbol: str, bars: np.ndarray, meta: Dict[str, Any]):
+        """原子写入K线和元数据（先写临时文件再替换）"""
+        bars_path, meta_path = self._paths(symbol)
+        tmp_bars_path, tmp_meta_path = f"{bars_path}.tmp", f"{meta_path}.tmp"
+
+        with open(tmp_bars_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=self.dtype))
+        with open(tmp_meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        os.replace(tmp_bars_path, bars_path)
+        os.replace(tmp_meta_path, meta_path)
+
+
+def frame_to_bars(frame: pd.DataFrame, dtype: np.dtype = BAR_DTYPE) -> np.ndarray:
+    """将efinance历史行情DataFrame转换为结构化K线数组（按日期升序、去重）"""
+    bars = np.empty(len(frame), dtype=dtype)
+    bars['date'] = pd.to_datetime(frame['日期']).to_numpy().astype(dtype['date'])
+    for column, field in BAR_FIELDS.items():
+        if column in frame.columns:
+            bars[field] = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            bars[field] = np.nan
+
+    bars = np.sort(bars, order='date')
+    _, last_idx = np.unique(bars['date'][::-1], return_index=True)
+    return bars[len(bars) - 1 - last_idx]
+
+
+def merge_bars(stored: np.ndarray, fetched: np.ndarray) -> np.ndarray:
+    """合并新旧K线，同一日期以新拉取的数据为准"""
+    if len(stored) == 0:
+        return fetched
+    if len(fetched) == 0:
+        return np.asarray(stored)
+    keep = ~np.isin(stored['date'], fetched['date'])
+    merged = np.concatenate([np.asarray(stored)[keep], fetched])
+    return np.sort(merged, order='date')
+
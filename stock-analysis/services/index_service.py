@@ -0,0 +1,236 @@
+"""
+指数行情服务（大盘和行业板块指数，全部股票共享）
+"""
+import efinance as ef
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import logging
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.data_service import history_start
+from services.history_store import HistoryStore, DEFAULT_STORE_DIR, BAR_DTYPE, frame_to_bars, merge_bars
+from services.single_flight import SingleFlight
+from services.source_health import SourceHealthTracker, CircuitOpenError, source_health
+from services.transport import Transport, transport as default_transport
+from utils.bars import Bars
+
+logger = logging.getLogger(__name__)
+
+# 大盘指数：东方财富行情ID（市场.代码）和名称
+BENCHMARK_INDEXES = {
+    'sse': ('1.000001', '上证指数'),
+    'szse': ('0.399001', '深证成指'),
+    'csi300': ('1.000300', '沪深300'),
+    'chinext': ('0.399006', '创业板指')
+}
+
+# 板块指数的行情ID前缀
+BOARD_MARKET = '90'
+
+
+def market_benchmarks(symbol: str) -> List[str]:
+    """股票对应的大盘指数（第一项为所在市场的主要指数）"""
+    if symbol.startswith(('6', '9')):
+        return ['sse', 'csi300']
+    if symbol.startswith('3'):
+        return ['chinext', 'szse', 'csi300']
+    if symbol.startswith('0'):
+        return ['szse', 'csi300']
+    return ['csi300']
+
+
+class IndexService:
+    """指数日K线的共享缓存
+
+    指数K线保存在本地K线库（database/history/index），内存中按行情ID只保留一份，
+    所有股票的分析共用；超过 refresh_interval 后增量补齐最新K线，后台任务定时刷新大盘指数。
+    股票所属的行业板块按天缓存，同一板块的股票共用同一条板块指数。
+    """
+
+    HISTORY_DAYS = 730          # 指数K线覆盖的天数，不短于个股历史数据
+    REFRESH_INTERVAL = 300      # 内存中指数K线的有效期（秒）
+    SECTOR_TTL = 24 * 3600      # 股票所属板块的缓存时间（秒）
+
+    def __init__(self, store: Optional[HistoryStore] = None,
+                 transport: Optional[Transport] = None,
+                 health: Optional[SourceHealthTracker] = None,
+                 days: int = HISTORY_DAYS, refresh_interval: float = REFRESH_INTERVAL):
+        self.store = store or HistoryStore(os.path.join(DEFAULT_STORE_DIR, 'index'))
+        self.transport = transport or default_transport
+        self.health = health or source_health
+        self.days = days
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._series: Dict[str, Tuple[Bars, float]] = {}
+        self._sectors: Dict[str, Tuple[Optional[Tuple[str, str]], float]] = {}
+        # 多只股票同时请求同一指数时只拉取一次
+        self._flight = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def get_index(self, secid: str, name: str = '') -> Optional[Bars]:
+        """指数日K线（内存命中时直接返回；过期时增量更新，更新失败继续使用旧数据）"""
+        with self._lock:
+            cached = self._series.get(secid)
+        if cached is not None and time.time() - cached[1] < self.refresh_interval:
+            return cached[0]
+        try:
+            return self._flight.do(secid, lambda: self._load(secid, name))
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Index history failed for {secid}: {e}")
+            return cached[0] if cached is not None else None
+
+    def _load(self, secid: str, name: str) -> Bars:
+        """读取本地K线库并增量补齐，写回内存缓存"""
+        today = np.datetime64(datetime.now(), 'D')
+        start = history_start(self.days)
+
+        with self.store.lock(secid):
+            stored = self.store.load(secid)
+            if stored is None or len(stored[0]) < 2:
+                records, fetched_name = self._fetch(secid, start, today)
+                meta = {'name': fetched_name or name, 'covered_start': str(start)}
+            else:
+                records, meta = stored
+                # 最后一根可能是盘中数据，从它开始重新拉取并覆盖（指数没有复权问题）
+                fetched, fetched_name = self._fetch(secid, records['date'][-1], today, allow_empty=True)
+                records = merge_bars(records, fetched)
+                meta = dict(meta, name=fetched_name or meta.get('name') or name)
+            meta['updated_at'] = time.time()
+            self.store.save(secid, records, meta)
+
+        bars = Bars.from_records(records[records['date'] >= start], secid, meta['name'] or name)
+        with self._lock:
+            self._series[secid] = (bars, time.time())
+        self.refreshes += 1
+        logger.info(f"Loaded {len(bars)} index bars for {secid} {bars.name}")
+        return bars
+
+    def _fetch(self, secid: str, start: np.datetime64, end: np.datetime64, allow_empty: bool = False):
+        """按行情ID从efinance拉取指数日K线，返回(结构化数组, 指数名称)"""
+        if not self.health.allow('efinance'):
+            raise CircuitOpenError("efinance circuit open")
+
+        beg = pd.Timestamp(start).strftime('%Y%m%d')
+        end = pd.Timestamp(end).strftime('%Y%m%d')
+        with self.health.track('efinance'):
+            frame = self.transport.call('ef.stock.get_quote_history', ef.stock.get_quote_history,
+                                         secid, beg=beg, end=end, klt=101, quote_id_mode=True)
+        if frame is None or frame.empty:
+            if allow_empty:
+                return np.empty(0, dtype=BAR_DTYPE), None
+            raise Exception(f"No index data returned for {secid}")
+        name_column = '股票名称' if '股票名称' in frame.columns else '名称'
+        name = str(frame[name_column].iloc[0]) if name_column in frame.columns else None
+        return frame_to_bars(frame), name
+
+    def sector_of(self, symbol: str) -> Optional[Tuple[str, str]]:
+        """股票所属行业板块 (行情ID, 板块名称)，取东方财富所属板块列表的第一项（行业板块）"""
+        with self._lock:
+            cached = self._sectors.get(symbol)
+        if cached is not None and time.time() - cached[1] < self.SECTOR_TTL:
+            return cached[0]
+
+        sector = None
+        try:
+            frame = self.transport.call('ef.stock.get_belong_board', ef.stock.get_belong_board, symbol)
+            if frame is not None and not frame.empty:
+                row = frame.iloc[0]
+                sector = (f"{BOARD_MARKET}.{row['板块代码']}", str(row['板块名称']))
+        except Exception as e:
+            # 查询失败时不缓存，下次分析重试
+            logger.warning(f"Sector lookup failed for {symbol}: {e}")
+            return cached[0] if cached is not None else None
+
+        with self._lock:
+            self._sectors[symbol] = (sector, time.time())
+        return sector
+
+    def benchmarks_for(self, symbol: str, include_sector: bool = True) -> Dict[str, Bars]:
+        """股票的比较基准 {指数名称: 日K线}，按大盘主要指数、其他大盘指数、行业板块排列，获取失败的指数不包含在内"""
+        targets = [BENCHMARK_INDEXES[key] for key in market_benchmarks(symbol)]
+        if include_sector:
+            sector = self.sector_of(symbol)
+            if sector is not None:
+                targets.append(sector)
+
+        benchmarks = {}
+        for secid, name in targets:
+            bars = self.get_index(secid, name)
+            if bars is not None and not bars.empty:
+                benchmarks[name] = bars
+        return benchmarks
+
+    async def get_benchmarks(self, symbol: str, include_sector: bool = True) -> Dict[str, Bars]:
+        """benchmarks_for 的异步版本（在线程中执行，不阻塞事件循环）"""
+        return await asyncio.to_thread(self.benchmarks_for, symbol, include_sector)
+
+    def refresh(self):
+        """强制刷新全部大盘指数和已缓存的板块指数"""
+        with self._lock:
+            known = {secid: bars.name for secid, (bars, _) in self._series.items()}
+        targets = {**known, **dict(BENCHMARK_INDEXES.values())}
+        for secid, name in targets.items():
+            try:
+                self._flight.do(secid, lambda: self._load(secid, name))
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Index refresh failed for {secid}: {e}")
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Index refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """启动后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def clear(self):
+        """清空内存中的指数K线和板块缓存"""
+        with self._lock:
+            self._series.clear()
+            self._sectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            series = {secid: {'name': bars.name, 'bars': len(bars), 'loaded_at': loaded_at}
+                      for secid, (bars, loaded_at) in self._series.items()}
+            sectors = len(self._sectors)
+        return {
+            'series': series,
+            'sectors': sectors,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'running': self._task is not None and not self._task.done()
+        }
+
+
+# 全局指数服务实例
+index_service = IndexService()
@@ -0,0 +1,159 @@
+"""
+技术指标注册表（按依赖关系按需计算）
+"""
+from typing import Dict, Any, Callable, Iterable, List, Optional, Sequence, Tuple
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicator_context import IndicatorContext
+from utils.technical_analysis import (
+    calculate_macd, calculate_kdj, calculate_rsi, calculate_bollinger_bands,
+    calculate_williams_r, calculate_gann_lines, calculate_moving_averages,
+    calculate_volume_analysis, calculate_turnover_rate, calculate_elliott_wave,
+    analyze_edwards_trend, analyze_murphy_intermarket, analyze_japanese_candlestick,
+    macd_series, kdj_series, rsi_series, bollinger_series, williams_r_series, moving_average_series,
+    candlestick_pattern_masks
+)
+
+logger = logging.getLogger(__name__)
+
+
+class IndicatorSpec:
+    """一个注册项：计算函数、依赖的其他注册项、使用的K线字段和请求参数
+
+    compute(ctx, params) 的结果按名称共享；依赖项先于本项计算，中间结果（完整序列、形态扫描）
+    通过同一个 IndicatorContext 的缓存被后续各项直接复用。
+    """
+
+    def __init__(self, name: str, compute: Callable[[IndicatorContext, Dict[str, Any]], Any],
+                 depends: Sequence[str] = (), inputs: Sequence[str] = ('close',),
+                 public: bool = True, description: str = ''):
+        self.name = name
+        self.compute = compute
+        self.depends = tuple(depends)
+        self.inputs = tuple(inputs)
+        self.public = public
+        self.description = description
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'depends': list(self.depends), 'inputs': list(self.inputs),
+                'description': self.description}
+
+
+class IndicatorRegistry:
+    """指标注册表：请求只列出需要的指标，按依赖图计算所需的子图，每项只算一次"""
+
+    def __init__(self):
+        self._specs: Dict[str, IndicatorSpec] = {}
+        self._plans: Dict[Tuple[str, ...], List[str]] = {}
+
+    def register(self, name: str, compute: Callable[[IndicatorContext, Dict[str, Any]], Any],
+                 depends: Sequence[str] = (), inputs: Sequence[str] = ('close',),
+                 public: bool = True, description: str = '') -> IndicatorSpec:
+        """注册一项指标，依赖项必须已经注册（因此注册顺序本身就是拓扑序，不会出现环）"""
+        if name in self._specs:
+            raise ValueError(f"Indicator already registered: {name}")
+        missing = [dep for dep in depends if dep not in self._specs]
+        if missing:
+            raise ValueError(f"Unknown dependencies for {name}: {', '.join(missing)}")
+        spec = IndicatorSpec(name, compute, depends, inputs, public, description)
+        self._specs[name] = spec
+        self._plans.clear()
+        return spec
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def spec(self, name: str) -> IndicatorSpec:
+        return self._specs[name]
+
+    def names(self, public_only: bool = True) -> List[str]:
+        """注册顺序的指标名（默认只含对外的分析项，不含中间量）"""
+        return [name for name, spec in self._specs.items() if spec.public or not public_only]
+
+    def validate(self, names: Iterable[str]) -> List[str]:
+        """检查请求的指标名，返回去重后的列表；有未知或非公开的名称时抛出 ValueError"""
+        names = list(dict.fromkeys(names))
+        unknown = [name for name in names if name not in self._specs or not self._specs[name].public]
+        if unknown:
+            raise ValueError(f"Unsupported indicators: {', '.join(unknown)}")
+        return names
+
+    def plan(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """所需子图的计算顺序：请求的指标及其全部依赖，按注册（拓扑）顺序排列"""
+        names = self.names() if names is None else self.validate(names)
+        key = tuple(sorted(names))
+        plan = self._plans.get(key)
+        if plan is None:
+            required = set()
+            pending = list(names)
+            while pending:
+                name = pending.pop()
+                if name not in required:
+                    required.add(name)
+                    pending.extend(self._specs[name].depends)
+            plan = [name for name in self._specs if name in required]
+            self._plans[key] = plan
+        return plan
+
+    def evaluate(self, ctx: IndicatorContext, names: Optional[Iterable[str]] = None,
+                 **params) -> Dict[str, Any]:
+        """计算请求的指标（names 为空表示全部对外指标），返回 {指标名: 结果}，只包含请求的项"""
+        requested = self.names() if names is None else self.validate(names)
+        results: Dict[str, Any] = {}
+        for name in self.plan(requested):
+            results[name] = self._specs[name].compute(ctx, params)
+        return {name: results[name] for name in requested}
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """对外指标的依赖和输入字段说明"""
+        return [spec.to_dict() for spec in self._specs.values() if spec.public]
+
+
+def build_default_registry() -> IndicatorRegistry:
+    """技术分析使用的13项指标及其共享的中间量"""
+    registry = IndicatorRegistry()
+    register = registry.register
+
+    # 中间量：完整序列和形态扫描，单值指标和序列接口共用
+    register('macd_series', lambda ctx, params: macd_series(ctx), public=False)
+    register('kdj_series', lambda ctx, params: kdj_series(ctx), inputs=('high', 'low', 'close'), public=False)
+    register('rsi_series', lambda ctx, params: rsi_series(ctx), public=False)
+    register('boll_series', lambda ctx, params: bollinger_series(ctx), public=False)
+    register('wr_series', lambda ctx, params: williams_r_series(ctx), inputs=('high', 'low', 'close'), public=False)
+    register('ma_series', lambda ctx, params: moving_average_series(ctx), public=False)
+    register('candlestick_patterns', lambda ctx, params: candlestick_pattern_masks(ctx),
+             inputs=('open', 'high', 'low', 'close'), public=False)
+
+    register('macd', lambda ctx, params: calculate_macd(ctx), depends=('macd_series',), description='MACD')
+    register('kdj', lambda ctx, params: calculate_kdj(ctx), depends=('kdj_series',),
+             inputs=('high', 'low', 'close'), description='KDJ')
+    register('rsi', lambda ctx, params: calculate_rsi(ctx), depends=('rsi_series',), description='RSI')
+    register('boll', lambda ctx, params: calculate_bollinger_bands(ctx), depends=('boll_series',),
+             description='布林带')
+    register('wr', lambda ctx, params: calculate_williams_r(ctx), depends=('wr_series',),
+             inputs=('high', 'low', 'close'), description='威廉指标')
+    register('gann', lambda ctx, params: calculate_gann_lines(ctx), inputs=('high', 'low', 'close'),
+             description='江恩线')
+    register('ma', lambda ctx, params: calculate_moving_averages(ctx), depends=('ma_series',),
+             description='移动平均线')
+    register('volume', lambda ctx, params: calculate_volume_analysis(ctx), inputs=('close', 'volume'),
+             description='量能分析')
+    register('turnover_rate', lambda ctx, params: calculate_turnover_rate(ctx, params['current_price']),
+             inputs=('close', 'volume', 'current_price'), description='换手率分析')
+    register('elliott_wave', lambda ctx, params: calculate_elliott_wave(ctx), description='艾略特波浪理论')
+    register('edwards_trend', lambda ctx, params: analyze_edwards_trend(ctx),
+             inputs=('high', 'low', 'close', 'volume'), description='爱德华兹趋势分析')
+    register('murphy_intermarket',
+             lambda ctx, params: analyze_murphy_intermarket(ctx, params.get('benchmarks')),
+             inputs=('high', 'low', 'close', 'volume', 'benchmarks'), description='墨菲市场间分析')
+    register('japanese_candlestick', lambda ctx, params: analyze_japanese_candlestick(ctx),
+             depends=('candlestick_patterns',), inputs=('open', 'high', 'low', 'close'),
+             description='日本蜡烛图分析')
+    return registry
+
+
+# 全局注册表实例
+indicator_registry = build_default_registry()
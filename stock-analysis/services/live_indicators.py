@@ -0,0 +1,117 @@
+"""
+盘中实时指标服务（分钟K线流式更新）
+"""
+import math
+import pandas as pd
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.async_data_service import async_data_service
+from utils.bars import Bars
+from utils.resample import OHLCVAggregator
+from utils.streaming_indicators import StreamingIndicators
+
+logger = logging.getLogger(__name__)
+
+
+def _clean(value):
+    """指标值转为JSON兼容（NaN -> None）"""
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return float(value)
+
+
+class LiveIndicatorService:
+    """盘中实时指标
+
+    每只股票、每个分钟周期保存一个 OHLCVAggregator 和一个 StreamingIndicators：
+    第一次请求时用本地1分钟K线初始化，之后每次只把新到的1分钟K线（以及可能被修正的最新一分钟）推入合成器，
+    完成的周期K线逐根 O(1) 更新指标，正在形成的周期K线以 final=False 推入（每次替换上一次的值），
+    不再对整段分钟K线重新计算。超过 max_streams 个时淘汰最久未使用的。
+    """
+
+    SEED_DAYS = 5           # 初始化使用的1分钟K线天数（与分钟K线分析一致）
+    MAX_STREAMS = 2048
+
+    def __init__(self, data_service=None, seed_days: int = SEED_DAYS, max_streams: int = MAX_STREAMS):
+        self.data_service = data_service or async_data_service
+        self.seed_days = seed_days
+        self.max_streams = max_streams
+        self._streams: 'OrderedDict[Tuple[str, int], Tuple[OHLCVAggregator, StreamingIndicators]]' = OrderedDict()
+        self.seeded = 0
+        self.updates = 0
+
+    async def get(self, symbol: str, minutes: int) -> Optional[Dict[str, Any]]:
+        """读取最新1分钟K线并更新指标，没有分钟数据时返回None"""
+        bars = await self.data_service.get_intraday_bars(symbol, 1, self.seed_days)
+        if bars is None or bars.empty:
+            return None
+        return self.feed(symbol, minutes, bars)
+
+    def feed(self, symbol: str, minutes: int, bars: Bars) -> Dict[str, Any]:
+        """推入1分钟K线（早于最新一分钟的已推入K线自动跳过，最新一分钟按新值替换），返回最新指标值"""
+        key = (symbol, minutes)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = (OHLCVAggregator(minutes), StreamingIndicators(symbol))
+            self._streams[key] = stream
+            self.seeded += 1
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        else:
+            self._streams.move_to_end(key)
+            self.updates += 1
+
+        aggregator, indicators = stream
+        completed = aggregator.push(bars)
+        if completed is not None:
+            indicators.extend(completed)
+        forming = aggregator.partial()
+        if forming is not None:
+            indicators.update(float(forming.high[-1]), float(forming.low[-1]), float(forming.close[-1]),
+                              int(forming.dates[-1]), final=False)
+        return self._result(symbol, minutes, indicators, forming)
+
+    @staticmethod
+    def _result(symbol: str, minutes: int, indicators: StreamingIndicators,
+                forming: Optional[Bars]) -> Dict[str, Any]:
+        committed = indicators.committed_date
+        forming_bar = None
+        if forming is not None:
+            forming_bar = {
+                'date': forming.date_strings()[-1],
+                'open': float(forming.open[-1]),
+                'high': float(forming.high[-1]),
+                'low': float(forming.low[-1]),
+                'close': float(forming.close[-1]),
+                'volume': float(forming.volume[-1])
+            }
+        return {
+            'symbol': symbol,
+            'timeframe': f"{minutes}m",
+            'bars': indicators.bars,
+            'last_completed': pd.Timestamp(committed, unit='s').strftime('%Y-%m-%d %H:%M')
+            if committed is not None else None,
+            'forming': forming_bar,
+            'indicators': _clean(indicators.values())
+        }
+
+    def clear(self):
+        self._streams.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'streams': len(self._streams),
+            'seeded': self.seeded,
+            'updates': self.updates
+        }
+
+
+# 全局实时指标服务实例
+live_indicators = LiveIndicatorService()
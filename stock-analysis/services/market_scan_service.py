@@ -0,0 +1,153 @@
+"""
+全市场指标扫描服务（本地K线库中的全部股票）
+"""
+from typing import Optional, Dict, Any, List
+import pandas as pd
+import asyncio
+import logging
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.async_data_service import async_data_service
+from services.data_service import history_start
+from services.history_store import HistoryStore
+from utils.bars import Bars
+from utils.candlestick_scanner import scan_market
+from utils.cross_section import stack_bars, analyze_market
+
+logger = logging.getLogger(__name__)
+
+
+class MarketScanService:
+    """全市场收盘后批量分析
+
+    从本地K线库读取全部股票最近 days 天的日K线，对齐为 股票 × 序号 二维数组后一次向量化计算全部指标、信号和蜡烛图形态，
+    结果缓存在内存中；后台任务每隔 refresh_interval 秒重新计算（K线库由分析请求和预热任务增量更新）。
+    只读取本地K线库，不访问上游数据源。
+    """
+
+    HISTORY_DAYS = 365          # 与单只股票分析使用的历史长度一致
+    REFRESH_INTERVAL = 3600     # 后台重新计算的间隔（秒）
+
+    def __init__(self, store: Optional[HistoryStore] = None, days: int = HISTORY_DAYS,
+                 refresh_interval: float = REFRESH_INTERVAL):
+        # 未指定时使用数据服务当前的K线库
+        self._store = store
+        self.days = days
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._result: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.last_duration: Optional[float] = None
+
+    @property
+    def store(self) -> HistoryStore:
+        return self._store or async_data_service.sync_service.history_store
+
+    def load_universe(self) -> List[Bars]:
+        """读取K线库中全部股票最近 days 天的日K线，读取失败或没有K线的股票跳过"""
+        store = self.store
+        start = history_start(self.days)
+        universe = []
+        for symbol in store.symbols():
+            stored = store.load(symbol)
+            if stored is None:
+                continue
+            records, meta = stored
+            records = records[records['date'] >= start]
+            if len(records):
+                universe.append(Bars.from_records(records, symbol, meta.get('name') or ''))
+        return universe
+
+    def scan(self) -> Dict[str, Any]:
+        """计算一次全市场指标并写入缓存"""
+        start = time.time()
+        universe = self.load_universe()
+        symbols, last_dates, arrays = stack_bars(universe)
+        signals = analyze_market(arrays['high'], arrays['low'], arrays['close'], arrays['volume'], symbols) \
+            if universe else {}
+        # 蜡烛图形态：每只股票最新一根K线上的形态，以及全市场各形态之后1/5/10根K线的表现
+        patterns = scan_market(arrays['open'], arrays['high'], arrays['low'], arrays['close'], symbols) \
+            if universe else {'latest': {}, 'statistics': {}}
+        # 每只股票最新K线的日期（停牌股票早于其他股票）
+        dates = pd.to_datetime(last_dates, unit='s').strftime('%Y-%m-%d').tolist()
+        for bars, date in zip(universe, dates):
+            if bars.symbol in signals:
+                signals[bars.symbol].update(name=bars.name, date=date)
+
+        self.last_duration = time.time() - start
+        result = {
+            'updated_at': time.time(),
+            'symbols': len(signals),
+            'duration': round(self.last_duration, 3),
+            'signals': signals,
+            'patterns': patterns
+        }
+        with self._lock:
+            self._result = result
+        self.runs += 1
+        logger.info(f"Market scan finished: {len(signals)} symbols in {self.last_duration:.2f}s")
+        return result
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最近一次扫描结果（尚未扫描时为None）"""
+        with self._lock:
+            return self._result
+
+    async def get(self, refresh: bool = False) -> Dict[str, Any]:
+        """扫描结果，没有缓存或 refresh=True 时在线程中重新计算"""
+        result = self.latest()
+        if result is None or refresh:
+            result = await asyncio.to_thread(self.scan)
+        return result
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.scan)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Market scan failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """启动后台扫描任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def clear(self):
+        with self._lock:
+            self._result = None
+
+    def stats(self) -> Dict[str, Any]:
+        result = self.latest()
+        return {
+            'symbols': result['symbols'] if result is not None else 0,
+            'updated_at': result['updated_at'] if result is not None else None,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_duration': self.last_duration,
+            'running': self._task is not None and not self._task.done()
+        }
+
+
+# 全局全市场扫描服务实例
+market_scan_service = MarketScanService()
@@ -0,0 +1,148 @@
+"""
+全市场实时行情快照服务
+"""
+import efinance as ef
+import pandas as pd
+import numpy as np
+from typing import Optional, Dict, Any, Callable, List, Tuple
+import logging
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.source_health import SourceHealthTracker, source_health
+from services.transport import Transport, transport as default_transport
+
+logger = logging.getLogger(__name__)
+
+
+class MarketQuoteSnapshot:
+    """全市场实时行情快照
+
+    每个刷新周期只拉取一次全市场行情表，按股票代码建立索引，
+    以列式数组保存，单只股票的查询直接在内存中 O(1) 完成。
+    """
+
+    REFRESH_INTERVAL = 15  # 快照刷新间隔（秒）
+    MAX_STALE = 120        # 刷新失败时允许继续使用旧快照的最长时间（秒）
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL, max_stale: float = MAX_STALE,
+                 fetcher: Optional[Callable[[], pd.DataFrame]] = None,
+                 health: Optional[SourceHealthTracker] = None,
+                 transport: Optional[Transport] = None):
+        self.refresh_interval = refresh_interval
+        self.max_stale = max_stale
+        self.transport = transport or default_transport
+        self._fetcher = fetcher or (
+            lambda: self.transport.call('ef.stock.get_realtime_quotes', ef.stock.get_realtime_quotes)
+        )
+        self.health = health or source_health
+        self._lock = threading.Lock()
+
+        # 列式存储：代码 -> 行号，各字段为等长数组，刷新时整体替换
+        self._table: Tuple[Dict[str, int], Dict[str, np.ndarray]] = ({}, {})
+
+        self._updated_at = 0.0
+        self._last_attempt = 0.0
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """查询单只股票的最新行情，快照中不存在或价格无效时返回None"""
+        self._ensure_fresh()
+        return self._lookup(symbol)
+
+    def get_many(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量查询，只返回快照中命中的股票"""
+        self._ensure_fresh()
+        results = {}
+        for symbol in symbols:
+            stock_data = self._lookup(symbol)
+            if stock_data is not None:
+                results[symbol] = stock_data
+        return results
+
+    def listing(self) -> List[Tuple[str, str]]:
+        """快照中全部股票的 (代码, 名称)，供代码表使用，与行情查询共用同一次全市场拉取"""
+        self._ensure_fresh()
+        if not self._is_usable():
+            raise ValueError("Market quote snapshot unavailable")
+        index, columns = self._table
+        names = columns['name']
+        return [(code.zfill(6), names[row].replace(' ', '')) for code, row in index.items()]
+
+    def _lookup(self, symbol: str) -> Optional[Dict[str, Any]]:
+        if not self._is_usable():
+            return None
+
+        # 先取出当前引用，刷新线程整体替换时不会读到新旧混合的数据
+        index, columns = self._table
+        row = index.get(symbol)
+        if row is None or np.isnan(columns['price'][row]):
+            return None
+
+        change = columns['change'][row]
+        return {
+            'name': columns['name'][row],
+            'current_price': float(columns['price'][row]),
+            'change_percent': float(change) if not np.isnan(change) else 0.0
+        }
+
+    def _is_usable(self) -> bool:
+        return bool(self._table[0]) and time.time() - self._updated_at < self.max_stale
+
+    def _ensure_fresh(self):
+        """快照过期时刷新，同一时刻只有一个线程请求上游"""
+        if time.time() - self._updated_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            now = time.time()
+            # 其他线程可能已经完成刷新，或者刚刚失败过
+            if now - self._updated_at < self.refresh_interval or \
+               now - self._last_attempt < self.refresh_interval:
+                return
+            self._last_attempt = now
+
+            if not self.health.allow('efinance'):
+                logger.info("efinance circuit open, skipping snapshot refresh")
+                return
+
+            try:
+                logger.info("Refreshing market quote snapshot...")
+                with self.health.track('efinance'):
+                    quotes = self._fetcher()
+                    self._load(quotes)
+                logger.info(f"Market quote snapshot refreshed: {len(self._table[0])} symbols "
+                            f"in {time.time() - now:.2f} seconds")
+            except Exception as e:
+                logger.warning(f"Market quote snapshot refresh failed: {e}")
+
+    def _load(self, quotes: pd.DataFrame):
+        """将行情表转换为按代码索引的列式数组"""
+        if quotes is None or quotes.empty:
+            raise ValueError("Empty realtime quotes")
+
+        codes = quotes['股票代码'].astype(str).to_numpy()
+        columns = {
+            'name': quotes['股票名称'].astype(str).to_numpy(dtype=object),
+            'market': quotes['市场类型'].to_numpy(dtype=object) if '市场类型' in quotes.columns
+            else np.full(len(codes), None, dtype=object),
+            'price': pd.to_numeric(quotes['最新价'], errors='coerce').to_numpy(dtype=np.float64),
+            'change': pd.to_numeric(quotes['涨跌幅'], errors='coerce').to_numpy(dtype=np.float64),
+        }
+        index = {code: row for row, code in enumerate(codes)}
+
+        self._table = (index, columns)
+        self._updated_at = time.time()
+
+    def clear(self):
+        """清空快照，下次查询时重新拉取"""
+        with self._lock:
+            self._table = ({}, {})
+            self._updated_at = 0.0
+            self._last_attempt = 0.0
+
+
+# 全局共享的行情快照，所有StockDataService实例共用
+market_snapshot = MarketQuoteSnapshot()
@@ -0,0 +1,152 @@
+"""
+并发请求合并（single-flight）工具
+"""
+from typing import Any, Callable, Dict, Hashable, List, Awaitable
+import asyncio
+import threading
+
+
+class _Call:
+    """一次进行中的上游调用"""
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """线程版请求合并
+
+    同一个 key 同时只有一个线程真正调用上游，其余线程等待并共享同一份结果（或异常）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """执行 fn，如果相同 key 的调用正在进行则等待其结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def do_many(self, keys: List[Hashable], fn: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """批量版本：fn 接收没有进行中调用的 key 列表并返回 {key: 结果}
+
+        其他线程正在请求的 key 直接等待其结果，缺失或失败的 key 不在返回值中。
+        """
+        with self._lock:
+            own = {}
+            waiting = {}
+            for key in dict.fromkeys(keys):
+                if key in self._calls:
+                    waiting[key] = self._calls[key]
+                else:
+                    own[key] = self._calls[key] = _Call()
+
+        results = {}
+        if own:
+            try:
+                fetched = fn(list(own))
+                for key, call in own.items():
+                    call.result = fetched.get(key)
+                results.update((key, value) for key, value in fetched.items() if key in own)
+            except Exception as e:
+                for call in own.values():
+                    call.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in own:
+                        del self._calls[key]
+                for call in own.values():
+                    call.event.set()
+
+        for key, call in waiting.items():
+            call.event.wait()
+            if call.error is None and call.result is not None:
+                results[key] = call.result
+        return results
+
+
+class AsyncSingleFlight:
+    """asyncio版请求合并
+
+    上游调用在独立的任务中执行，发起请求的协程被取消时不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def _start(self, keys: List[Hashable], coro: Awaitable) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        for key in keys:
+            self._calls[key] = task
+
+        def cleanup(finished: asyncio.Task):
+            for key in keys:
+                if self._calls.get(key) is finished:
+                    del self._calls[key]
+            # 所有等待者都已取消时，避免出现未读取异常的警告
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(cleanup)
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 fn，如果相同 key 的调用正在进行则等待其结果"""
+        task = self._calls.get(key)
+        if task is None:
+            task = self._start([key], fn())
+        return await asyncio.shield(task)
+
+    async def do_many(self, keys: List[Hashable],
+                      fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]) -> Dict[Hashable, Any]:
+        """批量版本：fn 接收没有进行中调用的 key 列表并返回 {key: 结果}
+
+        缺失或失败的 key 不在返回值中。
+        """
+        keys = list(dict.fromkeys(keys))
+        own = [key for key in keys if key not in self._calls]
+        if own:
+            self._start(own, fn(own))
+
+        tasks = {key: self._calls[key] for key in keys if key in self._calls}
+        unique_tasks = list(dict.fromkeys(tasks.values()))
+        outcomes = await asyncio.gather(*(asyncio.shield(task) for task in unique_tasks), return_exceptions=True)
+        outcome_by_task = dict(zip(unique_tasks, outcomes))
+
+        results = {}
+        for key, task in tasks.items():
+            outcome = outcome_by_task[task]
+            if isinstance(outcome, BaseException):
+                if key in own:
+                    # 本协程发起的调用失败时向上抛出，与同步版本保持一致
+                    raise outcome
+                continue
+            value = outcome.get(key) if outcome is not None else None
+            if value is not None:
+                results[key] = value
+        return results
@@ -0,0 +1,196 @@
+"""
+数据源健康状态与熔断服务
+"""
+from typing import Optional, Dict, Any, List
+from collections import deque
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 已知的上游数据源
+SOURCES = ['efinance', 'tencent', 'sina', 'netease']
+
+CLOSED = 'closed'        # 正常
+OPEN = 'open'            # 熔断中，跳过该数据源
+HALF_OPEN = 'half_open'  # 熔断冷却结束，放行一个探测请求
+
+
+class CircuitOpenError(Exception):
+    """数据源熔断中"""
+    pass
+
+
+class SourceHealth:
+    """单个数据源的健康统计"""
+
+    WINDOW = 50             # 统计最近多少次调用的成功率
+    LATENCY_ALPHA = 0.2     # 延迟指数加权平均系数
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcomes = deque(maxlen=self.WINDOW)
+        self.latency_ewma: Optional[float] = None
+        self.total_calls = 0
+        self.total_failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+
+    @property
+    def success_rate(self) -> float:
+        """最近窗口内的成功率，没有调用记录时视为1"""
+        if not self.outcomes:
+            return 1.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def record(self, success: bool, latency: float):
+        self.outcomes.append(success)
+        self.total_calls += 1
+        self.latency_ewma = latency if self.latency_ewma is None else \
+            self.LATENCY_ALPHA * latency + (1 - self.LATENCY_ALPHA) * self.latency_ewma
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source': self.name,
+            'state': self.state,
+            'success_rate': round(self.success_rate, 4),
+            'avg_latency_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            'recent_calls': len(self.outcomes),
+            'total_calls': self.total_calls,
+            'total_failures': self.total_failures,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'last_success_at': self.last_success_at,
+            'last_failure_at': self.last_failure_at,
+            'opened_at': self.opened_at if self.state != CLOSED else None
+        }
+
+
+class SourceHealthTracker:
+    """数据源健康跟踪器
+
+    记录每个数据源的延迟和错误率：连续失败或最近错误率过高时打开熔断器，
+    冷却 OPEN_DURATION 秒后放行一个探测请求，成功则恢复。
+    备用数据源的尝试顺序按最近成功率和延迟动态排序。
+    """
+
+    FAILURE_THRESHOLD = 5        # 连续失败次数达到该值时熔断
+    ERROR_RATE_THRESHOLD = 0.5   # 最近错误率超过该值时熔断
+    MIN_CALLS = 10               # 按错误率熔断所需的最少调用次数
+    OPEN_DURATION = 30.0         # 熔断冷却时间（秒）
+
+    def __init__(self, sources: Optional[List[str]] = None):
+        self._lock = threading.Lock()
+        self._health: Dict[str, SourceHealth] = {name: SourceHealth(name) for name in (sources or SOURCES)}
+
+    def _get(self, name: str) -> SourceHealth:
+        if name not in self._health:
+            self._health[name] = SourceHealth(name)
+        return self._health[name]
+
+    def allow(self, name: str) -> bool:
+        """数据源当前是否可以请求"""
+        with self._lock:
+            health = self._get(name)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN and time.time() - health.opened_at >= self.OPEN_DURATION:
+                health.state = HALF_OPEN
+                health.probe_in_flight = False
+            if health.state == HALF_OPEN and not health.probe_in_flight:
+                health.probe_in_flight = True
+                logger.info(f"Circuit half-open for {name}, sending probe request")
+                return True
+            return False
+
+    def record_success(self, name: str, latency: float):
+        with self._lock:
+            health = self._get(name)
+            health.record(True, latency)
+            health.consecutive_failures = 0
+            health.last_success_at = time.time()
+            if health.state != CLOSED:
+                logger.info(f"Circuit closed for {name}")
+                # 探测成功，清空旧的失败记录，避免立即再次按错误率熔断
+                health.outcomes.clear()
+                health.outcomes.append(True)
+            health.state = CLOSED
+            health.probe_in_flight = False
+
+    def record_failure(self, name: str, latency: float, error: Any = None):
+        with self._lock:
+            health = self._get(name)
+            health.record(False, latency)
+            health.total_failures += 1
+            health.consecutive_failures += 1
+            health.last_error = str(error) if error is not None else None
+            health.last_failure_at = time.time()
+
+            too_many_errors = len(health.outcomes) >= self.MIN_CALLS and \
+                1 - health.success_rate > self.ERROR_RATE_THRESHOLD
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.FAILURE_THRESHOLD or too_many_errors:
+                if health.state != OPEN:
+                    logger.warning(f"Circuit opened for {name}: {health.consecutive_failures} consecutive failures, "
+                                   f"success rate {health.success_rate:.0%}")
+                health.state = OPEN
+                health.opened_at = time.time()
+                health.probe_in_flight = False
+
+    @contextmanager
+    def track(self, name: str):
+        """记录一次上游调用：正常结束视为成功，抛出异常视为失败"""
+        start = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(name, time.time() - start, e)
+            raise
+        except BaseException:
+            # 请求被取消（如对冲请求落败）不计入统计，只释放探测名额
+            with self._lock:
+                self._get(name).probe_in_flight = False
+            raise
+        self.record_success(name, time.time() - start)
+
+    def order(self, names: List[str]) -> List[str]:
+        """按最近成功率（高优先）和延迟（低优先）排序，跳过熔断中的数据源
+
+        熔断状态在这里只做判断，真正发起请求前仍需调用 allow()。
+        所有数据源都在熔断时按原顺序返回，由 allow() 决定是否放行探测请求。
+        """
+        with self._lock:
+            now = time.time()
+            available = [
+                name for name in names
+                if self._get(name).state == CLOSED or now - self._get(name).opened_at >= self.OPEN_DURATION
+            ]
+            if not available:
+                return list(names)
+
+            def score(name: str):
+                health = self._get(name)
+                # 还没有调用记录的数据源排在同一成功率档位的最后
+                latency = health.latency_ewma if health.latency_ewma is not None else float('inf')
+                return (-round(health.success_rate, 1), latency)
+
+            return sorted(available, key=score)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """所有数据源的健康统计"""
+        with self._lock:
+            return {name: health.to_dict() for name, health in self._health.items()}
+
+    def reset(self):
+        with self._lock:
+            self._health = {name: SourceHealth(name) for name in self._health}
+
+
+# 全局共享的数据源健康跟踪器
+source_health = SourceHealthTracker()
@@ -0,0 +1,331 @@
+"""
+全市场股票代码表与搜索索引
+"""
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from bisect import bisect_left
+import asyncio
+import hashlib
+import logging
+import threading
+import json
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.quote_snapshot import MarketQuoteSnapshot, market_snapshot
+
+try:
+    from pypinyin import lazy_pinyin, Style
+    HAS_PYPINYIN = True
+except ImportError:
+    HAS_PYPINYIN = False
+
+logger = logging.getLogger(__name__)
+
+# 本地代码表快照：database/symbols.json
+DEFAULT_SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'symbols.json'
+)
+
+# 没有本地快照且上游不可用时使用的代码表
+FALLBACK_SYMBOLS = [
+    ('000001', '平安银行'),
+    ('000002', '万科A'),
+    ('600036', '招商银行'),
+    ('600519', '贵州茅台'),
+    ('000858', '五粮液')
+]
+
+# GB2312一级汉字按拼音排序，每个声母首字的区位码（不含 I/U/V）
+GB2312_INITIALS = [
+    (0xB0A1, 'A'), (0xB0C5, 'B'), (0xB2C1, 'C'), (0xB4EE, 'D'), (0xB6EA, 'E'), (0xB7A2, 'F'),
+    (0xB8C1, 'G'), (0xB9FE, 'H'), (0xBBF7, 'J'), (0xBFA6, 'K'), (0xC0AC, 'L'), (0xC2E8, 'M'),
+    (0xC4C3, 'N'), (0xC5B6, 'O'), (0xC5BE, 'P'), (0xC6DA, 'Q'), (0xC8BB, 'R'), (0xC8F6, 'S'),
+    (0xCBFA, 'T'), (0xCDDA, 'W'), (0xCEF4, 'X'), (0xD1B9, 'Y'), (0xD4D1, 'Z')
+]
+GB2312_LEVEL1_END = 0xD7F9  # 一级汉字最后一个（座）
+_GB2312_CODES = [code for code, _ in GB2312_INITIALS]
+
+# 股票名称中的多音字按常用读音处理（银行、重庆、厦门）
+POLYPHONE_INITIALS = {'行': 'H', '重': 'C', '厦': 'X'}
+
+# 匹配类别，数值越小排序越靠前
+MATCH_EXACT = 0
+MATCH_CODE_PREFIX = 1
+MATCH_PINYIN_PREFIX = 2
+MATCH_NAME_PREFIX = 3
+MATCH_NAME_CONTAINS = 4
+
+
+def market_of(symbol: str) -> str:
+    """按代码前缀判断交易所"""
+    if symbol.startswith(('6', '9')):
+        return '上海'
+    if symbol.startswith(('4', '8')) or symbol.startswith('92'):
+        return '北京'
+    return '深圳'
+
+
+def _char_initial(char: str) -> str:
+    """单个字符的拼音首字母（GB2312一级汉字），字母数字原样返回，其他字符忽略"""
+    if char.isascii():
+        return char.upper() if char.isalnum() else ''
+    if char in POLYPHONE_INITIALS:
+        return POLYPHONE_INITIALS[char]
+    # 全角字母数字转半角
+    if '０' <= char <= 'ｚ':
+        return _char_initial(chr(ord(char) - 0xFEE0))
+    try:
+        encoded = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+    code = (encoded[0] << 8) | encoded[1]
+    if code < _GB2312_CODES[0] or code > GB2312_LEVEL1_END:
+        # 二级汉字按部首排序，无法由区位码推出拼音
+        return ''
+    return GB2312_INITIALS[bisect_left(_GB2312_CODES, code + 1) - 1][1]
+
+
+def pinyin_initials(name: str) -> str:
+    """名称的拼音首字母，如 平安银行 -> PAYH、万科A -> WKA
+
+    安装了 pypinyin 时使用其结果（覆盖全部汉字和多音字常用读音），否则按GB2312区位码推算。
+    """
+    if HAS_PYPINYIN:
+        initials = lazy_pinyin(name, style=Style.FIRST_LETTER, errors=lambda chars: list(chars))
+        return ''.join(POLYPHONE_INITIALS.get(char) or (_char_initial(item[0]) if item else '')
+                       for char, item in zip(name, initials))
+    return ''.join(_char_initial(char) for char in name)
+
+
+def _prefix_range(keys: List[str], prefix: str) -> Tuple[int, int]:
+    """有序键列表中以 prefix 开头的区间"""
+    return bisect_left(keys, prefix), bisect_left(keys, prefix + '\uffff')
+
+
+class SymbolIndex:
+    """不可变的代码表索引
+
+    代码、拼音首字母、名称分别保存为有序键列表，前缀查询用二分查找定位区间，
+    相当于压平的前缀树；名称的单字和二元组倒排索引用于包含匹配。
+    索引构建完成后不再修改，重新加载时整体替换引用。
+    """
+
+    def __init__(self, symbols: List[Tuple[str, str]]):
+        self.records: List[Dict[str, str]] = [
+            {'symbol': symbol, 'name': name, 'market': market_of(symbol), 'pinyin': pinyin_initials(name)}
+            for symbol, name in symbols
+        ]
+        self._names = [record['name'].upper() for record in self.records]
+        self.by_symbol = {record['symbol']: i for i, record in enumerate(self.records)}
+        self.by_name: Dict[str, List[int]] = {}
+        for i, name in enumerate(self._names):
+            self.by_name.setdefault(name, []).append(i)
+
+        self._code_keys, self._code_ids = self._sorted_keys(record['symbol'] for record in self.records)
+        self._pinyin_keys, self._pinyin_ids = self._sorted_keys(record['pinyin'] for record in self.records)
+        self._name_keys, self._name_ids = self._sorted_keys(self._names)
+
+        # 倒排表按（名称长度, 代码）排序，包含匹配按顺序取够 limit 条即可停止
+        ranked = sorted(range(len(self.records)), key=lambda i: (len(self._names[i]), self.records[i]['symbol']))
+        self._grams: Dict[str, List[int]] = {}
+        for i in ranked:
+            name = self._names[i]
+            grams = set(name) | {name[j:j + 2] for j in range(len(name) - 1)}
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(i)
+
+    @staticmethod
+    def _sorted_keys(keys) -> Tuple[List[str], List[int]]:
+        pairs = sorted((key, i) for i, key in enumerate(keys) if key)
+        return [key for key, _ in pairs], [i for _, i in pairs]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _contains(self, query: str):
+        """名称包含 query 的记录：遍历最短的单字/二元组倒排表并校验，按排序依次产出"""
+        grams = [query] if len(query) == 1 else [query[j:j + 2] for j in range(len(query) - 1)]
+        postings = [self._grams.get(gram) for gram in grams]
+        if not all(postings):
+            return
+        for i in min(postings, key=len):
+            if query in self._names[i]:
+                yield i
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """按匹配类别排序返回：完全匹配、代码前缀、拼音首字母前缀、名称前缀、名称包含"""
+        query = query.strip().upper()
+        if not query or limit <= 0:
+            return []
+
+        results: List[Dict[str, Any]] = []
+        seen = set()
+
+        def collect(ids, match: int) -> bool:
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    results.append({**self.records[i], 'match': match})
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        exact = ([self.by_symbol[query]] if query in self.by_symbol else []) + self.by_name.get(query, [])
+        if collect(exact, MATCH_EXACT):
+            return results
+
+        for keys, ids, match in ((self._code_keys, self._code_ids, MATCH_CODE_PREFIX),
+                                 (self._pinyin_keys, self._pinyin_ids, MATCH_PINYIN_PREFIX),
+                                 (self._name_keys, self._name_ids, MATCH_NAME_PREFIX)):
+            lo, hi = _prefix_range(keys, query)
+            # 区间内已按键排序，较短（更接近完整匹配）的键在前，取够 limit 条即可停止
+            if lo < hi and collect(ids[lo:min(hi, lo + limit + len(seen))], match):
+                return results
+
+        collect(self._contains(query), MATCH_NAME_CONTAINS)
+        return results
+
+
+def listing_digest(symbols: List[Tuple[str, str]]) -> str:
+    """代码表摘要，用于判断上市、退市或更名"""
+    digest = hashlib.sha1()
+    for symbol, name in sorted(symbols):
+        digest.update(f"{symbol}\t{name}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SymbolMaster:
+    """全市场A股代码表
+
+    启动时从本地快照文件加载并建立索引；后台任务定期从全市场行情快照取得代码表，
+    有新股上市、退市或更名时重建索引并写回快照，查询始终读取当前索引，不被重建阻塞。
+    """
+
+    REFRESH_INTERVAL = 6 * 3600  # 代码表刷新间隔（秒）
+
+    def __init__(self, snapshot_path: str = DEFAULT_SNAPSHOT_PATH,
+                 fetcher: Optional[Callable[[], List[Tuple[str, str]]]] = None,
+                 refresh_interval: float = REFRESH_INTERVAL,
+                 quote_snapshot: Optional[MarketQuoteSnapshot] = None):
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        # 代码和名称直接取自全市场行情快照，不单独请求上游
+        self.quote_snapshot = quote_snapshot or market_snapshot
+        self._fetcher = fetcher or self.quote_snapshot.listing
+        self._lock = threading.Lock()
+        self._index: Optional[SymbolIndex] = None
+        self._digest: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.updated_at = 0.0
+        self.reloads = 0
+
+    @property
+    def index(self) -> SymbolIndex:
+        """当前索引，首次访问时从本地快照加载"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load_snapshot()
+        return self._index
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        return self.index.search(query, limit)
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, str]]:
+        index = self.index
+        row = index.by_symbol.get(symbol)
+        return index.records[row] if row is not None else None
+
+    def _load_snapshot(self):
+        symbols = FALLBACK_SYMBOLS
+        updated_at = 0.0
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                symbols = [tuple(item) for item in snapshot['symbols']]
+                updated_at = snapshot.get('updated_at', 0.0)
+            except Exception as e:
+                logger.warning(f"Failed to load symbol snapshot {self.snapshot_path}: {e}")
+        self._swap(symbols, updated_at)
+
+    def _swap(self, symbols: List[Tuple[str, str]], updated_at: float):
+        start = time.time()
+        index = SymbolIndex(symbols)
+        self._index = index
+        self._digest = listing_digest(symbols)
+        self.updated_at = updated_at
+        logger.info(f"Symbol index built: {len(index)} symbols in {time.time() - start:.3f} seconds")
+
+    def _save_snapshot(self, symbols: List[Tuple[str, str]]):
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': self.updated_at, 'symbols': symbols}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def refresh(self) -> bool:
+        """从全市场行情快照取得代码表，有变化时重建索引并写回快照，返回是否重建"""
+        symbols = sorted(set(self._fetcher() or []))
+        if not symbols:
+            raise ValueError("Empty stock listing")
+
+        self.index  # 确保已加载本地快照
+        with self._lock:
+            digest = listing_digest(symbols)
+            if digest == self._digest:
+                self.updated_at = time.time()
+                return False
+            self._swap(symbols, time.time())
+            self.reloads += 1
+        try:
+            self._save_snapshot(symbols)
+        except Exception as e:
+            logger.warning(f"Failed to save symbol snapshot: {e}")
+        return True
+
+    async def _run_forever(self):
+        while True:
+            # 快照足够新时不请求上游，重启不会额外拉取全市场行情
+            wait = self.updated_at + self.refresh_interval - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                if await asyncio.to_thread(self.refresh):
+                    logger.info(f"Symbol listing changed, index reloaded ({len(self.index)} symbols)")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Symbol listing refresh failed: {e}")
+                await asyncio.sleep(min(self.refresh_interval, 300))
+
+    def start(self):
+        """启动后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'symbols': len(self.index),
+            'updated_at': self.updated_at,
+            'reloads': self.reloads,
+            'pinyin_backend': 'pypinyin' if HAS_PYPINYIN else 'gb2312'
+        }
+
+
+# 全局共享的代码表
+symbol_master = SymbolMaster()
@@ -0,0 +1,304 @@
+"""
+上游数据请求传输层（实时请求、录制与回放）
+"""
+import httpx
+import requests
+import pandas as pd
+from typing import Optional, Dict, Any, Callable, List, Union
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import json
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 默认录制目录：database/replay
+DEFAULT_ARCHIVE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'replay'
+)
+
+# 随当天日期变化的参数不参与请求匹配，录制的数据在之后的日期仍可回放
+VOLATILE_PARAMS = {'beg', 'end', 'start'}
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class TransportError(Exception):
+    """回放中没有对应的录制数据，或注入的上游故障"""
+    pass
+
+
+class TransportResponse:
+    """HTTP响应（只保留数据服务用到的字段）"""
+    __slots__ = ('status_code', 'content')
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+
+def http_key(url: str) -> str:
+    """HTTP请求的匹配键：去掉随日期变化的查询参数"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in VOLATILE_PARAMS]
+    return 'GET ' + urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def call_key(name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """efinance等函数调用的匹配键"""
+    params = [repr(arg) for arg in args]
+    params += [f"{k}={v!r}" for k, v in sorted(kwargs.items()) if k not in VOLATILE_PARAMS]
+    return f"CALL {name}({', '.join(params)})"
+
+
+class LiveTransport:
+    """直接请求上游
+
+    同步请求复用 requests.Session，异步请求复用按事件循环懒加载的 httpx.AsyncClient 连接池。
+    """
+
+    MAX_CONNECTIONS = 20
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """按事件循环懒加载的连接池客户端"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.MAX_CONNECTIONS,
+                                    max_keepalive_connections=self.MAX_CONNECTIONS),
+                headers={'User-Agent': USER_AGENT}
+            )
+            self._client_loop = loop
+        return self._client
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10) -> TransportResponse:
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        return TransportResponse(response.status_code, response.content)
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0) -> TransportResponse:
+        response = await self.client.get(url, headers=headers, timeout=timeout)
+        return TransportResponse(response.status_code, response.content)
+
+    def call(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        """调用返回DataFrame的上游函数（如efinance接口）"""
+        return fn(*args, **kwargs)
+
+    async def aclose(self):
+        """关闭异步连接池"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+class ReplayArchive:
+    """录制数据目录
+
+    index.json 保存 {匹配键: [录制条目, ...]}，响应体和DataFrame分别保存为单独的文件。
+    同一个键多次录制时按顺序保存，回放时依次返回。
+    """
+
+    def __init__(self, archive_dir: str = DEFAULT_ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.archive_dir, 'index.json')
+        self._index: Dict[str, List[Dict[str, Any]]] = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    def _file_name(self, key: str, seq: int, suffix: str) -> str:
+        return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}_{seq}{suffix}"
+
+    def entries(self, key: str) -> List[Dict[str, Any]]:
+        return self._index.get(key, [])
+
+    def add(self, key: str, latency: float, response: Optional[TransportResponse] = None,
+            frame: Optional[pd.DataFrame] = None, error: Optional[Exception] = None):
+        """追加一条录制数据（响应、DataFrame或异常三选一）并写回索引"""
+        with self._lock:
+            entries = self._index.setdefault(key, [])
+            entry: Dict[str, Any] = {'latency': round(latency, 4)}
+            if error is not None:
+                entry['error'] = f"{type(error).__name__}: {error}"
+            elif frame is not None:
+                entry['frame'] = self._file_name(key, len(entries), '.pkl')
+                frame.to_pickle(os.path.join(self.archive_dir, entry['frame']))
+            else:
+                entry['status'] = response.status_code
+                entry['body'] = self._file_name(key, len(entries), '.bin')
+                with open(os.path.join(self.archive_dir, entry['body']), 'wb') as f:
+                    f.write(response.content)
+            entries.append(entry)
+
+            tmp_path = f"{self._index_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self._index_path)
+
+    def read_body(self, entry: Dict[str, Any]) -> bytes:
+        with open(os.path.join(self.archive_dir, entry['body']), 'rb') as f:
+            return f.read()
+
+    def read_frame(self, entry: Dict[str, Any]) -> pd.DataFrame:
+        """读取录制的DataFrame（读取后缓存在内存中，每次返回副本）"""
+        name = entry['frame']
+        if name not in self._frames:
+            self._frames[name] = pd.read_pickle(os.path.join(self.archive_dir, name))
+        return self._frames[name].copy()
+
+
+class RecordingTransport(LiveTransport):
+    """请求上游的同时录制响应（包括失败）"""
+
+    def __init__(self, archive: Optional[ReplayArchive] = None):
+        super().__init__()
+        self.archive = archive or ReplayArchive()
+
+    def _record(self, key: str, start: float, **kwargs):
+        try:
+            self.archive.add(key, time.time() - start, **kwargs)
+        except Exception as e:
+            logger.warning(f"Failed to record {key}: {e}")
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10) -> TransportResponse:
+        start = time.time()
+        try:
+            response = super().get(url, headers, timeout)
+        except Exception as e:
+            self._record(http_key(url), start, error=e)
+            raise
+        self._record(http_key(url), start, response=response)
+        return response
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0) -> TransportResponse:
+        start = time.time()
+        try:
+            response = await super().aget(url, headers, timeout)
+        except Exception as e:
+            self._record(http_key(url), start, error=e)
+            raise
+        self._record(http_key(url), start, response=response)
+        return response
+
+    def call(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        key = call_key(name, args, kwargs)
+        start = time.time()
+        try:
+            frame = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(key, start, error=e)
+            raise
+        self._record(key, start, frame=frame if frame is not None else pd.DataFrame())
+        return frame
+
+
+class ReplayTransport:
+    """回放录制的上游响应，不访问网络
+
+    latency 为None时按录制时的耗时等待，否则固定等待 latency 秒；jitter 为相对抖动幅度；
+    failure_rate 为随机注入故障的概率。同一个键录制了多条时依次返回，用完后重复最后一条。
+    随机数使用固定种子，相同请求序列的回放结果相同。
+    """
+
+    def __init__(self, archive: Optional[ReplayArchive] = None, latency: Optional[float] = None,
+                 jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.archive = archive or ReplayArchive()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cursors: Dict[str, int] = {}
+
+    def _next(self, key: str):
+        """取出下一条录制数据，返回(条目, 等待时间, 是否注入故障)"""
+        entries = self.archive.entries(key)
+        if not entries:
+            raise TransportError(f"No recorded response for {key}")
+        with self._lock:
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            entry = entries[min(cursor, len(entries) - 1)]
+            delay = entry['latency'] if self.latency is None else self.latency
+            delay *= 1 + self.jitter * self._rng.uniform(-1, 1)
+            inject_failure = self._rng.random() < self.failure_rate
+        return entry, max(delay, 0.0), inject_failure
+
+    def _resolve(self, key: str, entry: Dict[str, Any], inject_failure: bool):
+        if inject_failure:
+            raise TransportError(f"Injected failure for {key}")
+        if 'error' in entry:
+            raise TransportError(f"Recorded failure for {key}: {entry['error']}")
+        if 'frame' in entry:
+            return self.archive.read_frame(entry)
+        return TransportResponse(entry['status'], self.archive.read_body(entry))
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10) -> TransportResponse:
+        key = http_key(url)
+        entry, delay, inject_failure = self._next(key)
+        time.sleep(delay)
+        return self._resolve(key, entry, inject_failure)
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0) -> TransportResponse:
+        key = http_key(url)
+        entry, delay, inject_failure = self._next(key)
+        await asyncio.sleep(delay)
+        return self._resolve(key, entry, inject_failure)
+
+    def call(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        key = call_key(name, args, kwargs)
+        entry, delay, inject_failure = self._next(key)
+        time.sleep(delay)
+        return self._resolve(key, entry, inject_failure)
+
+    async def aclose(self):
+        pass
+
+
+def create_transport() -> 'Transport':
+    """按环境变量创建传输层
+
+    STOCK_DATA_TRANSPORT: live（默认）/ record / replay
+    STOCK_DATA_ARCHIVE: 录制目录，默认 database/replay
+    STOCK_REPLAY_LATENCY: 回放固定延迟（秒），不设置时使用录制时的耗时
+    STOCK_REPLAY_JITTER / STOCK_REPLAY_FAILURE_RATE / STOCK_REPLAY_SEED: 延迟抖动、故障注入概率、随机种子
+    """
+    mode = os.environ.get('STOCK_DATA_TRANSPORT', 'live').lower()
+    if mode == 'live':
+        return LiveTransport()
+
+    archive = ReplayArchive(os.environ.get('STOCK_DATA_ARCHIVE', DEFAULT_ARCHIVE_DIR))
+    if mode == 'record':
+        logger.info(f"Recording upstream responses to {archive.archive_dir}")
+        return RecordingTransport(archive)
+    if mode == 'replay':
+        latency = os.environ.get('STOCK_REPLAY_LATENCY')
+        logger.info(f"Replaying upstream responses from {archive.archive_dir}")
+        return ReplayTransport(
+            archive,
+            latency=float(latency) if latency else None,
+            jitter=float(os.environ.get('STOCK_REPLAY_JITTER', 0)),
+            failure_rate=float(os.environ.get('STOCK_REPLAY_FAILURE_RATE', 0)),
+            seed=int(os.environ.get('STOCK_REPLAY_SEED', 0))
+        )
+    raise ValueError(f"Unknown STOCK_DATA_TRANSPORT: {mode}")
+
+
+Transport = Union[LiveTransport, RecordingTransport, ReplayTransport]
+
+# 全局共享的传输层，所有数据服务共用
+transport = create_transport()
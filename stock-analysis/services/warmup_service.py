@@ -0,0 +1,146 @@
+"""
+缓存预热服务
+"""
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+import asyncio
+import logging
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.async_data_service import AsyncStockDataService, async_data_service
+from services.database_service import DatabaseService
+from services.history_cache import HistoryCache
+
+logger = logging.getLogger(__name__)
+
+QuoteLoader = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+SymbolTask = Callable[[str], Awaitable[Any]]
+
+
+class WarmupService:
+    """自选股缓存预热
+
+    启动时以及之后每隔 interval 秒（按开始时间计），读取所有用户的自选股，预先获取行情（一次批量请求）、
+    历史K线和分析结果，使重启后的第一批 /watchlist、/analyze 请求直接命中缓存。
+    历史K线和分析结果每次都强制刷新，同一只股票两次刷新相隔约 interval 秒，在缓存过期之前完成。
+    预热对上游的并发请求数不超过 max_concurrency，避免冷启动时与用户请求争抢上游。
+    """
+
+    MAX_CONCURRENCY = 2
+    # 比历史行情和分析结果的缓存时间短 15 秒，留出单次预热的耗时
+    INTERVAL = HistoryCache.TTL - 15
+
+    def __init__(self, db_service: Optional[DatabaseService] = None,
+                 data_service: Optional[AsyncStockDataService] = None,
+                 quote_loader: Optional[QuoteLoader] = None,
+                 analyzer: Optional[SymbolTask] = None,
+                 max_concurrency: int = MAX_CONCURRENCY, interval: float = INTERVAL,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep):
+        self.db_service = db_service or DatabaseService()
+        self.data_service = data_service or async_data_service
+        # 行情和分析结果由路由层的缓存函数写入，未提供时只预热数据服务
+        self.quote_loader = quote_loader or self.data_service.get_stock_info_many
+        self.analyzer = analyzer
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        # 计时和等待可替换（测试中使用虚拟时钟）
+        self._clock = clock
+        self._sleep = sleep
+
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.last_symbols = 0
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+
+    async def warm(self, symbols: Optional[List[str]] = None) -> Dict[str, Any]:
+        """执行一次预热，返回本次预热的统计"""
+        start = self._clock()
+        self.last_started = start
+        if symbols is None:
+            symbols = await asyncio.to_thread(self.db_service.get_all_watchlist_symbols)
+        failures = 0
+
+        if symbols:
+            try:
+                quotes = await self.quote_loader(symbols)
+                logger.info(f"Warmed quotes for {len(quotes)}/{len(symbols)} symbols")
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Quote warm-up failed: {e}")
+
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def warm_symbol(symbol: str) -> bool:
+                async with semaphore:
+                    try:
+                        # 强制刷新：缓存中仍未过期的条目也重新加载，刷新后重新计时
+                        await self.data_service.refresh_historical_bars(symbol)
+                        if self.analyzer is not None:
+                            await self.analyzer(symbol)
+                        return True
+                    except Exception as e:
+                        logger.warning(f"Warm-up failed for {symbol}: {e}")
+                        return False
+
+            results = await asyncio.gather(*(warm_symbol(symbol) for symbol in symbols))
+            failures += results.count(False)
+
+        self.runs += 1
+        self.failures += failures
+        self.last_symbols = len(symbols)
+        self.last_duration = self._clock() - start
+        logger.info(f"Cache warm-up finished: {len(symbols)} symbols, {failures} failures, "
+                    f"{self.last_duration:.2f}s")
+        if self.last_duration > self.interval:
+            logger.warning(f"Cache warm-up took {self.last_duration:.1f}s, longer than the {self.interval}s "
+                           f"interval; cached entries may expire between passes")
+        return {'symbols': len(symbols), 'failures': failures, 'duration': round(self.last_duration, 3)}
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self.warm()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache warm-up error: {e}")
+            # 按开始时间计算间隔：两次预热开始之间相隔 interval 秒，不因单次预热耗时而推迟
+            elapsed = self._clock() - self.last_started if self.last_started is not None else 0
+            await self._sleep(max(self.interval - elapsed, 0))
+
+    def start(self):
+        """启动预热任务（立即执行一次，之后定时执行）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        """停止预热任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'max_concurrency': self.max_concurrency,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_symbols': self.last_symbols,
+            'last_started': self.last_started,
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None
+        }
@@ -0,0 +1,6 @@
+"""
+测试公共配置：把 stock-analysis 目录加入导入路径（与各模块的 sys.path 处理一致）
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
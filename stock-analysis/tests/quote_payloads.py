@@ -0,0 +1,43 @@
+"""
+测试用的腾讯、新浪多股票行情响应（按接口的真实格式生成，GBK编码）
+"""
+from typing import Dict, Optional, Tuple
+
+from utils.quote_parsers import format_symbol_for_api
+
+# 代码 -> (名称, 最新价, 昨收)；值为None表示上游不认识该代码
+Quotes = Dict[str, Optional[Tuple[str, float, float]]]
+
+
+def tencent_payload(quotes: Quotes) -> bytes:
+    """v_sh600519="1~贵州茅台~600519~最新价~昨收~今开~成交量~...";  不存在的代码返回 v_pv_none_match"""
+    lines = []
+    for symbol, quote in quotes.items():
+        if quote is None:
+            lines.append('v_pv_none_match="1";')
+            continue
+        name, price, prev_close = quote
+        fields = ['1', name, symbol, f"{price:.2f}", f"{prev_close:.2f}", f"{prev_close:.2f}",
+                  '123456', '60000', '63456', '', '20240105150000', f"{price - prev_close:.2f}"]
+        lines.append(f'v_{format_symbol_for_api(symbol)}="{"~".join(fields)}";')
+    return '\n'.join(lines).encode('gbk')
+
+
+def sina_payload(quotes: Quotes) -> bytes:
+    """var hq_str_sh600519="贵州茅台,今开,昨收,最新价,最高,最低,...";  不存在的代码返回空串"""
+    lines = []
+    for symbol, quote in quotes.items():
+        if quote is None:
+            fields = []
+        else:
+            name, price, prev_close = quote
+            fields = [name, f"{prev_close:.3f}", f"{prev_close:.3f}", f"{price:.3f}",
+                      f"{max(price, prev_close):.3f}", f"{min(price, prev_close):.3f}",
+                      '0.000', '0.000', '123456', '1234567.000', '2024-01-05', '15:00:00', '00']
+        lines.append(f'var hq_str_{format_symbol_for_api(symbol)}="{",".join(fields)}";')
+    return '\n'.join(lines).encode('gbk')
+
+
+def requested_symbols(url: str, base_url: str):
+    """从多股票行情请求地址中取出不带市场前缀的代码"""
+    return [code[2:] for code in url[len(base_url):].split(',')]
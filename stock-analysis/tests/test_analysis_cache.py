@@ -0,0 +1,49 @@
+"""
+分析结果缓存测试
+"""
+import pytest
+
+from routers import stock_router
+from utils.synthetic_market import generate_bars
+
+
+@pytest.fixture(autouse=True)
+def small_cache(monkeypatch):
+    monkeypatch.setattr(stock_router, 'ANALYSIS_CACHE_MAX_ENTRIES', 3)
+    stock_router.analysis_cache.clear()
+    yield
+    stock_router.analysis_cache.clear()
+
+
+def test_cache_is_bounded_and_keeps_recently_used():
+    for symbol in ['000001', '000002', '000003']:
+        stock_router.set_cached_analysis(symbol, '1d', symbol)
+    # 读取使 000001 变为最近使用，写入第4项时淘汰最久未使用的 000002
+    assert stock_router.get_cached_analysis('000001') == '000001'
+    stock_router.set_cached_analysis('000004', '1d', '000004')
+    assert len(stock_router.analysis_cache) == 3
+    assert stock_router.get_cached_analysis('000002') is None
+    assert stock_router.get_cached_analysis('000001') == '000001'
+
+
+def test_expired_entries_are_pruned_on_write(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(stock_router.time, 'time', lambda: now[0])
+    stock_router.set_cached_analysis('000001', '1d', 'a', ['macd'])
+    stock_router.set_cached_analysis('000001', '1d', 'b', ['rsi'])
+    stock_router.set_cached_analysis('000002', '1d', 'c')
+    now[0] += stock_router.ANALYSIS_CACHE_DURATION
+    stock_router.set_cached_analysis('000003', '1d', 'd')
+    stock_router.set_cached_analysis('000004', '1d', 'e')
+    # 过期条目先被清理，未过期的条目不受影响
+    assert set(stock_router.analysis_cache) == {('000003', '1d', None), ('000004', '1d', None)}
+
+
+def test_partial_selection_is_taken_from_full_result():
+    full = stock_router.analysis_service.analyze_stock('000001', '平安银行', 10.0, 0.5, generate_bars('000001', 250))
+    stock_router.set_cached_analysis('000001', '1d', full)
+    # 全部指标的缓存结果只保留请求的指标
+    partial = stock_router.get_cached_analysis('000001', '1d', ['macd'])
+    assert list(partial.analysis['technical']) == ['macd']
+    assert partial.analysis['technical']['macd'] == full.analysis['technical']['macd']
+    assert stock_router.get_cached_analysis('000001', '1d') is full
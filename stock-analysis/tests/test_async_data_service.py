@@ -0,0 +1,158 @@
+"""
+异步行情对冲请求测试（桩传输层模拟慢、失败和只返回部分股票的数据源）
+"""
+import asyncio
+import time
+
+import pytest
+
+from quote_payloads import tencent_payload, sina_payload, requested_symbols
+from services.async_data_service import AsyncStockDataService
+from services.source_health import SourceHealthTracker
+from services.transport import TransportResponse
+
+TENCENT_URL = 'http://tencent.test/q='
+SINA_URL = 'http://sina.test/list='
+
+QUOTES = {
+    '600519': ('贵州茅台', 1700.0, 1690.0),
+    '000001': ('平安银行', 10.5, 10.0),
+    '300750': ('宁德时代', 180.0, 185.0),
+}
+
+
+class StubSource:
+    """一个上游数据源的行为：延迟、失败或只返回部分股票"""
+
+    def __init__(self, delay=0.0, error=None, known=None):
+        self.delay = delay
+        self.error = error
+        self.known = known
+        self.requests = []
+        self.cancelled = 0
+
+    def quotes(self, symbols):
+        known = self.known if self.known is not None else QUOTES
+        return {symbol: known.get(symbol) for symbol in symbols}
+
+
+class StubTransport:
+    """按地址前缀分发到各数据源的桩传输层"""
+
+    def __init__(self, tencent, sina):
+        self.sources = {TENCENT_URL: (tencent, tencent_payload), SINA_URL: (sina, sina_payload)}
+
+    async def aget(self, url, headers=None, timeout=5.0):
+        base_url = next(base for base in self.sources if url.startswith(base))
+        source, payload = self.sources[base_url]
+        symbols = requested_symbols(url, base_url)
+        source.requests.append(symbols)
+        try:
+            await asyncio.sleep(source.delay)
+        except asyncio.CancelledError:
+            source.cancelled += 1
+            raise
+        if source.error is not None:
+            raise source.error
+        return TransportResponse(200, payload(source.quotes(symbols)))
+
+    async def aclose(self):
+        pass
+
+
+class StubSnapshot:
+    """efinance全市场快照（同步接口，在线程中调用）"""
+
+    def __init__(self, delay=0.0, error=None, known=None):
+        self.source = StubSource(delay, error, known)
+
+    def get_many(self, symbols):
+        self.source.requests.append(list(symbols))
+        time.sleep(self.source.delay)
+        if self.source.error is not None:
+            raise self.source.error
+        return {symbol: {'name': quote[0], 'current_price': quote[1],
+                         'change_percent': round((quote[1] / quote[2] - 1) * 100, 4)}
+                for symbol, quote in self.source.quotes(symbols).items() if quote is not None}
+
+
+def make_service(snapshot, tencent, sina, hedge_delay=0.05):
+    return AsyncStockDataService(snapshot=snapshot, tencent_url=TENCENT_URL, sina_url=SINA_URL,
+                                 hedge_delay=hedge_delay, health=SourceHealthTracker(),
+                                 transport=StubTransport(tencent, sina))
+
+
+def fetch(service, symbols):
+    async def run():
+        start = time.perf_counter()
+        results = await service.get_stock_info_many(symbols)
+        return results, time.perf_counter() - start
+    return asyncio.run(run())
+
+
+def test_fast_primary_is_not_hedged():
+    snapshot, tencent, sina = StubSnapshot(), StubSource(), StubSource()
+    results, _ = fetch(make_service(snapshot, tencent, sina), list(QUOTES))
+    assert sorted(results) == sorted(QUOTES)
+    assert results['600519']['name'] == '贵州茅台'
+    assert tencent.requests == [] and sina.requests == []
+
+
+def test_hedge_fires_after_delay_and_slow_primary_loses():
+    snapshot, tencent, sina = StubSnapshot(delay=1.0), StubSource(), StubSource()
+    results, elapsed = fetch(make_service(snapshot, tencent, sina, hedge_delay=0.05), list(QUOTES))
+    assert sorted(results) == sorted(QUOTES)
+    assert results['000001']['current_price'] == 10.5
+    assert results['000001']['change_percent'] == pytest.approx(5.0)
+    # 对冲请求在 hedge_delay 后发出并先返回，不等待主数据源
+    assert tencent.requests == [list(QUOTES)]
+    assert sina.requests == []
+    assert elapsed < 0.8
+
+
+def test_failed_source_falls_back_without_waiting_for_hedge_delay():
+    snapshot, tencent, sina = StubSnapshot(error=RuntimeError('down')), StubSource(error=ConnectionError('reset')), \
+        StubSource()
+    service = make_service(snapshot, tencent, sina, hedge_delay=5.0)
+    results, elapsed = fetch(service, list(QUOTES))
+    assert sorted(results) == sorted(QUOTES)
+    assert len(tencent.requests) == 1 and len(sina.requests) == 1
+    assert elapsed < 2.0
+    assert service.health.stats()['tencent']['total_failures'] == 1
+    assert service.health.stats()['sina']['total_failures'] == 0
+
+
+def test_partial_results_request_only_missing_symbols():
+    snapshot = StubSnapshot(known={'600519': QUOTES['600519']})
+    tencent = StubSource(known={'000001': QUOTES['000001']})
+    sina = StubSource()
+    results, _ = fetch(make_service(snapshot, tencent, sina, hedge_delay=5.0), list(QUOTES))
+    assert sorted(results) == sorted(QUOTES)
+    assert tencent.requests == [['000001', '300750']]
+    assert sina.requests == [['300750']]
+
+
+def test_losing_requests_are_cancelled():
+    # 快照失败后请求腾讯，腾讯迟迟不返回时对冲请求新浪，新浪返回后取消腾讯的请求
+    snapshot, tencent, sina = StubSnapshot(error=RuntimeError('down')), StubSource(delay=5.0), StubSource()
+    service = make_service(snapshot, tencent, sina, hedge_delay=0.05)
+    results, elapsed = fetch(service, list(QUOTES))
+    assert sorted(results) == sorted(QUOTES)
+    assert elapsed < 2.0
+    assert tencent.cancelled == 1
+    # 被取消的请求不计入数据源健康统计
+    stats = service.health.stats()
+    assert stats['tencent']['total_calls'] == 0 and stats['sina']['total_calls'] == 1
+
+
+def test_all_sources_failing_returns_empty():
+    error = ConnectionError('reset')
+    service = make_service(StubSnapshot(error=error), StubSource(error=error), StubSource(error=error))
+    results, _ = fetch(service, list(QUOTES))
+    assert results == {}
+
+
+def test_unknown_symbols_are_missing_from_results():
+    snapshot = StubSnapshot(known={})
+    results, _ = fetch(make_service(snapshot, StubSource(), StubSource()), ['600519', '688888'])
+    assert list(results) == ['600519']
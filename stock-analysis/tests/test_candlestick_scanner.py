@@ -0,0 +1,144 @@
+"""
+蜡烛图形态扫描与原逐根识别实现的一致性测试
+"""
+import numpy as np
+import pytest
+
+from utils import technical_analysis
+from utils.candlestick_scanner import (PATTERNS, scan_patterns, latest_patterns, pattern_statistics,
+                                       forward_returns, scan_market)
+from utils.synthetic_market import generate_bars
+
+
+def legacy_single_patterns(o, h, l, c, index=-1):
+    """原 analyze_japanese_candlestick 中的单根K线识别"""
+    patterns = []
+    open_price, high_price, low_price, close_price = o[index], h[index], l[index], c[index]
+    body = abs(close_price - open_price)
+    upper_shadow = high_price - max(open_price, close_price)
+    lower_shadow = min(open_price, close_price) - low_price
+    total_range = high_price - low_price
+    if total_range == 0:
+        return patterns
+    if body / total_range < 0.1:
+        patterns.append(("十字星", "reversal", "中等"))
+    elif (lower_shadow > body * 2 and upper_shadow < body * 0.5):
+        if close_price > open_price:
+            patterns.append(("锤子线", "bullish", "强"))
+        else:
+            patterns.append(("上吊线", "bearish", "强"))
+    elif (upper_shadow > body * 2 and lower_shadow < body * 0.5):
+        if close_price < open_price:
+            patterns.append(("射击之星", "bearish", "强"))
+        else:
+            patterns.append(("倒锤子", "bullish", "中等"))
+    elif body / total_range > 0.7:
+        if close_price > open_price:
+            patterns.append(("长阳线", "bullish", "强"))
+        else:
+            patterns.append(("长阴线", "bearish", "强"))
+    elif (upper_shadow > body and lower_shadow > body):
+        patterns.append(("纺锤线", "neutral", "弱"))
+    return patterns
+
+
+def legacy_multi_patterns(o, h, l, c):
+    """原 analyze_japanese_candlestick 中的多根K线组合识别"""
+    patterns = []
+    if len(c) < 3:
+        return patterns
+    first_body = abs(c[-3] - o[-3])
+    second_body = abs(c[-2] - o[-2])
+    if (c[-3] < o[-3] and second_body < first_body * 0.5 and c[-1] > o[-1] and c[-1] > (c[-3] + o[-3]) / 2):
+        patterns.append(("早晨之星", "bullish", "强"))
+    elif (c[-3] > o[-3] and second_body < first_body * 0.5 and c[-1] < o[-1] and c[-1] < (c[-3] + o[-3]) / 2):
+        patterns.append(("黄昏之星", "bearish", "强"))
+    if (c[-2] < o[-2] and c[-1] > o[-1] and o[-1] < c[-2] and c[-1] > o[-2]):
+        patterns.append(("看涨吞没", "bullish", "强"))
+    elif (c[-2] > o[-2] and c[-1] < o[-1] and o[-1] > c[-2] and c[-1] < o[-2]):
+        patterns.append(("看跌吞没", "bearish", "强"))
+    if (c[-2] > o[-2] and c[-1] < o[-1] and o[-1] > h[-2] * 0.99 and c[-1] < (c[-2] + o[-2]) / 2):
+        patterns.append(("乌云盖顶", "bearish", "强"))
+    elif (c[-2] < o[-2] and c[-1] > o[-1] and o[-1] < l[-2] * 1.01 and c[-1] > (c[-2] + o[-2]) / 2):
+        patterns.append(("刺透形态", "bullish", "强"))
+    return patterns
+
+
+def random_candles(count, seed, rows=None):
+    """随机K线，包含十字星、一字板（振幅为0）和大量相等价格"""
+    rng = np.random.default_rng(seed)
+    shape = (count,) if rows is None else (rows, count)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, shape), axis=-1)), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.015, shape)), 2)
+    doji = rng.random(shape) < 0.1
+    open_[doji] = close[doji]
+    high = np.round(np.maximum(open_, close) * (1 + rng.exponential(0.008, shape)), 2)
+    low = np.round(np.minimum(open_, close) * (1 - rng.exponential(0.008, shape)), 2)
+    flat = rng.random(shape) < 0.03
+    open_[flat] = high[flat] = low[flat] = close[flat]
+    return open_, high, low, close
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_latest_patterns_match_legacy_loops_at_every_bar(seed):
+    o, h, l, c = random_candles(600, seed)
+    masks = scan_patterns(o, h, l, c)
+    matched = 0
+    for end in range(3, len(c) + 1):
+        window = slice(max(end - 5, 0), end)
+        recent = [values[window].tolist() for values in (o, h, l, c)]
+        expected = legacy_single_patterns(*recent) + legacy_multi_patterns(*recent)
+        actual = latest_patterns({key: mask[:end] for key, mask in masks.items()})
+        assert actual == expected, f"bar {end - 1}"
+        matched += bool(expected)
+    assert matched > 100
+
+
+def test_two_dimensional_scan_matches_rows():
+    o, h, l, c = random_candles(120, 5, rows=6)
+    masks = scan_patterns(o, h, l, c)
+    for row in range(6):
+        row_masks = scan_patterns(o[row], h[row], l[row], c[row])
+        for key, mask in row_masks.items():
+            np.testing.assert_array_equal(masks[key][row], mask, err_msg=key)
+
+
+def test_pattern_statistics_match_brute_force():
+    o, h, l, c = random_candles(400, 8)
+    masks = scan_patterns(o, h, l, c)
+    stats = pattern_statistics(masks, c, horizons=(1, 5))
+    for key, mask in masks.items():
+        assert stats[key]['count'] == int(mask.sum())
+        for horizon in (1, 5):
+            returns = [c[t + horizon] / c[t] - 1 for t in np.flatnonzero(mask) if t + horizon < len(c)]
+            if returns:
+                assert stats[key][f'avg_return_{horizon}'] == pytest.approx(np.mean(returns))
+                assert stats[key][f'win_rate_{horizon}'] == pytest.approx(np.mean(np.array(returns) > 0))
+            else:
+                assert stats[key][f'avg_return_{horizon}'] is None
+    assert np.isnan(forward_returns(c, 5)[-5:]).all()
+
+
+def test_scan_market_latest_patterns_per_symbol():
+    o, h, l, c = random_candles(60, 13, rows=20)
+    symbols = [f"{600000 + row}" for row in range(20)]
+    result = scan_market(o, h, l, c, symbols)
+    for row, symbol in enumerate(symbols):
+        names = [name for name, _, _ in latest_patterns(scan_patterns(o[row], h[row], l[row], c[row]))]
+        assert result['latest'].get(symbol, []) == names
+    assert set(result['statistics']) == {key for key, _, _, _ in PATTERNS}
+
+
+def test_candlestick_short_and_error_results_have_all_fields(monkeypatch):
+    data = generate_bars('600519', 120)
+    normal = technical_analysis.analyze_japanese_candlestick(data)
+    # 数据不足和出错时返回的字段与正常结果相同
+    short = technical_analysis.analyze_japanese_candlestick(data.iloc[:4])
+    assert set(short) == set(normal) and short['pattern_history'] == {}
+
+    def failing(ctx):
+        raise ValueError("broken")
+    monkeypatch.setattr(technical_analysis, 'candlestick_pattern_masks', failing)
+    fallback = technical_analysis.analyze_japanese_candlestick(data)
+    assert set(fallback) == set(normal)
+    assert fallback['pattern_history'] == {} and fallback['patterns_count'] == 0
@@ -0,0 +1,182 @@
+"""
+历史K线数据源选择测试（本地K线库、efinance熔断、网易备用源）和备用实时行情批量请求测试
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quote_payloads import tencent_payload, sina_payload, requested_symbols
+from services.data_service import StockDataService, history_start
+from services.history_cache import HistoryCache
+from services.history_store import HistoryStore, BAR_DTYPE
+from services.source_health import SourceHealthTracker, OPEN
+from services.transport import TransportResponse
+
+
+class StubTransport:
+    """记录全部上游请求；efinance 调用和 HTTP 请求都返回失败"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=10):
+        self.requests.append(url)
+        raise ConnectionError("upstream unavailable")
+
+    def call(self, name, fn, *args, **kwargs):
+        self.requests.append(name)
+        raise ConnectionError("upstream unavailable")
+
+
+def stored_records(count):
+    days = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=count)
+    close = 10 + np.arange(count) * 0.01
+    records = np.zeros(count, dtype=BAR_DTYPE)
+    records['date'] = days.values.astype('datetime64[D]')
+    records['open'] = records['close'] = close
+    records['high'] = close * 1.01
+    records['low'] = close * 0.99
+    records['volume'] = 1000
+    return records
+
+
+def trip(health, source):
+    for _ in range(health.FAILURE_THRESHOLD):
+        health.record_failure(source, 0.1, 'timeout')
+    assert health.stats()[source]['state'] == OPEN
+
+
+@pytest.fixture
+def service(tmp_path):
+    return StockDataService(history_store=HistoryStore(str(tmp_path / 'history')),
+                            minute_store=HistoryStore(str(tmp_path / 'minute')),
+                            health=SourceHealthTracker(), history_cache=HistoryCache(),
+                            transport=StubTransport())
+
+
+def save_store(service, symbol, updated_at):
+    service.history_store.save(symbol, stored_records(300), {
+        'name': '平安银行', 'covered_start': str(history_start(500)), 'updated_at': updated_at
+    })
+
+
+def test_fresh_store_is_read_while_efinance_circuit_open(service):
+    save_store(service, '000001', time.time())
+    trip(service.health, 'efinance')
+
+    bars = service.load_historical_bars('000001')
+    records = stored_records(300)
+    assert bars is not None and len(bars) == int((records['date'] >= history_start(365)).sum())
+    assert bars.name == '平安银行'
+    # 本地数据足够新，不请求任何上游
+    assert service.transport.requests == []
+
+
+def test_stale_store_is_served_when_efinance_circuit_open(service):
+    # 需要增量更新但efinance熔断：跳过补齐，继续使用本地数据
+    save_store(service, '000001', time.time() - 3600)
+    trip(service.health, 'efinance')
+
+    bars = service.load_historical_bars('000001')
+    assert bars is not None and not bars.empty
+    assert service.transport.requests == []
+
+
+def test_store_is_read_before_higher_ranked_netease(service):
+    save_store(service, '000001', time.time())
+    # 网易的成功率和延迟更好，排序在efinance之前
+    service.health.record_success('netease', 0.01)
+    service.health.record_failure('efinance', 0.5, 'timeout')
+    assert service.health.order(service.HISTORY_SOURCES)[0] == 'netease'
+
+    bars = service.load_historical_bars('000001')
+    assert bars is not None and not bars.empty
+    assert service.transport.requests == []
+
+
+def test_empty_store_falls_back_to_netease(service):
+    trip(service.health, 'efinance')
+    assert service.load_historical_bars('000002') is None
+    assert len(service.transport.requests) == 1
+    assert 'quotes.money.163.com' in service.transport.requests[0]
+
+
+TENCENT_URL = 'http://tencent.test/q='
+SINA_URL = 'http://sina.test/list='
+
+
+class QuoteTransport:
+    """按录制格式返回腾讯、新浪多股票行情；failing 中的数据源返回 HTTP 502"""
+
+    def __init__(self, quotes, failing=()):
+        self.quotes = quotes
+        self.failing = set(failing)
+        self.requests = {'tencent': [], 'sina': []}
+
+    def get(self, url, headers=None, timeout=10):
+        source, base_url, payload = ('tencent', TENCENT_URL, tencent_payload) if url.startswith(TENCENT_URL) \
+            else ('sina', SINA_URL, sina_payload)
+        symbols = requested_symbols(url, base_url)
+        self.requests[source].append(symbols)
+        if source in self.failing:
+            return TransportResponse(502, b'')
+        return TransportResponse(200, payload({symbol: self.quotes.get(symbol) for symbol in symbols}))
+
+
+class EmptySnapshot:
+    """efinance全市场快照不可用"""
+
+    def get_many(self, symbols):
+        raise ConnectionError("efinance unavailable")
+
+
+def market_quotes(count):
+    quotes = {f"{600000 + i}": (f"测试{i}号", 10.0 + i, 10.0) for i in range(count // 2)}
+    quotes.update({f"{1 + i:06d}": (f"喆堃{i}", 5.0, 5.0 + i * 0.01) for i in range(count - count // 2)})
+    return quotes
+
+
+def quote_service(tmp_path, transport):
+    return StockDataService(snapshot=EmptySnapshot(), history_store=HistoryStore(str(tmp_path / 'history')),
+                            minute_store=HistoryStore(str(tmp_path / 'minute')),
+                            tencent_url=TENCENT_URL, sina_url=SINA_URL, health=SourceHealthTracker(),
+                            transport=transport)
+
+
+def test_quotes_are_requested_in_batches(tmp_path):
+    quotes = market_quotes(120)
+    transport = QuoteTransport(quotes)
+    service = quote_service(tmp_path, transport)
+    results = service.get_stock_info_many(list(quotes))
+
+    assert [len(chunk) for chunk in transport.requests['tencent']] == [50, 50, 20]
+    assert transport.requests['sina'] == []
+    assert sorted(results) == sorted(quotes)
+    assert results['000003']['name'] == '喆堃2'
+    assert results['600001']['current_price'] == 11.0
+    assert results['600001']['change_percent'] == pytest.approx(10.0)
+
+
+def test_unknown_symbols_fall_through_to_sina(tmp_path):
+    quotes = market_quotes(60)
+    # 腾讯对不存在的代码返回 v_pv_none_match，新浪返回空串
+    symbols = list(quotes) + ['688888', '300999']
+    transport = QuoteTransport(quotes)
+    results = quote_service(tmp_path, transport).get_stock_info_many(symbols)
+
+    assert sorted(results) == sorted(quotes)
+    assert transport.requests['sina'] == [['688888', '300999']]
+
+
+def test_failed_batches_fall_back_to_sina(tmp_path):
+    quotes = market_quotes(70)
+    transport = QuoteTransport(quotes, failing={'tencent'})
+    service = quote_service(tmp_path, transport)
+    results = service.get_stock_info_many(list(quotes))
+
+    assert sorted(results) == sorted(quotes)
+    assert [len(chunk) for chunk in transport.requests['sina']] == [50, 20]
+    assert results['000001']['name'] == '喆堃0'
+    assert service.health.stats()['tencent']['total_failures'] == 2
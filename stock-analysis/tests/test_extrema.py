@@ -0,0 +1,90 @@
+"""
+局部极值与原逐点循环实现的一致性测试
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import technical_analysis
+from utils.extrema import window_extreme, rolling_extreme, find_peaks_and_troughs, support_resistance_levels
+from utils.synthetic_market import generate_bars
+
+
+def legacy_peaks_and_troughs(prices, window=5):
+    """原 calculate_elliott_wave 中的逐点实现"""
+    peaks = []
+    troughs = []
+    for i in range(window, len(prices) - window):
+        if all(prices[i] >= prices[i-j] for j in range(1, window+1)) and \
+           all(prices[i] >= prices[i+j] for j in range(1, window+1)):
+            peaks.append((i, prices[i]))
+        if all(prices[i] <= prices[i-j] for j in range(1, window+1)) and \
+           all(prices[i] <= prices[i+j] for j in range(1, window+1)):
+            troughs.append((i, prices[i]))
+    return peaks, troughs
+
+
+def legacy_support_resistance(highs, lows, window=10):
+    """原 analyze_edwards_trend 中的逐点实现"""
+    support_levels = []
+    resistance_levels = []
+    for i in range(window, len(lows) - window):
+        if lows[i] == min(lows[i-window:i+window+1]):
+            support_levels.append(lows[i])
+        if highs[i] == max(highs[i-window:i+window+1]):
+            resistance_levels.append(highs[i])
+    return support_levels, resistance_levels
+
+
+def prices(count, seed):
+    # 保留两位小数，制造大量相等的价格（检验平局的处理）
+    rng = np.random.default_rng(seed)
+    return np.round(10 + np.cumsum(rng.normal(0, 0.05, count)), 2)
+
+
+@pytest.mark.parametrize('count', [0, 1, 5, 11, 12, 21, 300])
+@pytest.mark.parametrize('window', [1, 2, 3, 5, 8, 10])
+def test_peaks_and_troughs_match_legacy_loop(count, window):
+    close = prices(count, seed=count + window)
+    assert find_peaks_and_troughs(close, window) == legacy_peaks_and_troughs(close.tolist(), window)
+
+
+@pytest.mark.parametrize('count', [0, 20, 21, 22, 500])
+@pytest.mark.parametrize('window', [1, 4, 10])
+def test_support_resistance_match_legacy_loop(count, window):
+    close = prices(count, seed=count * 7 + window)
+    highs = np.round(close + 0.05, 2)
+    lows = np.round(close - 0.05, 2)
+    support, resistance = support_resistance_levels(highs, lows, window)
+    legacy_support, legacy_resistance = legacy_support_resistance(highs.tolist(), lows.tolist(), window)
+    assert support.tolist() == legacy_support
+    assert resistance.tolist() == legacy_resistance
+
+
+@pytest.mark.parametrize('span', [1, 2, 3, 7, 8, 9, 31])
+def test_window_extreme_matches_brute_force(span):
+    values = prices(200, seed=span).reshape(2, 100)
+    for mode, reduce in (('max', np.max), ('min', np.min)):
+        expected = np.array([[reduce(row[k:k + span]) for k in range(100 - span + 1)] for row in values])
+        np.testing.assert_array_equal(window_extreme(values, span, mode), expected)
+
+
+def test_rolling_extreme_matches_pandas():
+    values = prices(250, seed=3)
+    series = pd.Series(values)
+    np.testing.assert_array_equal(rolling_extreme(values, 14, 'max'), series.rolling(14).max().to_numpy())
+    np.testing.assert_array_equal(rolling_extreme(values, 14, 'min'), series.rolling(14).min().to_numpy())
+    assert np.isnan(rolling_extreme(values[:5], 14)).all()
+
+
+def test_edwards_trend_error_result_has_all_fields(monkeypatch):
+    data = generate_bars('600519', 120)
+    normal = technical_analysis.analyze_edwards_trend(data)
+
+    def failing(ctx):
+        raise ValueError("broken")
+    monkeypatch.setattr(technical_analysis, 'trendline_series', failing)
+    fallback = technical_analysis.analyze_edwards_trend(data)
+    # 出错时返回的字段与正常结果相同
+    assert set(fallback) == set(normal)
+    assert fallback['trend_duration'] == 0 and fallback['trend_changes'] == []
@@ -0,0 +1,151 @@
+"""
+指数K线本地库增量补齐、内存缓存、并发合并和比较基准选择测试
+"""
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.history_store import HistoryStore, frame_to_bars
+from services.index_service import IndexService, BENCHMARK_INDEXES
+from services.source_health import SourceHealthTracker
+
+
+def index_frame(secid, name, days, seed):
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+    return pd.DataFrame({
+        '股票名称': name, '股票代码': secid.split('.')[1], '日期': days.strftime('%Y-%m-%d'),
+        '开盘': close * 0.999, '收盘': close, '最高': close * 1.01, '最低': close * 0.99,
+        '成交量': 1e8, '成交额': 1e11
+    })
+
+
+class IndexTransport:
+    """按请求的日期区间返回指数日K线；delay 模拟慢请求，failing 时抛出异常"""
+
+    def __init__(self, frames, sectors=None, delay=0.0):
+        self.frames = frames
+        self.sectors = sectors or {}
+        self.delay = delay
+        self.failing = False
+        self.calls = []
+
+    def call(self, name, fn, *args, **kwargs):
+        if name == 'ef.stock.get_belong_board':
+            return self.sectors.get(args[0])
+        secid = args[0]
+        self.calls.append((secid, kwargs['beg'], kwargs['end']))
+        time.sleep(self.delay)
+        if self.failing:
+            raise ConnectionError("upstream unavailable")
+        frame = self.frames.get(secid)
+        if frame is None:
+            return pd.DataFrame()
+        dates = pd.to_datetime(frame['日期'])
+        return frame[(dates >= pd.Timestamp(kwargs['beg'])) & (dates <= pd.Timestamp(kwargs['end']))]
+
+
+@pytest.fixture
+def days():
+    return pd.bdate_range(end=pd.Timestamp(datetime.now()).normalize(), periods=500)
+
+
+def make_service(tmp_path, transport, refresh_interval=300.0):
+    return IndexService(store=HistoryStore(str(tmp_path / 'index')), transport=transport,
+                        health=SourceHealthTracker(), refresh_interval=refresh_interval)
+
+
+def test_cold_load_fetches_full_range_and_stores(tmp_path, days):
+    frame = index_frame('1.000001', '上证指数', days, 1)
+    transport = IndexTransport({'1.000001': frame})
+    service = make_service(tmp_path, transport)
+
+    bars = service.get_index('1.000001', '上证指数')
+    assert len(bars) == 500 and bars.name == '上证指数'
+    np.testing.assert_allclose(bars.close, frame['收盘'])
+    assert len(transport.calls) == 1
+    records, meta = service.store.load('1.000001')
+    assert len(records) == 500 and meta['name'] == '上证指数'
+
+    # 有效期内直接返回内存中的同一份K线
+    assert service.get_index('1.000001') is bars
+    assert len(transport.calls) == 1
+
+
+def test_incremental_refresh_overwrites_last_bar_and_appends(tmp_path, days):
+    frame = index_frame('0.399001', '深证成指', days, 2)
+    store = HistoryStore(str(tmp_path / 'index'))
+    # 本地保存到倒数第4天，最后一根是盘中数据（收盘价与最终值不同）
+    stored = frame_to_bars(frame.iloc[:-3])
+    stored['close'][-1] = 1.0
+    store.save('0.399001', stored, {'name': '深证成指', 'covered_start': str(days[0].date()),
+                                    'updated_at': time.time() - 3600})
+
+    transport = IndexTransport({'0.399001': frame})
+    service = make_service(tmp_path, transport, refresh_interval=0.0)
+    bars = service.get_index('0.399001')
+
+    # 只从本地最后一根K线开始拉取
+    assert transport.calls == [('0.399001', days[-4].strftime('%Y%m%d'), datetime.now().strftime('%Y%m%d'))]
+    assert len(bars) == 500
+    np.testing.assert_allclose(bars.close, frame['收盘'])
+    records, meta = service.store.load('0.399001')
+    assert len(records) == 500 and meta['updated_at'] > time.time() - 60
+
+    # 内存缓存过期后再次只拉取最后一根
+    service.get_index('0.399001')
+    assert transport.calls[-1][1] == days[-1].strftime('%Y%m%d')
+
+
+def test_failed_refresh_keeps_cached_bars(tmp_path, days):
+    transport = IndexTransport({'1.000300': index_frame('1.000300', '沪深300', days, 3)})
+    service = make_service(tmp_path, transport, refresh_interval=0.0)
+    bars = service.get_index('1.000300')
+    transport.failing = True
+    assert service.get_index('1.000300') is bars
+    assert service.failures == 1
+
+    # 没有任何缓存时返回None
+    assert service.get_index('0.399006') is None
+
+
+def test_concurrent_requests_share_one_load(tmp_path, days):
+    transport = IndexTransport({'1.000001': index_frame('1.000001', '上证指数', days, 4)}, delay=0.2)
+    service = make_service(tmp_path, transport)
+    results = [None] * 8
+    barrier = threading.Barrier(len(results))
+
+    def worker(position):
+        barrier.wait()
+        results[position] = service.get_index('1.000001')
+
+    threads = [threading.Thread(target=worker, args=(position,)) for position in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(transport.calls) == 1
+    assert all(result is results[0] for result in results)
+    assert service.refreshes == 1
+
+
+def test_benchmarks_for_stock(tmp_path, days):
+    frames = {secid: index_frame(secid, name, days, seed) for seed, (secid, name) in
+              enumerate(BENCHMARK_INDEXES.values())}
+    frames['90.BK1033'] = index_frame('90.BK1033', '电池', days, 9)
+    # 深证成指没有数据：不包含在结果中
+    del frames['0.399001']
+    sectors = {'300750': pd.DataFrame({'板块代码': ['BK1033', 'BK0500'], '板块名称': ['电池', '创业板综']})}
+    service = make_service(tmp_path, IndexTransport(frames, sectors))
+
+    benchmarks = service.benchmarks_for('300750')
+    assert list(benchmarks) == ['创业板指', '沪深300', '电池']
+    assert list(service.benchmarks_for('300750', include_sector=False)) == ['创业板指', '沪深300']
+    assert service.sector_of('300750') == ('90.BK1033', '电池')
+    assert service.sector_of('600519') is None
+    assert service.stats()['sectors'] == 2
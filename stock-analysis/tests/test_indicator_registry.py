@@ -0,0 +1,109 @@
+"""
+指标注册表依赖图、按需计算和名称校验测试
+"""
+import numpy as np
+import pytest
+
+from services.indicator_registry import IndicatorRegistry, build_default_registry
+from utils.bars import as_bars
+from utils.indicator_context import IndicatorContext
+from utils.synthetic_market import generate_bars
+
+
+def counting(registry):
+    """把注册表中每一项的计算函数替换为记录调用顺序的包装"""
+    calls = []
+    for name in registry.names(public_only=False):
+        spec = registry.spec(name)
+
+        def compute(ctx, params, name=name, compute=spec.compute):
+            calls.append(name)
+            return compute(ctx, params)
+        spec.compute = compute
+    return calls
+
+
+@pytest.fixture
+def ctx():
+    return IndicatorContext(as_bars(generate_bars('600519', 250)))
+
+
+def small_registry():
+    registry = IndicatorRegistry()
+    registry.register('base', lambda ctx, params: 1, public=False)
+    registry.register('left', lambda ctx, params: params['results']['base'] + 1, depends=('base',), public=False)
+    registry.register('a', lambda ctx, params: 'a', depends=('left',))
+    registry.register('b', lambda ctx, params: 'b', depends=('base',))
+    registry.register('c', lambda ctx, params: 'c')
+    return registry
+
+
+def test_plan_contains_only_the_required_subgraph_in_order():
+    registry = small_registry()
+    assert registry.plan(['a']) == ['base', 'left', 'a']
+    assert registry.plan(['b']) == ['base', 'b']
+    assert registry.plan(['c']) == ['c']
+    # 顺序和重复不影响计划，计划按注册（拓扑）顺序
+    assert registry.plan(['c', 'a', 'a']) == ['base', 'left', 'a', 'c']
+    assert registry.plan() == ['base', 'left', 'a', 'b', 'c']
+    assert registry.names() == ['a', 'b', 'c']
+
+
+def test_shared_dependencies_are_evaluated_once_in_order():
+    registry = small_registry()
+    calls = counting(registry)
+    results = registry.evaluate(None, ['b', 'a'], results={'base': 1})
+    assert calls == ['base', 'left', 'a', 'b']
+    # 只返回请求的项，按请求顺序
+    assert list(results) == ['b', 'a']
+
+
+def test_unknown_and_internal_names_are_rejected():
+    registry = small_registry()
+    for names in (['missing'], ['a', 'left'], ['base']):
+        with pytest.raises(ValueError, match='Unsupported indicators'):
+            registry.validate(names)
+        with pytest.raises(ValueError):
+            registry.evaluate(None, names)
+    assert registry.validate(['a', 'c', 'a']) == ['a', 'c']
+
+    with pytest.raises(ValueError, match='already registered'):
+        registry.register('a', lambda ctx, params: None)
+    # 依赖必须先注册，因此不会出现环
+    with pytest.raises(ValueError, match='Unknown dependencies'):
+        registry.register('d', lambda ctx, params: None, depends=('e',))
+
+
+def test_default_selection_computes_only_its_subgraph(ctx):
+    registry = build_default_registry()
+    calls = counting(registry)
+    results = registry.evaluate(ctx, ['rsi', 'macd'], current_price=100.0)
+    assert calls == ['macd_series', 'rsi_series', 'macd', 'rsi']
+    assert list(results) == ['rsi', 'macd']
+
+    calls.clear()
+    registry.evaluate(ctx, ['japanese_candlestick', 'turnover_rate'], current_price=100.0)
+    assert calls == ['candlestick_patterns', 'turnover_rate', 'japanese_candlestick']
+
+
+def test_selection_matches_full_evaluation(ctx):
+    registry = build_default_registry()
+    full = registry.evaluate(IndicatorContext(ctx.bars), current_price=100.0)
+    assert list(full) == registry.names()
+    assert len(full) == 13
+    subset = registry.evaluate(ctx, ['kdj', 'boll', 'ma'], current_price=100.0)
+    for name, result in subset.items():
+        for key, value in result.items():
+            expected = full[name][key]
+            if isinstance(value, float):
+                assert value == pytest.approx(expected, nan_ok=True), f"{name}.{key}"
+            else:
+                assert np.all(value == expected), f"{name}.{key}"
+
+
+def test_describe_lists_public_indicators_with_dependencies():
+    registry = build_default_registry()
+    described = {item['name']: item for item in registry.describe()}
+    assert list(described) == registry.names()
+    assert described['macd']['depends'] == ['macd_series']
+    assert 'benchmarks' in described['murphy_intermarket']['inputs']
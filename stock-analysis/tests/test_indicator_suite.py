@@ -0,0 +1,17 @@
+"""
+指标黄金值回归检查（benchmarks/indicator_suite.py --skip-timing）
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITE = os.path.join(ROOT, 'benchmarks', 'indicator_suite.py')
+
+
+def test_indicator_outputs_match_golden_values():
+    # 耗时和内存依赖机器，只比较结果数值，不重复计时
+    completed = subprocess.run([sys.executable, SUITE, '--skip-timing', '--repeat', '0'],
+                               cwd=ROOT, capture_output=True, text=True, timeout=600)
+    assert completed.returncode == 0, completed.stdout[-4000:] + completed.stderr[-4000:]
+    assert 'No regressions' in completed.stdout
@@ -0,0 +1,174 @@
+"""
+指标内核各实现（纯Python循环、NumPy/pandas 回退、numba）的一致性测试
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import kernels
+from utils.kernels import ROW_VECTORIZE_MIN_ROWS
+
+try:
+    from numba import njit
+    NUMBA_PATHS = {
+        'numba': {
+            '_recursive_smooth': njit(kernels._recursive_smooth_loop),
+            '_wilder_average': njit(kernels._wilder_average_loop),
+            '_parabolic_sar': njit(kernels._parabolic_sar_loop),
+            '_zigzag': njit(kernels._zigzag_loop),
+        }
+    }
+except ImportError:
+    NUMBA_PATHS = {}
+
+# 递推平滑内核的各实现；NumPy 回退版本按行数分为沿时间（pandas ewm）和沿股票（逐日向量）两种
+SMOOTH_PATHS = {
+    'loop': {'_recursive_smooth': kernels._recursive_smooth_loop, '_wilder_average': kernels._wilder_average_loop},
+    'numpy': {'_recursive_smooth': kernels._recursive_smooth_numpy, '_wilder_average': kernels._wilder_average_numpy},
+    **{name: {key: impl for key, impl in path.items() if key in ('_recursive_smooth', '_wilder_average')}
+       for name, path in NUMBA_PATHS.items()},
+}
+BRANCH_PATHS = {
+    'loop': {'_parabolic_sar': kernels._parabolic_sar_loop, '_zigzag': kernels._zigzag_loop},
+    **{name: {key: impl for key, impl in path.items() if key in ('_parabolic_sar', '_zigzag')}
+       for name, path in NUMBA_PATHS.items()},
+}
+
+
+def use_path(monkeypatch, path):
+    for name, impl in path.items():
+        monkeypatch.setattr(kernels, name, impl)
+
+
+def random_prices(rows, count, seed=0, gaps=True):
+    """随机价格（二维），包括前面未上市、中间停牌（NaN）的行"""
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, (rows, count)), axis=1))
+    if gaps:
+        for row in range(0, rows, 3):
+            close[row, :rng.integers(1, count // 2)] = np.nan
+        for row in range(1, rows, 4):
+            start = rng.integers(0, count - 10)
+            close[row, start:start + rng.integers(1, 10)] = np.nan
+    return close
+
+
+def scalar_rsi(close, period=14):
+    """逐点的Wilder RSI参考实现（只处理没有缺失值的序列）"""
+    result = [np.nan] * len(close)
+    gains, losses = [], []
+    avg_gain = avg_loss = 0.0
+    for t in range(1, len(close)):
+        change = close[t] - close[t - 1]
+        gains.append(max(change, 0.0))
+        losses.append(max(-change, 0.0))
+        if len(gains) == period:
+            avg_gain, avg_loss = sum(gains) / period, sum(losses) / period
+        elif len(gains) > period:
+            avg_gain = (avg_gain * (period - 1) + gains[-1]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[-1]) / period
+        if len(gains) >= period:
+            total = avg_gain + avg_loss
+            result[t] = 100.0 * avg_gain / total if total else 0.0
+    return np.array(result)
+
+
+@pytest.mark.parametrize('rows', [1, 5, ROW_VECTORIZE_MIN_ROWS + 8])
+@pytest.mark.parametrize('path', sorted(SMOOTH_PATHS))
+def test_recursive_smooth_paths_agree(monkeypatch, path, rows):
+    values = random_prices(rows, 300, seed=rows)
+    expected = kernels._recursive_smooth_loop(values, 2.0 / 13, 50.0)
+    use_path(monkeypatch, SMOOTH_PATHS[path])
+    np.testing.assert_allclose(kernels.recursive_smooth(values, 2.0 / 13, 50.0), expected,
+                               rtol=1e-12, equal_nan=True)
+
+
+def test_recursive_smooth_matches_pandas_ema():
+    # 初值取第一个值时就是 adjust=False 的EMA
+    values = random_prices(1, 400, gaps=False)[0]
+    alpha = 2.0 / 13
+    expected = pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(kernels.recursive_smooth(values, alpha, values[0]), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('rows', [1, 5, ROW_VECTORIZE_MIN_ROWS + 8])
+@pytest.mark.parametrize('path', sorted(SMOOTH_PATHS))
+def test_wilder_average_paths_agree(monkeypatch, path, rows):
+    values = random_prices(rows, 300, seed=rows + 1)
+    # 有效值不足 period 个的行全部为NaN
+    values[-1, :-10] = np.nan
+    expected = kernels._wilder_average_loop(values, 14)
+    use_path(monkeypatch, SMOOTH_PATHS[path])
+    np.testing.assert_allclose(kernels.wilder_average(values, 14), expected, rtol=1e-10, equal_nan=True)
+
+
+@pytest.mark.parametrize('rows', [1, ROW_VECTORIZE_MIN_ROWS + 8])
+@pytest.mark.parametrize('path', sorted(SMOOTH_PATHS))
+def test_wilder_rsi_paths_agree(monkeypatch, path, rows):
+    close = random_prices(rows, 300, seed=rows + 2, gaps=False)
+    # 连续不变的价格：涨跌均为0时RSI为0
+    close[0, 100:130] = close[0, 100]
+    use_path(monkeypatch, SMOOTH_PATHS[path])
+    rsi = kernels.wilder_rsi(close, 14)
+    for row in range(rows):
+        np.testing.assert_allclose(rsi[row], scalar_rsi(close[row].tolist()), rtol=1e-9, atol=1e-9,
+                                   equal_nan=True)
+
+
+@pytest.mark.parametrize('rows', [1, 5, ROW_VECTORIZE_MIN_ROWS + 8])
+@pytest.mark.parametrize('path', sorted(SMOOTH_PATHS))
+def test_kdj_paths_agree(monkeypatch, path, rows):
+    close = random_prices(rows, 250, seed=rows + 3)
+    frame = pd.DataFrame(close.T)
+    highest, lowest = frame.rolling(9).max().to_numpy().T * 1.01, frame.rolling(9).min().to_numpy().T * 0.99
+    use_path(monkeypatch, SMOOTH_PATHS['loop'])
+    expected = kernels.stochastic_kdj(highest, lowest, close)
+    use_path(monkeypatch, SMOOTH_PATHS[path])
+    actual = kernels.stochastic_kdj(highest, lowest, close)
+    for key in ('k', 'd', 'j'):
+        np.testing.assert_allclose(actual[key], expected[key], rtol=1e-12, equal_nan=True, err_msg=key)
+
+
+def random_bars(count, seed):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    high = close * (1 + rng.uniform(0, 0.02, count))
+    low = close * (1 - rng.uniform(0, 0.02, count))
+    return high, low, close
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 500])
+@pytest.mark.parametrize('path', sorted(BRANCH_PATHS))
+def test_parabolic_sar_paths_agree(monkeypatch, path, count):
+    high, low, _ = random_bars(count, seed=count)
+    expected = kernels._parabolic_sar_loop(high, low, 0.02, 0.2)
+    use_path(monkeypatch, BRANCH_PATHS[path])
+    sar = kernels.parabolic_sar(high, low)
+    np.testing.assert_allclose(sar, expected, rtol=1e-12, equal_nan=True)
+    if count:
+        assert np.isnan(sar[0])
+    if count > 1:
+        assert np.isfinite(sar[1:]).all()
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 500])
+@pytest.mark.parametrize('path', sorted(BRANCH_PATHS))
+def test_zigzag_paths_agree(monkeypatch, path, count):
+    _, _, close = random_bars(count, seed=count + 7)
+    expected = kernels._zigzag_loop(close, 0.05)
+    use_path(monkeypatch, BRANCH_PATHS[path])
+    pivots = kernels.zigzag(close, 0.05)
+    np.testing.assert_array_equal(pivots, expected)
+    assert pivots.dtype == np.int8
+
+    # 转折点高低交替，相邻已确认转折点之间的变动不小于阈值（最后一个转折点尚未确认）
+    index = np.flatnonzero(pivots)
+    assert (np.diff(pivots[index]) != 0).all()
+    for left, right in zip(index[:-2], index[1:-1]):
+        assert abs(close[right] / close[left] - 1) >= 0.05 - 1e-12
+
+
+def test_warm_up_reports_backend():
+    backend, elapsed = kernels.warm_up()
+    assert backend == ('numba' if kernels.HAS_NUMBA else 'numpy')
+    assert elapsed >= 0
@@ -0,0 +1,132 @@
+"""
+全市场扫描与单只股票指标计算的一致性测试
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.history_store import HistoryStore, BAR_DTYPE
+from services.market_scan_service import MarketScanService
+from utils import technical_analysis as ta
+from utils.bars import Bars
+from utils.candlestick_scanner import latest_patterns
+
+# analyze_market 字段 -> (calculate_* 函数, 结果字段)
+FIELD_MAP = {
+    'macd': (ta.calculate_macd, 'macd'),
+    'macd_signal': (ta.calculate_macd, 'signal'),
+    'macd_histogram': (ta.calculate_macd, 'histogram'),
+    'macd_trend': (ta.calculate_macd, 'trend'),
+    'k': (ta.calculate_kdj, 'k'),
+    'd': (ta.calculate_kdj, 'd'),
+    'j': (ta.calculate_kdj, 'j'),
+    'kdj_signal': (ta.calculate_kdj, 'signal'),
+    'rsi': (ta.calculate_rsi, 'rsi'),
+    'rsi_signal': (ta.calculate_rsi, 'signal'),
+    'boll_upper': (ta.calculate_bollinger_bands, 'upper'),
+    'boll_middle': (ta.calculate_bollinger_bands, 'middle'),
+    'boll_lower': (ta.calculate_bollinger_bands, 'lower'),
+    'boll_position': (ta.calculate_bollinger_bands, 'position'),
+    'boll_squeeze': (ta.calculate_bollinger_bands, 'squeeze'),
+    'wr': (ta.calculate_williams_r, 'wr'),
+    'wr_signal': (ta.calculate_williams_r, 'signal'),
+    'ma5': (ta.calculate_moving_averages, 'ma5'),
+    'ma10': (ta.calculate_moving_averages, 'ma10'),
+    'ma20': (ta.calculate_moving_averages, 'ma20'),
+    'ma60': (ta.calculate_moving_averages, 'ma60'),
+    'ma_bullish_alignment': (ta.calculate_moving_averages, 'bullish_alignment'),
+    'ma_cross_signal': (ta.calculate_moving_averages, 'cross_signal'),
+    'above_ma20': (ta.calculate_moving_averages, 'above_ma20'),
+    'current_volume': (ta.calculate_volume_analysis, 'current_volume'),
+    'volume_ma5': (ta.calculate_volume_analysis, 'volume_ma5'),
+    'volume_ma10': (ta.calculate_volume_analysis, 'volume_ma10'),
+    'volume_ratio': (ta.calculate_volume_analysis, 'volume_ratio'),
+    'volume_price_signal': (ta.calculate_volume_analysis, 'volume_price_signal'),
+}
+
+
+def make_records(dates, seed):
+    rng = np.random.default_rng(seed)
+    count = len(dates)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    records = np.zeros(count, dtype=BAR_DTYPE)
+    records['date'] = np.asarray(dates, dtype='datetime64[D]')
+    records['close'] = close
+    records['open'] = close * (1 + rng.normal(0, 0.01, count))
+    records['high'] = np.maximum(records['open'], close) * (1 + rng.uniform(0, 0.02, count))
+    records['low'] = np.minimum(records['open'], close) * (1 - rng.uniform(0, 0.02, count))
+    records['volume'] = rng.integers(1000, 100000, count)
+    records['amount'] = records['volume'] * close
+    return records
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    days = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=1), periods=240)
+    universe = {
+        '600000': days,                                 # 完整历史
+        '300001': days[-45:],                           # 上市较晚：对齐后前面为NaN
+        '000002': days[-1:],                            # 只有一根K线
+        '000003': days.delete(np.arange(100, 130)),     # 中间停牌30天
+        '000004': days[:-10],                           # 最近10天停牌，最新K线早于其他股票
+    }
+    for seed, (symbol, dates) in enumerate(universe.items()):
+        store.save(symbol, make_records(dates, seed), {'name': f'股票{symbol}'})
+    return store
+
+
+@pytest.mark.skipif(ta.HAS_TALIB, reason="talib 的 MACD/布林带与非talib实现定义不同")
+def test_scan_matches_per_symbol_indicators(store):
+    service = MarketScanService(store=store)
+    result = service.scan()
+    signals = result['signals']
+    assert sorted(signals) == sorted(store.symbols())
+    assert result['symbols'] == 5
+
+    for symbol in store.symbols():
+        records, meta = store.load(symbol)
+        bars = Bars.from_records(records, symbol, meta['name'])
+        row = signals[symbol]
+        assert row['name'] == meta['name']
+        assert row['date'] == bars.date_strings()[-1]
+        expected = {}
+        for field, (calculate, key) in FIELD_MAP.items():
+            if calculate not in expected:
+                expected[calculate] = calculate(bars)
+            value = expected[calculate][key]
+            if isinstance(value, str) or isinstance(value, (bool, np.bool_)):
+                assert row[field] == value, f"{symbol} {field}"
+            else:
+                assert row[field] == pytest.approx(float(value), rel=1e-9, abs=1e-9), f"{symbol} {field}"
+
+
+def test_scan_is_cached_until_refresh(store):
+    service = MarketScanService(store=store)
+    first = asyncio.run(service.get())
+    assert asyncio.run(service.get()) is first
+    store.save('600001', make_records(pd.bdate_range(end=pd.Timestamp.now(), periods=30), 9), {'name': ''})
+    refreshed = asyncio.run(service.get(refresh=True))
+    assert refreshed['symbols'] == 6
+    assert service.stats()['runs'] == 2
+
+
+def test_empty_store(tmp_path):
+    service = MarketScanService(store=HistoryStore(str(tmp_path / 'empty')))
+    assert service.scan()['signals'] == {}
+
+
+def test_scan_reports_latest_candlestick_patterns(store):
+    result = MarketScanService(store=store).scan()
+    counts = {}
+    for symbol in store.symbols():
+        records, _ = store.load(symbol)
+        masks = ta.candlestick_pattern_masks(Bars.from_records(records, symbol))
+        expected = [name for name, _, _ in latest_patterns(masks)]
+        assert result['patterns']['latest'].get(symbol, []) == expected
+        for key, mask in masks.items():
+            counts[key] = counts.get(key, 0) + int(mask.sum())
+    # 右对齐时补在前面的NaN不会被识别为形态，全市场统计等于各股票之和
+    assert {key: item['count'] for key, item in result['patterns']['statistics'].items()} == counts
@@ -0,0 +1,93 @@
+"""
+行情接口响应解析测试
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from quote_payloads import tencent_payload, sina_payload
+from utils.quote_parsers import parse_netease_csv, parse_tencent_quotes, parse_sina_quotes, quotes_to_dict
+
+HEADER = '日期,股票代码,名称,收盘价,最高价,最低价,开盘价,成交量,成交金额'
+
+
+def netease_csv(*rows: str) -> bytes:
+    return '\r\n'.join((HEADER,) + rows).encode('gbk') + b'\r\n'
+
+
+def test_netease_csv_ascending_float_columns():
+    frame = parse_netease_csv(netease_csv(
+        "2024-01-03,'600519,贵州茅台,12.5,12.8,12.1,12.2,1000,12500.0",
+        "2024-01-02,'600519,贵州茅台,12.0,12.3,11.8,11.9,800,9600.0"
+    ))
+    assert list(frame['日期']) == [pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-03')]
+    assert list(frame['收盘']) == [12.0, 12.5]
+    assert list(frame['开盘']) == [11.9, 12.2]
+    assert all(frame[column].dtype == np.float64 for column in ['收盘', '最高', '最低', '开盘', '成交量', '成交额'])
+
+
+def test_netease_csv_drops_suspended_days():
+    # 停牌日三种形式：空字段、None、价格为0
+    frame = parse_netease_csv(netease_csv(
+        "2024-01-05,'600519,贵州茅台,12.5,12.8,12.1,12.2,1000,12500.0",
+        "2024-01-04,'600519,贵州茅台,,,,,,",
+        "2024-01-03,'600519,贵州茅台,None,None,None,None,0,None",
+        "2024-01-02,'600519,贵州茅台,0.0,0.0,0.0,0.0,0,0.0",
+        "2024-01-01,'600519,贵州茅台,12.0,12.3,11.8,11.9,800,9600.0"
+    ))
+    assert list(frame['日期']) == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-05')]
+    assert list(frame['收盘']) == [12.0, 12.5]
+
+
+def test_netease_csv_keeps_row_with_missing_amount():
+    frame = parse_netease_csv(netease_csv("2024-01-02,'600519,贵州茅台,12.0,12.3,11.8,11.9,800,"))
+    assert len(frame) == 1
+    assert np.isnan(frame['成交额'].iloc[0])
+
+
+def test_netease_csv_empty_payload():
+    frame = parse_netease_csv(netease_csv())
+    assert frame.empty
+    assert '收盘' in frame.columns
+
+
+# GBK（非GB2312）汉字和 *ST 前缀的名称
+QUOTES = {
+    '600519': ('贵州茅台', 1700.0, 1690.0),
+    '000001': ('平安银行', 10.5, 10.0),
+    '300750': ('宁德时代', 180.0, 185.0),
+    '002415': ('*ST喆堃', 3.3, 3.0),
+    '688888': None,
+}
+
+
+def decode(payload: bytes) -> str:
+    return payload.decode('gb18030')
+
+
+def test_tencent_multi_symbol_payload():
+    quotes = quotes_to_dict(parse_tencent_quotes(decode(tencent_payload(QUOTES))))
+    assert list(quotes) == ['600519', '000001', '300750', '002415']
+    assert quotes['002415']['name'] == '*ST喆堃'
+    assert quotes['600519']['current_price'] == 1700.0
+    assert quotes['300750']['change_percent'] == pytest.approx((180 / 185 - 1) * 100)
+
+
+def test_sina_multi_symbol_payload():
+    quotes = quotes_to_dict(parse_sina_quotes(decode(sina_payload(QUOTES))))
+    # 不存在的代码返回空串，不出现在结果中
+    assert list(quotes) == ['600519', '000001', '300750', '002415']
+    assert quotes['002415']['name'] == '*ST喆堃'
+    assert quotes['000001']['change_percent'] == pytest.approx(5.0)
+
+
+def test_payload_with_only_unknown_symbols():
+    assert parse_tencent_quotes(decode(tencent_payload({'688888': None}))).empty
+    assert parse_sina_quotes(decode(sina_payload({'688888': None}))).empty
+    assert parse_tencent_quotes('').empty
+
+
+def test_zero_prev_close_has_zero_change():
+    # 新股上市首日等昨收为0的情况
+    quotes = quotes_to_dict(parse_sina_quotes(decode(sina_payload({'301000': ('新股', 20.0, 0.0)}))))
+    assert quotes['301000']['change_percent'] == 0.0
@@ -0,0 +1,108 @@
+"""
+指数日期对齐、相对强度和大盘指数选择测试
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.index_service import market_benchmarks
+from utils.relative_strength import align_to, relative_strength, simple_returns
+
+
+def trading_days(count, end='2024-06-28'):
+    return pd.bdate_range(end=end, periods=count).values.astype('datetime64[D]')
+
+
+def prices(count, seed, drift=0.0005):
+    rng = np.random.default_rng(seed)
+    return 10 * np.exp(np.cumsum(rng.normal(drift, 0.015, count)))
+
+
+def test_align_to_matches_dates_with_gaps():
+    # 指数 2024-06-17 至 06-28，其中 06-20 缺失
+    index_dates = np.delete(trading_days(10), 3)
+    index_values = np.arange(9, dtype=float) + 100
+    # 个股：早于指数开始、指数缺失、周末和晚于指数结束的日期
+    dates = np.array(['2024-06-10', '2024-06-17', '2024-06-19', '2024-06-20', '2024-06-22', '2024-06-28',
+                      '2024-07-01'], dtype='datetime64[D]')
+    aligned = align_to(dates, index_dates, index_values)
+    expected = pd.Series(index_values, index=index_dates).reindex(dates).to_numpy()
+    np.testing.assert_array_equal(aligned, expected)
+    assert list(np.isnan(aligned)) == [True, False, False, True, True, False, True]
+    assert aligned[-2] == 108
+
+    assert np.isnan(align_to(dates, index_dates[:0], index_values[:0])).all()
+
+
+def test_relative_strength_uses_common_days_only():
+    dates = trading_days(200)
+    stock = prices(200, 1)
+    index = prices(200, 2, drift=0.0002)
+    # 个股停牌（没有K线）和指数缺失的日期互不重叠
+    suspended = np.zeros(200, dtype=bool)
+    suspended[150:158] = True
+    index_missing = np.zeros(200, dtype=bool)
+    index_missing[[60, 185, 190]] = True
+
+    stock_dates, stock_close = dates[~suspended], stock[~suspended]
+    aligned = align_to(stock_dates, dates[~index_missing], index[~index_missing])
+    result = relative_strength(stock_close, aligned, period=20, window=60)
+
+    frame = pd.DataFrame({'stock': stock, 'index': index})[~suspended & ~index_missing]
+    assert result['common_days'] == len(frame)
+    tail = frame.iloc[-20:]
+    stock_change = (tail['stock'].iloc[-1] / tail['stock'].iloc[0] - 1) * 100
+    index_change = (tail['index'].iloc[-1] / tail['index'].iloc[0] - 1) * 100
+    assert result['stock_change'] == pytest.approx(stock_change)
+    assert result['benchmark_change'] == pytest.approx(index_change)
+    assert result['relative_strength'] == pytest.approx(stock_change - index_change)
+    ratio = frame['stock'] / frame['index']
+    assert result['rs_ratio'] == pytest.approx(ratio.iloc[-1])
+    assert result['rs_ratio_change'] == pytest.approx((ratio.iloc[-1] / ratio.iloc[-20] - 1) * 100)
+    assert result['rs_above_mean'] == bool(ratio.iloc[-1] > ratio.iloc[-20:].mean())
+
+    returns = frame.pct_change().iloc[-60:]
+    slope = np.polyfit(returns['index'], returns['stock'], 1)[0]
+    assert result['beta'] == pytest.approx(slope, rel=1e-9)
+    assert result['correlation'] == pytest.approx(returns.corr().iloc[0, 1], rel=1e-9)
+
+
+def test_relative_strength_too_few_common_days():
+    dates = trading_days(60)
+    stock = prices(60, 3)
+    # 指数只覆盖最后19个交易日
+    aligned = align_to(dates, dates[-19:], prices(19, 4))
+    assert relative_strength(stock, aligned, period=20) is None
+    assert relative_strength(stock, align_to(dates, dates[:0], np.empty(0)), period=20) is None
+
+    # 共同日期够 period 但不够 window 个收益率：涨跌幅有值，贝塔为NaN
+    aligned = align_to(dates, dates[-30:], prices(30, 5))
+    result = relative_strength(stock, aligned, period=20, window=60)
+    assert result['common_days'] == 30
+    assert np.isfinite(result['relative_strength'])
+    assert np.isnan(result['beta']) and np.isnan(result['correlation'])
+
+
+def test_relative_strength_ignores_non_positive_benchmark():
+    stock = prices(40, 6)
+    benchmark = prices(40, 7)
+    benchmark[-5] = 0.0
+    result = relative_strength(stock, benchmark, period=20, window=10)
+    assert result['common_days'] == 39
+
+
+def test_simple_returns_rows():
+    values = np.array([[10.0, 11.0, 9.9], [1.0, np.nan, 2.0]])
+    np.testing.assert_allclose(simple_returns(values), [[np.nan, 0.1, -0.1], [np.nan, np.nan, np.nan]],
+                               equal_nan=True)
+
+
+@pytest.mark.parametrize('symbol, expected', [
+    ('600519', ['sse', 'csi300']),
+    ('688981', ['sse', 'csi300']),
+    ('000001', ['szse', 'csi300']),
+    ('300750', ['chinext', 'szse', 'csi300']),
+    ('830799', ['csi300']),
+])
+def test_market_benchmarks(symbol, expected):
+    assert market_benchmarks(symbol) == expected
@@ -0,0 +1,99 @@
+"""
+滚动回归与滚动贝塔在长序列上的数值精度测试（与 np.polyfit / np.corrcoef 比较）
+"""
+import numpy as np
+import pytest
+
+from utils.relative_strength import rolling_beta
+from utils.rolling_regression import rolling_regression, window_moments
+
+LONG = 25000
+
+
+def trending_prices(count, seed=1):
+    # 长期上涨到很高的价位，窗口内的波动相对价位很小，最容易出现大数相减
+    rng = np.random.default_rng(seed)
+    return 10 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, count)))
+
+
+def sample_ends(count, window, step=97):
+    return range(window - 1, count, step)
+
+
+@pytest.mark.parametrize('window', [20, 60])
+def test_regression_matches_polyfit_on_long_series(window):
+    prices = trending_prices(LONG)
+    result = rolling_regression(prices, window)
+    x = np.arange(window)
+    for end in list(sample_ends(LONG, window)) + [LONG - 1]:
+        segment = prices[end - window + 1:end + 1]
+        slope, intercept = np.polyfit(x, segment, 1)
+        scale = np.abs(segment).max()
+        assert result['slope'][end] == pytest.approx(slope, abs=1e-10 * scale), end
+        assert result['intercept'][end] == pytest.approx(intercept, abs=1e-10 * scale), end
+        assert result['correlation'][end] == pytest.approx(np.corrcoef(x, segment)[0, 1], abs=1e-9), end
+    assert np.isnan(result['slope'][:window - 1]).all()
+
+
+def test_regression_gaps_flat_windows_and_rows():
+    prices = trending_prices(3000, seed=2)
+    prices[1000:1005] = np.nan
+    prices[2000:2030] = prices[2000]
+    result = rolling_regression(np.vstack([prices, prices[::-1]]), 20)
+
+    # 窗口内有NaN时全部为NaN，价格不变的窗口斜率为0、相关系数为NaN
+    assert np.isnan(result['slope'][0, 1000:1024]).all()
+    assert np.isfinite(result['slope'][0, 1024])
+    assert result['slope'][0, 2025] == pytest.approx(0.0, abs=1e-9)
+    assert np.isnan(result['correlation'][0, 2019:2030]).all()
+
+    # 二维输入逐行计算
+    reversed_row = rolling_regression(prices[::-1], 20)
+    for key in ('slope', 'intercept', 'correlation'):
+        np.testing.assert_allclose(result[key][1], reversed_row[key], rtol=1e-12, atol=1e-12, equal_nan=True)
+
+
+def test_window_moments_across_block_boundaries():
+    rng = np.random.default_rng(5)
+    x = 100 + np.cumsum(rng.normal(0, 1, 1000))
+    y = 1e4 + np.cumsum(rng.normal(0, 1, 1000))
+    moments, gaps = window_moments(x, y, 300)
+    assert not gaps.any()
+    for start in (0, 1, 211, 256, 299, 300, 512, 700):
+        xs, ys = x[start:start + 300], y[start:start + 300]
+        assert moments['mean_x'][start] == pytest.approx(xs.mean(), rel=1e-13)
+        assert moments['mean_y'][start] == pytest.approx(ys.mean(), rel=1e-13)
+        assert moments['xx'][start] == pytest.approx(((xs - xs.mean()) ** 2).sum(), rel=1e-11)
+        assert moments['yy'][start] == pytest.approx(((ys - ys.mean()) ** 2).sum(), rel=1e-11)
+        assert moments['xy'][start] == pytest.approx(((xs - xs.mean()) * (ys - ys.mean())).sum(), rel=1e-11)
+
+
+def test_rolling_beta_matches_polyfit_on_long_series():
+    rng = np.random.default_rng(3)
+    benchmark = rng.normal(0.0005, 0.01, LONG)
+    returns = 0.8 * benchmark + rng.normal(0.0003, 0.01, LONG)
+    # 加上较大的常数偏移，放大大数相减的误差
+    benchmark, returns = benchmark + 5, returns + 5
+    returns[12000:12003] = np.nan
+    result = rolling_beta(returns, benchmark, 60)
+
+    for end in sample_ends(LONG, 60, step=89):
+        xs, ys = benchmark[end - 59:end + 1], returns[end - 59:end + 1]
+        if np.isnan(ys).any():
+            assert np.isnan(result['beta'][end]) and np.isnan(result['correlation'][end])
+            continue
+        assert result['beta'][end] == pytest.approx(np.polyfit(xs, ys, 1)[0], rel=1e-9), end
+        assert result['correlation'][end] == pytest.approx(np.corrcoef(xs, ys)[0, 1], abs=1e-9), end
+
+
+def test_rolling_beta_broadcasts_benchmark_over_rows():
+    rng = np.random.default_rng(4)
+    benchmark = rng.normal(0, 0.01, 500)
+    returns = rng.normal(0, 0.01, (3, 500))
+    benchmark[:5] = np.nan
+    result = rolling_beta(returns, benchmark, 60)
+    for row in range(3):
+        single = rolling_beta(returns[row], benchmark, 60)
+        np.testing.assert_allclose(result['beta'][row], single['beta'], rtol=1e-12, equal_nan=True)
+    assert np.isnan(result['beta'][:, :64]).all()
+    assert np.isfinite(result['beta'][:, 64:]).all()
@@ -0,0 +1,227 @@
+"""
+股票分析路由测试（桩数据服务，不访问上游）
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import stock_router
+from services.indicator_registry import indicator_registry
+from utils.bars import as_bars
+from utils.indicator_context import IndicatorContext
+from utils.synthetic_market import generate_bars
+from utils.technical_analysis import calculate_macd, calculate_rsi, indicator_series
+
+
+class StubDataService:
+    """记录调用参数的桩数据服务；daily/intraday 为None时表示没有数据"""
+
+    def __init__(self, daily=None, intraday=None, quote=True):
+        self.daily = daily
+        self.intraday = intraday
+        self.quote = quote
+        self.calls = []
+        self.sync_service = SimpleNamespace(INTRADAY_RETENTION_DAYS=30)
+
+    async def get_stock_info(self, symbol):
+        self.calls.append(('quote', symbol))
+        if not self.quote:
+            return None
+        return {'name': '贵州茅台', 'current_price': float(self.daily.close[-1]) if self.daily is not None else 100.0,
+                'change_percent': 1.2}
+
+    async def get_historical_bars(self, symbol, days=365):
+        self.calls.append(('daily', symbol, days))
+        return self.daily
+
+    async def get_intraday_bars(self, symbol, minutes=1, days=1):
+        self.calls.append(('intraday', symbol, minutes, days))
+        return self.intraday
+
+    def generate_mock_data(self, symbol, current_price, days=252):
+        self.calls.append(('mock', symbol, days))
+        return generate_bars(symbol, days, last_close=current_price)
+
+
+class StubIndexService:
+    async def get_benchmarks(self, symbol, include_sector=True):
+        return {}
+
+
+@pytest.fixture
+def daily_bars():
+    return as_bars(generate_bars('600519', 300))
+
+
+@pytest.fixture
+def data_service(monkeypatch, daily_bars):
+    service = StubDataService(daily=daily_bars)
+    monkeypatch.setattr(stock_router, 'data_service', service)
+    monkeypatch.setattr(stock_router, 'index_service', StubIndexService())
+    stock_router.analysis_cache.clear()
+    yield service
+    stock_router.analysis_cache.clear()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(stock_router.router)
+    return TestClient(app)
+
+
+def analyze(client, **body):
+    return client.post('/analyze', json={'symbol': '600519', **body})
+
+
+def test_analyze_returns_only_selected_indicators(client, data_service, daily_bars):
+    response = analyze(client, indicators=['macd', 'rsi'])
+    assert response.status_code == 200
+    technical = response.json()['analysis']['technical']
+    assert sorted(technical) == ['macd', 'rsi']
+
+    ctx = IndicatorContext(daily_bars)
+    assert technical['macd']['macd'] == pytest.approx(float(calculate_macd(ctx)['macd']))
+    assert technical['rsi']['rsi'] == pytest.approx(float(calculate_rsi(ctx)['rsi']))
+
+
+def test_analyze_without_selection_returns_all_indicators(client, data_service):
+    response = analyze(client)
+    assert response.status_code == 200
+    assert sorted(response.json()['analysis']['technical']) == sorted(indicator_registry.names())
+
+
+@pytest.mark.parametrize('indicators', [['macd', 'unknown'], ['macd_series'], ['candlestick_patterns']])
+def test_analyze_rejects_unknown_and_internal_indicators(client, data_service, indicators):
+    response = analyze(client, indicators=indicators)
+    assert response.status_code == 400
+    assert 'Unsupported indicators' in response.json()['detail']
+    assert data_service.calls == []
+
+
+def test_selection_is_served_from_cached_full_result(client, data_service):
+    full = analyze(client).json()
+    quotes = len([call for call in data_service.calls if call[0] == 'quote'])
+
+    subset = analyze(client, indicators=['kdj', 'ma']).json()
+    # 命中全部指标的缓存，不再请求数据
+    assert len([call for call in data_service.calls if call[0] == 'quote']) == quotes
+    assert sorted(subset['analysis']['technical']) == ['kdj', 'ma']
+    for name in ('kdj', 'ma'):
+        assert subset['analysis']['technical'][name] == full['analysis']['technical'][name]
+    # 信号和技术面建议只由选择的指标生成，与直接计算这些指标的结果一致
+    stock_router.analysis_cache.clear()
+    fresh = analyze(client, indicators=['kdj', 'ma']).json()
+    assert subset['signals']['technical_signals'] == fresh['signals']['technical_signals']
+    assert subset['recommendation'].split(' | ')[0] == fresh['recommendation'].split(' | ')[0]
+    # 基本面为每次生成的模拟数据，只比较技术面评分
+    assert subset['analysis']['comprehensive']['score_breakdown']['technical_score'] == \
+        fresh['analysis']['comprehensive']['score_breakdown']['technical_score']
+    assert subset['analysis']['fundamental'] == full['analysis']['fundamental']
+
+
+def test_list_analysis_indicators(client, data_service):
+    names = [item['name'] for item in client.get('/analyze/indicators').json()['indicators']]
+    assert names == indicator_registry.names()
+
+
+def series(client, **params):
+    return client.get('/indicators/600519/series', params=params)
+
+
+def test_to_column_outputs_null_for_non_finite():
+    values = np.array([1.234567, np.nan, np.inf, -np.inf, -2.0])
+    assert stock_router.to_column(values) == [1.2346, None, None, None, -2.0]
+    assert stock_router.to_column(values, decimals=1) == [1.2, None, None, None, -2.0]
+
+
+def test_series_is_computed_with_lookback_and_sliced(client, data_service, daily_bars):
+    response = series(client, limit=50, indicators='ma,macd')
+    assert response.status_code == 200
+    body = response.json()
+    # 按 limit + 回看K线数换算的自然日数请求日K线
+    bars_needed = 50 + stock_router.SERIES_LOOKBACK_BARS
+    assert data_service.calls == [('daily', '600519', int(bars_needed * 365 / 250) + 10)]
+
+    assert body['dates'] == daily_bars.date_strings()[-50:].tolist()
+    assert body['bars']['close'] == pytest.approx(np.round(daily_bars.close[-50:], 4))
+    assert list(body['indicators']) == ['ma', 'macd']
+    # 指标在完整区间上计算：MA60 在第一根输出K线处已有值，且与完整序列的末尾一致
+    full = indicator_series(IndicatorContext(daily_bars), ['ma', 'macd'])
+    for name, lines in body['indicators'].items():
+        for line, values in lines.items():
+            assert values == stock_router.to_column(full[name][line][-50:]), f"{name}.{line}"
+    assert None not in body['indicators']['ma']['ma60']
+
+
+@pytest.mark.parametrize('limit, rows, requested', [(0, 1, 1), (-5, 1, 1), (5000, 300, 1000)])
+def test_series_limit_is_clamped(client, data_service, limit, rows, requested):
+    body = series(client, limit=limit, indicators='rsi').json()
+    assert len(body['dates']) == rows
+    assert all(len(values) == rows for values in body['indicators']['rsi'].values())
+    bars_needed = requested + stock_router.SERIES_LOOKBACK_BARS
+    assert data_service.calls[0][2] == int(bars_needed * 365 / 250) + 10
+
+
+def test_series_short_history_outputs_null(client, monkeypatch, daily_bars):
+    service = StubDataService(daily=as_bars(generate_bars('600519', 30)))
+    monkeypatch.setattr(stock_router, 'data_service', service)
+    body = series(client, indicators='ma').json()
+    # 不足60根K线：MA60 全部为 null，MA5 只有前4根为 null
+    assert len(body['dates']) == 30
+    assert body['indicators']['ma']['ma60'] == [None] * 30
+    assert body['indicators']['ma']['ma5'][:4] == [None] * 4
+    assert None not in body['indicators']['ma']['ma5'][4:]
+
+
+def test_series_intraday_days_capped_by_retention(client, data_service, daily_bars):
+    data_service.intraday = daily_bars
+    assert series(client, timeframe='5m', limit=100).status_code == 200
+    # 每天48根5分钟K线，220根需要5天
+    assert data_service.calls[-1] == ('intraday', '600519', 5, 5)
+    series(client, timeframe='60m', limit=1000)
+    assert data_service.calls[-1] == ('intraday', '600519', 60, 30)
+
+    data_service.intraday = None
+    response = series(client, timeframe='15m')
+    assert response.status_code == 404
+    # 分钟周期没有数据时不使用日K线或模拟数据
+    assert all(call[0] == 'intraday' for call in data_service.calls)
+
+
+@pytest.mark.parametrize('params', [{'indicators': 'macd,unknown'}, {'indicators': 'macd_series'},
+                                    {'timeframe': '7x'}])
+def test_series_rejects_unknown_names(client, data_service, params):
+    response = series(client, **params)
+    assert response.status_code == 400
+    assert data_service.calls == []
+
+
+def test_minute_analysis_without_intraday_bars_is_not_found(client, data_service, daily_bars):
+    response = analyze(client, timeframe='5m')
+    assert response.status_code == 404
+    assert 'No intraday data' in response.json()['detail']
+    # 不使用日K线或模拟数据代替分钟K线
+    assert [call[0] for call in data_service.calls] == ['quote', 'intraday']
+    assert len(stock_router.analysis_cache) == 0
+
+    # 行情获取失败时同样返回404
+    data_service.quote = False
+    assert analyze(client, timeframe='15m').status_code == 404
+    assert all(call[0] != 'mock' for call in data_service.calls)
+
+    data_service.quote = True
+    data_service.intraday = daily_bars
+    response = analyze(client, timeframe='5m', indicators=['rsi'])
+    assert response.status_code == 200
+    assert data_service.calls[-1] == ('intraday', '600519', 5, 5)
+
+
+def test_daily_analysis_falls_back_to_mock_data(client, data_service):
+    data_service.daily = None
+    response = analyze(client, indicators=['macd'])
+    assert response.status_code == 200
+    assert [call[0] for call in data_service.calls] == ['quote', 'daily', 'mock']
@@ -0,0 +1,241 @@
+"""
+流式指标与批量计算的一致性、状态保存恢复、未完成K线替换、分钟K线修正和盘中实时指标服务测试
+"""
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.live_indicators import LiveIndicatorService
+from utils.bars import Bars
+from utils.indicator_context import IndicatorContext
+from utils.kernels import wilder_rsi, stochastic_kdj
+from utils.resample import resample_bars, OHLCVAggregator
+from utils.streaming_indicators import StreamingIndicators
+
+
+def random_bars(count, seed=7, dates=None):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    high = close * (1 + rng.uniform(0.001, 0.02, count))
+    low = close * (1 - rng.uniform(0.001, 0.02, count))
+    open_ = np.clip(close * (1 + rng.normal(0, 0.005, count)), low, high)
+    volume = rng.integers(100, 10000, count)
+    if dates is None:
+        dates = pd.date_range('2023-01-02', periods=count, freq='B')
+    return Bars.from_arrays(dates, open_, high, low, close, volume, symbol='000001')
+
+
+def session_minutes(days):
+    """A股交易时段的1分钟K线时间（每天240根）"""
+    stamps = []
+    for day in pd.date_range('2024-03-04', periods=days, freq='B'):
+        stamps.extend(pd.date_range(day + pd.Timedelta('09:31:00'), periods=120, freq='min'))
+        stamps.extend(pd.date_range(day + pd.Timedelta('13:01:00'), periods=120, freq='min'))
+    return pd.DatetimeIndex(stamps)
+
+
+def batch_series(bars):
+    """与非talib环境下 technical_analysis 相同的批量计算"""
+    ctx = IndicatorContext(bars)
+    macd, signal, histogram = ctx.macd()
+    kdj = stochastic_kdj(ctx.rolling_max('high', 9), ctx.rolling_min('low', 9), bars.close)
+    middle, std = ctx.rolling_mean('close', 20), ctx.rolling_std('close', 20)
+    highest, lowest = ctx.rolling_max('high', 14), ctx.rolling_min('low', 14)
+    return {
+        'macd': {'macd': macd, 'signal': signal, 'histogram': histogram},
+        'kdj': kdj,
+        'rsi': {'rsi': wilder_rsi(bars.close, 14)},
+        'boll': {'upper': middle + 2 * std, 'middle': middle, 'lower': middle - 2 * std},
+        'wr': {'wr': (highest - bars.close) / (highest - lowest) * -100},
+        'ma': {f"ma{period}": ctx.rolling_mean('close', period) for period in (5, 10, 20, 60)}
+    }
+
+
+def stream_series(bars):
+    indicators = StreamingIndicators(bars.symbol)
+    rows = [indicators.update(high, low, close)
+            for high, low, close in zip(bars.high.tolist(), bars.low.tolist(), bars.close.tolist())]
+    return {group: {key: np.array([row[group][key] for row in rows]) for key in rows[0][group]}
+            for group in rows[0]}
+
+
+def assert_matches(actual, expected):
+    for group, series in expected.items():
+        for key, values in series.items():
+            np.testing.assert_allclose(actual[group][key], values, rtol=1e-9, atol=1e-9,
+                                       equal_nan=True, err_msg=f"{group}.{key}")
+
+
+@pytest.mark.parametrize('group', ['macd', 'kdj', 'rsi', 'boll', 'wr', 'ma'])
+def test_streaming_matches_batch(group):
+    bars = random_bars(500)
+    expected = batch_series(bars)[group]
+    assert_matches({group: stream_series(bars)[group]}, {group: expected})
+
+
+def push(indicators, bars, final=True):
+    values = None
+    for high, low, close, date in zip(bars.high.tolist(), bars.low.tolist(),
+                                      bars.close.tolist(), bars.dates.tolist()):
+        values = indicators.update(high, low, close, date, final=final)
+    return values
+
+
+def flatten(values):
+    return {f"{group}.{key}": value for group, series in values.items() for key, value in series.items()}
+
+
+def assert_values_equal(actual, expected):
+    actual, expected = flatten(actual), flatten(expected)
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        np.testing.assert_allclose(actual[key], expected[key], rtol=1e-12, equal_nan=True, err_msg=key)
+
+
+def test_round_trip_continues_identically():
+    bars = random_bars(300)
+    original = StreamingIndicators.from_bars(bars[:200])
+    restored = StreamingIndicators.from_dict(json.loads(json.dumps(original.to_dict())))
+    assert restored.symbol == original.symbol
+    assert restored.last_date == original.last_date
+    assert restored.bars == original.bars
+    assert_values_equal(restored.values(), original.values())
+
+    for index in range(200, 300):
+        row = bars[index:index + 1]
+        assert_values_equal(push(restored, row), push(original, row))
+
+
+def test_forming_bar_is_replaced():
+    bars = random_bars(120)
+    reference = StreamingIndicators.from_bars(bars)
+
+    live = StreamingIndicators.from_bars(bars[:119])
+    last = bars[119:120]
+    # 同一根K线盘中多次更新，每次替换上一次的值
+    for scale in (0.97, 1.03, 1.01):
+        forming = Bars.from_arrays(last.dates, last.open, last.high * scale, last.low * scale,
+                                   last.close * scale, last.volume)
+        push(live, forming, final=False)
+        assert live.forming
+        assert live.bars == 120
+        assert live.committed_date == int(bars.dates[118])
+        # 未完成的K线不写入保存的状态
+        assert StreamingIndicators.from_dict(live.to_dict()).bars == 119
+
+    assert_values_equal(push(live, last), reference.values())
+    assert not live.forming
+    assert live.to_dict() == reference.to_dict()
+
+
+def test_discard_forming_restores_committed_state():
+    bars = random_bars(80)
+    indicators = StreamingIndicators.from_bars(bars[:79])
+    committed = indicators.to_dict()
+    push(indicators, bars[79:], final=False)
+    indicators.discard_forming()
+    assert indicators.to_dict() == committed
+
+
+class FakeIntradayService:
+    def __init__(self, bars):
+        self.bars = bars
+        self.visible = 0
+
+    async def get_intraday_bars(self, symbol, minutes=1, days=1):
+        assert minutes == 1
+        return self.bars[:self.visible] if self.visible else None
+
+
+@pytest.mark.parametrize('minutes', [1, 5, 30])
+def test_live_service_matches_batch_on_resampled_bars(minutes):
+    minute_bars = random_bars(720, seed=11, dates=session_minutes(3))
+    source = FakeIntradayService(minute_bars)
+    service = LiveIndicatorService(data_service=source)
+
+    async def run():
+        assert await service.get('000001', minutes) is None
+        results = []
+        # 初始化后每次只新增少量1分钟K线，包括停在周期中间的情况
+        for visible in (400, 403, 410, 455, 600, 720):
+            source.visible = visible
+            results.append((visible, await service.get('000001', minutes)))
+        return results
+
+    for visible, result in asyncio.run(run()):
+        expected = resample_bars(minute_bars[:visible], minutes)
+        batch = batch_series(expected)
+        assert result['bars'] == len(expected)
+        assert result['timeframe'] == f"{minutes}m"
+        for group, series in batch.items():
+            for key, values in series.items():
+                value = result['indicators'][group][key]
+                if np.isnan(values[-1]):
+                    assert value is None, f"{group}.{key}"
+                else:
+                    assert value == pytest.approx(values[-1], rel=1e-9), f"{group}.{key}"
+        if result['forming'] is not None:
+            assert result['forming']['close'] == pytest.approx(expected.close[-1])
+            assert result['forming']['date'] == expected.date_strings()[-1]
+    assert service.stats() == {'streams': 1, 'seeded': 1, 'updates': 5}
+
+
+def test_live_service_evicts_least_recently_used():
+    minute_bars = random_bars(240, seed=3, dates=session_minutes(1))
+    service = LiveIndicatorService(data_service=FakeIntradayService(minute_bars), max_streams=2)
+    service.feed('000001', 5, minute_bars)
+    service.feed('000002', 5, minute_bars)
+    service.feed('000001', 5, minute_bars)
+    service.feed('000003', 5, minute_bars)
+    assert list(service._streams) == [('000001', 5), ('000003', 5)]
+
+
+def revised(bars, position, close):
+    """盘中第一次取到的最新一分钟：收盘价与之后修正后的值不同"""
+    stale = bars[:position + 1]
+    stale = Bars(*(getattr(stale, field).copy() for field in
+                   ('dates', 'open', 'high', 'low', 'close', 'volume', 'amount')), symbol=stale.symbol)
+    stale.close[-1] = close
+    stale.high[-1] = max(stale.high[-1], close)
+    stale.low[-1] = min(stale.low[-1], close)
+    return stale
+
+
+@pytest.mark.parametrize('minutes', [1, 5, 15, 60])
+def test_aggregator_replaces_revised_last_minute(minutes):
+    minute_bars = random_bars(480, seed=5, dates=session_minutes(2))
+    aggregator = OHLCVAggregator(minutes)
+    parts = []
+    # 每次轮询返回截至当前的全部分钟，最新一分钟先是未修正的值，下次轮询时被修正
+    for visible in (100, 104, 105, 240, 241, 300, 480):
+        parts.append(aggregator.push(revised(minute_bars, visible - 1, 99.0)))
+        parts.append(aggregator.push(minute_bars[:visible]))
+        forming = aggregator.partial()
+        assert forming.close[-1] == pytest.approx(minute_bars.close[visible - 1])
+    parts.append(aggregator.flush())
+    result = Bars.concat(parts)
+    expected = resample_bars(minute_bars, minutes)
+    np.testing.assert_array_equal(result.dates, expected.dates)
+    for field in ('open', 'high', 'low', 'close', 'volume'):
+        np.testing.assert_allclose(getattr(result, field), getattr(expected, field), rtol=1e-12, err_msg=field)
+
+
+@pytest.mark.parametrize('minutes', [1, 5])
+def test_live_service_uses_revised_last_minute(minutes):
+    minute_bars = random_bars(480, seed=9, dates=session_minutes(2))
+    service = LiveIndicatorService(data_service=FakeIntradayService(minute_bars))
+    for visible in (300, 305, 306, 400):
+        stale = service.feed('000001', minutes, revised(minute_bars, visible - 1, 99.0))
+        assert stale['forming']['close'] == 99.0
+        result = service.feed('000001', minutes, minute_bars[:visible])
+        assert result['forming']['close'] == pytest.approx(minute_bars.close[visible - 1])
+
+    expected = resample_bars(minute_bars[:400], minutes)
+    batch = batch_series(expected)
+    assert result['bars'] == len(expected)
+    for group, series in batch.items():
+        for key, values in series.items():
+            assert result['indicators'][group][key] == pytest.approx(values[-1], rel=1e-9), f"{group}.{key}"
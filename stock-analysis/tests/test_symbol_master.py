@@ -0,0 +1,171 @@
+"""
+代码表搜索排序、拼音首字母和按摘要重建索引测试
+"""
+import json
+
+import pandas as pd
+import pytest
+
+from services import symbol_master as sm
+from services.quote_snapshot import MarketQuoteSnapshot
+from services.source_health import SourceHealthTracker
+from services.symbol_master import (SymbolIndex, SymbolMaster, pinyin_initials, GB2312_INITIALS,
+                                    MATCH_EXACT, MATCH_CODE_PREFIX, MATCH_PINYIN_PREFIX, MATCH_NAME_PREFIX,
+                                    MATCH_NAME_CONTAINS)
+
+LISTING = [
+    ('000001', '平安银行'),
+    ('000002', '万科A'),
+    ('200002', '万科B'),
+    ('000100', 'TCL科技'),
+    ('600000', '浦发银行'),
+    ('600036', '招商银行'),
+    ('601166', '兴业银行'),
+    ('601398', '工商银行'),
+    ('000858', '五粮液'),
+    ('600999', '招商证券'),
+    ('002001', '新和成'),
+    ('000012', '南玻A'),
+    ('600185', '格力地产'),
+    ('000651', '格力电器'),
+    ('000048', '京基智农'),
+]
+
+
+@pytest.fixture
+def gb2312(monkeypatch):
+    """不使用 pypinyin，按GB2312区位码推算"""
+    monkeypatch.setattr(sm, 'HAS_PYPINYIN', False)
+
+
+def results(index, query, limit=10):
+    return [(item['symbol'], item['match']) for item in index.search(query, limit)]
+
+
+@pytest.mark.parametrize('name, initials', [
+    ('平安银行', 'PAYH'),      # 多音字：行 -> H
+    ('重庆啤酒', 'CQPJ'),      # 重 -> C
+    ('厦门国贸', 'XMGM'),      # 厦 -> X
+    ('万科Ａ', 'WKA'),         # 全角字母
+    ('*ST海航', 'STHH'),       # 符号忽略
+    ('TCL科技', 'TCLKJ'),
+    ('座', 'Z'),               # 一级汉字最后一个
+    ('鑫科材料', 'KCL'),       # 二级汉字无法由区位码推出
+])
+def test_pinyin_initials_gb2312_fallback(gb2312, name, initials):
+    assert pinyin_initials(name) == initials
+
+
+def test_gb2312_initial_boundaries(gb2312):
+    # 每个声母的第一个字，以及前一个字属于上一个声母
+    for position, (code, letter) in enumerate(GB2312_INITIALS):
+        first = bytes([code >> 8, code & 0xFF]).decode('gb2312')
+        assert pinyin_initials(first) == letter
+        if position:
+            previous = bytes([(code - 1) >> 8, (code - 1) & 0xFF]).decode('gb2312')
+            assert pinyin_initials(previous) == GB2312_INITIALS[position - 1][1]
+
+
+@pytest.mark.skipif(not sm.HAS_PYPINYIN, reason="pypinyin 未安装")
+def test_pinyin_initials_with_pypinyin():
+    assert pinyin_initials('平安银行') == 'PAYH'
+    assert pinyin_initials('重庆啤酒') == 'CQPJ'
+    assert pinyin_initials('鑫科材料') == 'XKCL'
+
+
+def test_search_ranks_match_categories(gb2312):
+    index = SymbolIndex(LISTING)
+    # 完全匹配的代码排在代码前缀之前
+    assert results(index, '000001')[0] == ('000001', MATCH_EXACT)
+    assert results(index, '0000') == [('000001', MATCH_CODE_PREFIX), ('000002', MATCH_CODE_PREFIX),
+                                      ('000012', MATCH_CODE_PREFIX), ('000048', MATCH_CODE_PREFIX)]
+    # 拼音首字母不区分大小写
+    assert results(index, 'payh') == [('000001', MATCH_PINYIN_PREFIX)]
+    assert results(index, 'GL') == [('600185', MATCH_PINYIN_PREFIX), ('000651', MATCH_PINYIN_PREFIX)]
+    # 名称前缀排在名称包含之前，包含匹配按名称长度、代码排序
+    assert results(index, '万科') == [('000002', MATCH_NAME_PREFIX), ('200002', MATCH_NAME_PREFIX)]
+    assert results(index, '银行') == [('000001', MATCH_NAME_CONTAINS), ('600000', MATCH_NAME_CONTAINS),
+                                      ('600036', MATCH_NAME_CONTAINS), ('601166', MATCH_NAME_CONTAINS),
+                                      ('601398', MATCH_NAME_CONTAINS)]
+    # 同一类别内按键排序（招商证券 < 招商银行）
+    assert results(index, '招商') == [('600999', MATCH_NAME_PREFIX), ('600036', MATCH_NAME_PREFIX)]
+    assert results(index, '万科A') == [('000002', MATCH_EXACT)]
+    assert results(index, 'tcl')[0] == ('000100', MATCH_PINYIN_PREFIX)
+
+
+def test_search_mixed_categories_and_limit(gb2312):
+    index = SymbolIndex(LISTING + [('300001', 'A股科技'), ('000003', '东方A')])
+    # 'A' 同时是拼音首字母前缀（A股科技 AGKJ）和名称包含（万科A、南玻A、东方A）
+    assert results(index, 'A') == [('300001', MATCH_PINYIN_PREFIX), ('000002', MATCH_NAME_CONTAINS),
+                                   ('000003', MATCH_NAME_CONTAINS), ('000012', MATCH_NAME_CONTAINS)]
+    assert len(index.search('0', limit=3)) == 3
+    assert index.search('   ') == []
+    assert index.search('不存在') == []
+    record = index.search('000858')[0]
+    assert record['name'] == '五粮液' and record['market'] == '深圳' and record['pinyin'] == 'WLY'
+
+
+def test_refresh_reloads_only_when_listing_changes(tmp_path):
+    listing = list(LISTING)
+    path = str(tmp_path / 'symbols.json')
+    master = SymbolMaster(snapshot_path=path, fetcher=lambda: list(listing))
+    # 没有本地快照时使用内置代码表
+    assert len(master.index) == len(sm.FALLBACK_SYMBOLS)
+
+    assert master.refresh() is True
+    assert master.reloads == 1 and len(master.index) == len(LISTING)
+    with open(path, encoding='utf-8') as f:
+        assert len(json.load(f)['symbols']) == len(LISTING)
+
+    # 顺序和重复不影响摘要
+    listing = list(reversed(LISTING)) + LISTING[:2]
+    index = master.index
+    assert master.refresh() is False
+    assert master.index is index and master.reloads == 1
+
+    # 更名后重建索引
+    listing = [(symbol, 'ST万科' if symbol == '000002' else name) for symbol, name in LISTING]
+    assert master.refresh() is True
+    assert master.lookup('000002')['name'] == 'ST万科'
+    assert master.reloads == 2
+
+    # 重启时从本地快照加载，不请求上游
+    restarted = SymbolMaster(snapshot_path=path, fetcher=lambda: pytest.fail("fetched on startup"))
+    assert restarted.lookup('000002')['name'] == 'ST万科'
+    assert restarted.updated_at == pytest.approx(master.updated_at)
+
+    listing = []
+    with pytest.raises(ValueError):
+        master.refresh()
+    assert master.lookup('000002') is not None
+
+
+def test_listing_comes_from_quote_snapshot(tmp_path):
+    pulls = []
+
+    def realtime_quotes():
+        pulls.append(1)
+        return pd.DataFrame({
+            '股票代码': ['600519', '000001', '1'],
+            '股票名称': ['贵州茅台', '平安银行', '平安 银行'],
+            '最新价': [1700.0, 10.5, '-'],
+            '涨跌幅': [0.6, 5.0, '-'],
+        })
+
+    # 停牌股票（最新价为 '-'）同样在代码表中；代码补齐6位、名称去掉空格后与已有条目相同
+    snapshot = MarketQuoteSnapshot(fetcher=realtime_quotes, health=SourceHealthTracker())
+    master = SymbolMaster(snapshot_path=str(tmp_path / 'symbols.json'), quote_snapshot=snapshot)
+    assert snapshot.get('600519')['current_price'] == 1700.0
+    assert master.refresh() is True
+    # 代码表与行情查询共用同一次全市场拉取
+    assert pulls == [1]
+    assert sorted(master.index.by_symbol) == ['000001', '600519']
+    assert [item['symbol'] for item in master.search('平安银行')] == ['000001']
+
+
+def test_empty_quote_snapshot_keeps_current_index(tmp_path):
+    snapshot = MarketQuoteSnapshot(fetcher=lambda: pd.DataFrame(), health=SourceHealthTracker())
+    master = SymbolMaster(snapshot_path=str(tmp_path / 'symbols.json'), quote_snapshot=snapshot)
+    with pytest.raises(ValueError):
+        master.refresh()
+    assert len(master.index) == len(sm.FALLBACK_SYMBOLS)
@@ -0,0 +1,92 @@
+"""
+缓存预热服务测试
+"""
+import asyncio
+
+import pytest
+
+from services.warmup_service import WarmupService
+
+
+class FakeDatabase:
+    def get_all_watchlist_symbols(self):
+        return ['000001', '600519']
+
+
+class FakeDataService:
+    def __init__(self):
+        self.refreshed = []
+
+    async def get_stock_info_many(self, symbols):
+        return {symbol: {} for symbol in symbols}
+
+    async def get_historical_bars(self, symbol, days=365):
+        raise AssertionError("warm-up must bypass the history cache")
+
+    async def refresh_historical_bars(self, symbol, days=365):
+        self.refreshed.append(symbol)
+
+
+def test_warm_forces_history_refresh():
+    data_service = FakeDataService()
+    service = WarmupService(db_service=FakeDatabase(), data_service=data_service)
+    stats = asyncio.run(service.warm())
+    assert stats['failures'] == 0
+    assert sorted(data_service.refreshed) == ['000001', '600519']
+
+
+class VirtualClock:
+    """虚拟时钟：sleep 立即返回并推进时间，记录每次等待的秒数"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def run_passes(work, passes=4, interval=300.0):
+    """以虚拟时钟运行预热循环，每只股票分析耗时 work 秒，返回 (各次开始时间, 各次等待秒数)"""
+    clock = VirtualClock()
+    starts = []
+
+    async def analyzer(symbol):
+        if symbol == '000001':
+            starts.append(clock.now)
+        clock.now += work
+        await asyncio.sleep(0)
+
+    async def run():
+        service = WarmupService(db_service=FakeDatabase(), data_service=FakeDataService(), analyzer=analyzer,
+                                interval=interval, clock=clock.time, sleep=clock.sleep)
+        service.start()
+        while len(clock.sleeps) < passes:
+            await asyncio.sleep(0)
+        await service.stop()
+        return service
+
+    service = asyncio.run(run())
+    assert service.runs >= passes
+    return starts, clock.sleeps[:passes]
+
+
+def test_passes_are_scheduled_from_start_time():
+    # 每次预热耗时40秒（两只股票各20秒），两次开始之间仍相隔 interval，而不是 interval + 耗时
+    starts, sleeps = run_passes(work=20.0)
+    assert sleeps == [pytest.approx(260.0)] * 4
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert gaps == [pytest.approx(300.0)] * (len(starts) - 1)
+
+
+def test_slow_pass_starts_next_immediately():
+    # 单次预热超过 interval 时不再等待
+    starts, sleeps = run_passes(work=200.0, passes=3)
+    assert sleeps == [0, 0, 0]
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert gaps == [pytest.approx(400.0)] * (len(starts) - 1)
@@ -0,0 +1,157 @@
+"""
+紧凑K线容器
+"""
+import pandas as pd
+import numpy as np
+from typing import Optional, Union, List
+
+# 各数据源使用的中文列名 -> Bars 字段名
+BAR_COLUMNS = {
+    '开盘': 'open',
+    '最高': 'high',
+    '最低': 'low',
+    '收盘': 'close',
+    '成交量': 'volume',
+    '成交额': 'amount'
+}
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+
+class Bars:
+    """统一的K线内存表示
+
+    日期为 int64 Unix 秒，价格和成交额为连续的 float64（或 float32）数组，成交量为 int64。
+    所有数据源在入口处转换为 Bars，技术指标直接读取数组，不再按中文列名索引DataFrame。
+    切片返回共享内存的视图。
+    """
+
+    __slots__ = ('dates', 'open', 'high', 'low', 'close', 'volume', 'amount', 'symbol', 'name')
+
+    def __init__(self, dates: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray, amount: Optional[np.ndarray] = None,
+                 symbol: str = '', name: str = ''):
+        self.dates = dates
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.amount = amount if amount is not None else np.full(len(close), np.nan, dtype=close.dtype)
+        self.symbol = symbol
+        self.name = name
+
+    @classmethod
+    def from_arrays(cls, dates, open, high, low, close, volume, amount=None,
+                    symbol: str = '', name: str = '', dtype=np.float64) -> 'Bars':
+        """由任意数组构造，统一dtype并保证内存连续"""
+        def prices(values):
+            return np.ascontiguousarray(values, dtype=dtype)
+
+        volume = np.nan_to_num(np.asarray(volume, dtype=np.float64), nan=0.0)
+        return cls(
+            dates=np.ascontiguousarray(to_epoch_seconds(dates)),
+            open=prices(open), high=prices(high), low=prices(low), close=prices(close),
+            volume=np.ascontiguousarray(np.round(volume), dtype=np.int64),
+            amount=prices(amount) if amount is not None else None,
+            symbol=symbol, name=name
+        )
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, symbol: Optional[str] = None, name: Optional[str] = None,
+                   dtype=np.float64) -> 'Bars':
+        """由efinance/网易/模拟数据的DataFrame构造（中文列名，按日期升序）"""
+        if symbol is None:
+            symbol = str(frame['股票代码'].iloc[0]) if '股票代码' in frame.columns and len(frame) else ''
+        if name is None:
+            name = str(frame['股票名称'].iloc[0]) if '股票名称' in frame.columns and len(frame) else ''
+
+        def column(label):
+            if label not in frame.columns:
+                return None
+            return pd.to_numeric(frame[label], errors='coerce').to_numpy(dtype=np.float64)
+
+        return cls.from_arrays(
+            frame['日期'], column('开盘'), column('最高'), column('最低'), column('收盘'),
+            column('成交量') if '成交量' in frame.columns else np.zeros(len(frame)),
+            column('成交额'), symbol=symbol, name=name, dtype=dtype
+        )
+
+    @classmethod
+    def from_records(cls, records: np.ndarray, symbol: str = '', name: str = '', dtype=np.float64) -> 'Bars':
+        """由本地K线库的结构化数组构造（字段名与 Bars 相同）"""
+        return cls.from_arrays(
+            records['date'], records['open'], records['high'], records['low'], records['close'],
+            records['volume'], records['amount'], symbol=symbol, name=name, dtype=dtype
+        )
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.close) == 0
+
+    def __getitem__(self, index: slice) -> 'Bars':
+        """按位置切片，返回共享内存的视图"""
+        if not isinstance(index, slice):
+            raise TypeError("Bars only supports slice indexing")
+        return Bars(self.dates[index], self.open[index], self.high[index], self.low[index],
+                    self.close[index], self.volume[index], self.amount[index], self.symbol, self.name)
+
+    @classmethod
+    def concat(cls, parts: List['Bars']) -> 'Bars':
+        """按顺序拼接多段K线"""
+        parts = [part for part in parts if part is not None]
+        first = parts[0]
+        return cls(*(np.concatenate([getattr(part, field) for part in parts])
+                     for field in ('dates',) + PRICE_FIELDS + ('volume', 'amount')),
+                   symbol=first.symbol, name=first.name)
+
+    def since(self, start) -> 'Bars':
+        """start（含）之后的K线视图"""
+        return self[int(np.searchsorted(self.dates, to_epoch_seconds([start])[0])):]
+
+    def tail(self, n: int) -> 'Bars':
+        return self[max(len(self) - n, 0):]
+
+    def column(self, label: str) -> np.ndarray:
+        """按字段名或中文列名取数组"""
+        return getattr(self, BAR_COLUMNS.get(label, label))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field).nbytes for field in ('dates', 'volume', 'amount') + PRICE_FIELDS)
+
+    @property
+    def datetimes(self) -> np.ndarray:
+        return self.dates.astype('datetime64[s]')
+
+    def date_strings(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """日K线格式化为 YYYY-MM-DD，分钟K线格式化为 YYYY-MM-DD HH:MM；positions 指定时只格式化这些位置"""
+        datetimes = self.datetimes if positions is None else self.datetimes[positions]
+        index = pd.DatetimeIndex(datetimes)
+        if len(index) and (self.dates % 86400 != 0).any():
+            return index.strftime('%Y-%m-%d %H:%M').to_numpy()
+        return index.strftime('%Y-%m-%d').to_numpy()
+
+    def to_frame(self) -> pd.DataFrame:
+        """还原为与efinance列名一致的DataFrame"""
+        frame = pd.DataFrame({column: getattr(self, field) for column, field in BAR_COLUMNS.items()})
+        frame.insert(0, '日期', self.date_strings())
+        frame.insert(0, '股票代码', self.symbol)
+        frame.insert(0, '股票名称', self.name)
+        return frame
+
+
+def to_epoch_seconds(dates) -> np.ndarray:
+    """日期（字符串、datetime64、Timestamp或Unix秒）转换为 int64 Unix 秒"""
+    values = np.asarray(dates)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64)
+    return pd.to_datetime(values).to_numpy().astype('datetime64[s]').astype(np.int64)
+
+
+def as_bars(data: Union[Bars, pd.DataFrame]) -> Bars:
+    """技术指标的统一入口：DataFrame在这里转换一次"""
+    return data if isinstance(data, Bars) else Bars.from_frame(data)
@@ -0,0 +1,149 @@
+"""
+蜡烛图形态向量化扫描
+"""
+import numpy as np
+from typing import Dict, Any, List, Tuple, Sequence
+
+# 形态定义：(键, 名称, 信号, 强度)，顺序与 analyze_japanese_candlestick 的识别顺序一致
+SINGLE_PATTERNS: List[Tuple[str, str, str, str]] = [
+    ('doji', '十字星', 'reversal', '中等'),
+    ('hammer', '锤子线', 'bullish', '强'),
+    ('hanging_man', '上吊线', 'bearish', '强'),
+    ('shooting_star', '射击之星', 'bearish', '强'),
+    ('inverted_hammer', '倒锤子', 'bullish', '中等'),
+    ('long_bullish', '长阳线', 'bullish', '强'),
+    ('long_bearish', '长阴线', 'bearish', '强'),
+    ('spinning_top', '纺锤线', 'neutral', '弱'),
+]
+MULTI_PATTERNS: List[Tuple[str, str, str, str]] = [
+    ('morning_star', '早晨之星', 'bullish', '强'),
+    ('evening_star', '黄昏之星', 'bearish', '强'),
+    ('bullish_engulfing', '看涨吞没', 'bullish', '强'),
+    ('bearish_engulfing', '看跌吞没', 'bearish', '强'),
+    ('dark_cloud_cover', '乌云盖顶', 'bearish', '强'),
+    ('piercing', '刺透形态', 'bullish', '强'),
+]
+PATTERNS = SINGLE_PATTERNS + MULTI_PATTERNS
+PATTERN_INFO = {key: (name, signal, strength) for key, name, signal, strength in PATTERNS}
+
+FORWARD_HORIZONS = (1, 5, 10)
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """沿时间轴（最后一维）后移 periods 根，前面补NaN"""
+    shifted = np.full(values.shape, np.nan)
+    shifted[..., periods:] = values[..., :-periods]
+    return shifted
+
+
+def scan_patterns(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Dict[str, np.ndarray]:
+    """对整段历史一次性识别全部形态，返回 {形态键: 布尔数组}
+
+    输入可以是一维（单只股票）或二维（股票 × 日期）数组，时间在最后一维；
+    第 t 个位置表示以第 t 根K线结束的形态。
+    """
+    o = np.asarray(open_, dtype=np.float64)
+    h = np.asarray(high, dtype=np.float64)
+    l = np.asarray(low, dtype=np.float64)
+    c = np.asarray(close, dtype=np.float64)
+
+    body = np.abs(c - o)
+    upper_shadow = h - np.maximum(o, c)
+    lower_shadow = np.minimum(o, c) - l
+    total_range = h - l
+    rising = c > o
+    with np.errstate(divide='ignore', invalid='ignore'):
+        body_ratio = np.where(total_range != 0, body / total_range, np.nan)
+
+    # 单根K线形态按优先级互斥（对应原实现的 if/elif 链），振幅为0的K线不识别
+    remaining = total_range != 0
+    doji = remaining & (body_ratio < 0.1)
+    remaining &= ~doji
+    hammer_shape = remaining & (lower_shadow > body * 2) & (upper_shadow < body * 0.5)
+    remaining &= ~hammer_shape
+    star_shape = remaining & (upper_shadow > body * 2) & (lower_shadow < body * 0.5)
+    remaining &= ~star_shape
+    long_body = remaining & (body_ratio > 0.7)
+    remaining &= ~long_body
+    spinning_top = remaining & (upper_shadow > body) & (lower_shadow > body)
+
+    # 多根K线组合：前一根、前两根
+    o1, c1, h1, l1 = _shift(o, 1), _shift(c, 1), _shift(h, 1), _shift(l, 1)
+    o2, c2 = _shift(o, 2), _shift(c, 2)
+    body1 = np.abs(c1 - o1)
+    body2 = np.abs(c2 - o2)
+    midpoint1 = (c1 + o1) / 2
+    midpoint2 = (c2 + o2) / 2
+
+    morning_star = (c2 < o2) & (body1 < body2 * 0.5) & rising & (c > midpoint2)
+    evening_star = ~morning_star & (c2 > o2) & (body1 < body2 * 0.5) & (c < o) & (c < midpoint2)
+    bullish_engulfing = (c1 < o1) & rising & (o < c1) & (c > o1)
+    bearish_engulfing = ~bullish_engulfing & (c1 > o1) & (c < o) & (o > c1) & (c < o1)
+    dark_cloud_cover = (c1 > o1) & (c < o) & (o > h1 * 0.99) & (c < midpoint1)
+    piercing = ~dark_cloud_cover & (c1 < o1) & rising & (o < l1 * 1.01) & (c > midpoint1)
+
+    return {
+        'doji': doji,
+        'hammer': hammer_shape & rising,
+        'hanging_man': hammer_shape & ~rising,
+        'shooting_star': star_shape & (c < o),
+        'inverted_hammer': star_shape & ~(c < o),
+        'long_bullish': long_body & rising,
+        'long_bearish': long_body & ~rising,
+        'spinning_top': spinning_top,
+        'morning_star': morning_star,
+        'evening_star': evening_star,
+        'bullish_engulfing': bullish_engulfing,
+        'bearish_engulfing': bearish_engulfing,
+        'dark_cloud_cover': dark_cloud_cover,
+        'piercing': piercing,
+    }
+
+
+def forward_returns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """第 t 根K线之后 horizon 根的收益率，末尾不足 horizon 根的位置为NaN"""
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(close.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[..., :-horizon] = close[..., horizon:] / close[..., :-horizon] - 1
+    return result
+
+
+def pattern_statistics(masks: Dict[str, np.ndarray], close: np.ndarray,
+                       horizons: Sequence[int] = FORWARD_HORIZONS) -> Dict[str, Dict[str, Any]]:
+    """每个形态的历史出现次数，以及出现后 horizons 根的平均收益率和上涨概率
+
+    二维输入时汇总所有股票（全市场统计）。
+    """
+    returns = {horizon: forward_returns(close, horizon) for horizon in horizons}
+    stats = {}
+    for key, mask in masks.items():
+        item: Dict[str, Any] = {'name': PATTERN_INFO[key][0], 'signal': PATTERN_INFO[key][1],
+                                'count': int(mask.sum())}
+        for horizon, values in returns.items():
+            selected = values[mask]
+            selected = selected[~np.isnan(selected)]
+            item[f'avg_return_{horizon}'] = float(selected.mean()) if len(selected) else None
+            item[f'win_rate_{horizon}'] = float((selected > 0).mean()) if len(selected) else None
+        stats[key] = item
+    return stats
+
+
+def latest_patterns(masks: Dict[str, np.ndarray]) -> List[Tuple[str, str, str]]:
+    """最后一根K线上出现的形态 [(名称, 信号, 强度), ...]（一维输入）"""
+    return [PATTERN_INFO[key] for key, _, _, _ in PATTERNS if masks[key][-1]]
+
+
+def scan_market(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                symbols: Sequence[str], horizons: Sequence[int] = FORWARD_HORIZONS) -> Dict[str, Any]:
+    """全市场批量扫描（股票 × 日期 二维数组）：每只股票最新形态和全市场形态统计"""
+    masks = scan_patterns(open_, high, low, close)
+    latest = np.stack([masks[key][:, -1] for key, _, _, _ in PATTERNS], axis=1)
+    return {
+        'latest': {
+            symbol: [PATTERNS[i][1] for i in np.flatnonzero(row)]
+            for symbol, row in zip(symbols, latest)
+            if row.any()
+        },
+        'statistics': pattern_statistics(masks, close, horizons)
+    }
@@ -0,0 +1,225 @@
+"""
+全市场截面批量指标计算（股票 × K线序号 二维数组）
+"""
+import numpy as np
+from typing import Dict, Any, List, Sequence, Tuple
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bars import Bars, PRICE_FIELDS
+from utils.extrema import rolling_extreme
+from utils.kernels import stochastic_kdj, wilder_rsi
+from utils.rolling_regression import window_sums
+
+MA_PERIODS = (5, 10, 20, 60)
+
+
+def stack_bars(bars_list: Sequence[Bars]) -> Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]:
+    """将多只股票的K线按序号右对齐为二维数组，较短的历史在前面补NaN
+
+    每一行就是该股票自己的K线序列（停牌日不插入NaN），指标与单只股票计算的结果一致；
+    最后一列是每只股票最新的一根K线，日期不一定相同。
+    返回 (股票代码列表, 每只股票最新K线日期（没有K线时为 -1）, {字段: 股票 × 序号 数组})。
+    """
+    width = max((len(bars) for bars in bars_list), default=0)
+    arrays = {field: np.full((len(bars_list), width), np.nan) for field in PRICE_FIELDS + ('volume',)}
+    last_dates = np.full(len(bars_list), -1, dtype=np.int64)
+    for row, bars in enumerate(bars_list):
+        if bars.empty:
+            continue
+        for field in PRICE_FIELDS + ('volume',):
+            arrays[field][row, width - len(bars):] = getattr(bars, field)
+        last_dates[row] = bars.dates[-1]
+    return [bars.symbol for bars in bars_list], last_dates, arrays
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """沿日期方向的EMA，与 pandas ewm(span).mean()（adjust=True, ignore_na=False）逐点一致
+
+    按日期循环、每步对所有股票做一次向量运算；NaN不计入加权和，但权重照常衰减。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    decay = 1.0 - 2.0 / (span + 1)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    result = np.empty(values.shape)
+    weighted_sum = np.zeros(values.shape[:-1])
+    weight = np.zeros(values.shape[:-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for t in range(values.shape[-1]):
+            weighted_sum = weighted_sum * decay + filled[..., t]
+            weight = weight * decay + valid[..., t]
+            result[..., t] = weighted_sum / weight
+    return result
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动均值，窗口内有NaN或不足 window 根时为NaN（与 pandas rolling(window).mean() 一致）"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        sums, gaps = window_sums(values, window)
+        result[..., window - 1:] = np.where(~gaps, sums / window, np.nan)
+    return result
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动样本标准差（ddof=1）"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        # 先减去每只股票的均值，减小平方和相减时的精度损失
+        with np.errstate(invalid='ignore'):
+            offset = np.nanmean(values, axis=-1, keepdims=True)
+        centered = values - np.nan_to_num(offset)
+        sums, gaps = window_sums(centered, window)
+        squares, _ = window_sums(centered * centered, window)
+        variance = np.maximum((squares - sums * sums / window) / (window - 1), 0.0)
+        result[..., window - 1:] = np.where(~gaps, np.sqrt(variance), np.nan)
+    return result
+
+
+def compute_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                       volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """一次计算全部股票的指标完整序列（与 technical_analysis 中非talib实现的定义相同）"""
+    high, low, close, volume = (np.asarray(values, dtype=np.float64) for values in (high, low, close, volume))
+    series: Dict[str, np.ndarray] = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # MACD(12, 26, 9)
+        macd = ema(close, 12) - ema(close, 26)
+        signal = ema(macd, 9)
+        series.update(macd=macd, macd_signal=signal, macd_histogram=macd - signal)
+
+        # KDJ(9, 3, 3)
+        series.update(stochastic_kdj(rolling_extreme(high, 9, 'max'), rolling_extreme(low, 9, 'min'), close))
+
+        # RSI(14)：Wilder平滑
+        series['rsi'] = wilder_rsi(close, 14)
+
+        # 布林带(20, 2)
+        middle = rolling_mean(close, 20)
+        std = rolling_std(close, 20)
+        series.update(boll_upper=middle + std * 2, boll_middle=middle, boll_lower=middle - std * 2)
+
+        # 威廉指标(14)
+        highest_high = rolling_extreme(high, 14, 'max')
+        lowest_low = rolling_extreme(low, 14, 'min')
+        series['wr'] = (highest_high - close) / (highest_high - lowest_low) * -100
+
+        for period in MA_PERIODS:
+            series[f'ma{period}'] = middle if period == 20 else rolling_mean(close, period)
+        series['volume_ma5'] = rolling_mean(volume, 5)
+        series['volume_ma10'] = rolling_mean(volume, 10)
+
+    return series
+
+
+def last_valid_index(close: np.ndarray) -> np.ndarray:
+    """每只股票最后一根有效K线的列号（全部缺失时为 -1）"""
+    valid = ~np.isnan(close)
+    last = close.shape[-1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), last, -1)
+
+
+def latest_values(series: Dict[str, np.ndarray], close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """各指标在每只股票最后一根有效K线处的值（及前一根，用于判断交叉），返回一维数组"""
+    index = np.maximum(last_valid_index(close), 0)
+    prev_index = np.maximum(index - 1, 0)
+
+    def at(values: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        return np.take_along_axis(values, columns[:, None], axis=1)[:, 0]
+
+    latest = {name: at(values, index) for name, values in series.items()}
+    latest['close'] = at(close, index)
+    latest['prev_close'] = np.where(index > 0, at(close, prev_index), np.nan)
+    latest['volume'] = at(volume, index)
+    latest['prev_ma5'] = np.where(index > 0, at(series['ma5'], prev_index), np.nan)
+    latest['prev_ma10'] = np.where(index > 0, at(series['ma10'], prev_index), np.nan)
+    latest['bars'] = np.count_nonzero(~np.isnan(close), axis=1)
+    return latest
+
+
+def _fill(values: np.ndarray, default) -> np.ndarray:
+    return np.where(np.isfinite(values), values, default)
+
+
+def _choose(conditions: List[np.ndarray], labels: List[str], default: str) -> np.ndarray:
+    return np.select(conditions, labels, default=default)
+
+
+def market_signals(latest: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """按单只股票分析相同的阈值和缺省值生成最新指标值和信号（一维数组）"""
+    price = latest['close']
+    macd_histogram = _fill(latest['macd_histogram'], 0.0)
+    k, d, j = (_fill(latest[name], 50.0) for name in ('k', 'd', 'j'))
+    rsi = _fill(latest['rsi'], 50.0)
+    wr = _fill(latest['wr'], -50.0)
+    upper = _fill(latest['boll_upper'], price * 1.02)
+    middle = _fill(latest['boll_middle'], price)
+    lower = _fill(latest['boll_lower'], price * 0.98)
+    ma = {period: _fill(latest[f'ma{period}'], price) for period in MA_PERIODS}
+    prev_ma5 = _fill(latest['prev_ma5'], ma[5])
+    prev_ma10 = _fill(latest['prev_ma10'], ma[10])
+    volume = latest['volume']
+    volume_ma5 = _fill(latest['volume_ma5'], volume)
+    volume_ma10 = _fill(latest['volume_ma10'], volume)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_ratio = np.where(volume_ma5 > 0, volume / volume_ma5, 1.0)
+        price_change = np.where(latest['bars'] > 1, price / latest['prev_close'] - 1, 0.0)
+        band_width = (upper - lower) / middle
+
+    has_prev = latest['bars'] > 1
+    return {
+        'macd': _fill(latest['macd'], 0.0),
+        'macd_signal': _fill(latest['macd_signal'], 0.0),
+        'macd_histogram': macd_histogram,
+        'macd_trend': np.where(macd_histogram > 0, 'bullish', 'bearish'),
+        'k': k, 'd': d, 'j': j,
+        'kdj_signal': _choose([k > 80, k < 20], ['overbought', 'oversold'], 'neutral'),
+        'rsi': rsi,
+        'rsi_signal': _choose([rsi > 70, rsi < 30], ['overbought', 'oversold'], 'neutral'),
+        'boll_upper': upper, 'boll_middle': middle, 'boll_lower': lower,
+        'boll_position': _choose([price > upper, price < lower], ['upper', 'lower'], 'middle'),
+        'boll_squeeze': band_width < 0.1,
+        'wr': wr,
+        'wr_signal': _choose([wr > -20, wr < -80], ['overbought', 'oversold'], 'neutral'),
+        **{f'ma{period}': values for period, values in ma.items()},
+        'ma_bullish_alignment': (ma[5] > ma[10]) & (ma[10] > ma[20]) & (ma[20] > ma[60]),
+        'ma_cross_signal': _choose(
+            [has_prev & (prev_ma5 <= prev_ma10) & (ma[5] > ma[10]),
+             has_prev & (prev_ma5 >= prev_ma10) & (ma[5] < ma[10])],
+            ['golden_cross', 'death_cross'], 'neutral'),
+        'above_ma20': price > ma[20],
+        'current_volume': volume,
+        'volume_ma5': volume_ma5,
+        'volume_ma10': volume_ma10,
+        'volume_ratio': volume_ratio,
+        'volume_price_signal': _choose(
+            [(price_change > 0) & (volume_ratio > 1.5), (price_change < 0) & (volume_ratio > 1.5)],
+            ['bullish', 'bearish'], 'neutral'),
+    }
+
+
+def analyze_market(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                   symbols: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """全市场批量分析：返回 {股票代码: {指标: 值, ...}}，字段与单只股票的指标结果对应
+
+    一次向量化计算覆盖所有股票；没有任何有效K线的股票不输出。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    series = compute_indicators(high, low, close, volume)
+    latest = latest_values(series, close, volume)
+    signals = market_signals(latest)
+
+    columns = {name: values.tolist() for name, values in signals.items()}
+    has_data = (latest['bars'] > 0).tolist()
+    names = list(columns)
+    return {
+        symbol: {name: columns[name][row] for name in names}
+        for row, symbol in enumerate(symbols)
+        if has_data[row]
+    }
@@ -0,0 +1,73 @@
+"""
+局部极值（波峰/波谷）工具函数
+"""
+import numpy as np
+from typing import List, Tuple
+
+
+def window_extreme(values: np.ndarray, span: int, mode: str = 'max') -> np.ndarray:
+    """沿最后一维的滑动窗口极值（窗口长度 span）
+
+    返回最后一维长度为 n - span + 1 的数组，第 k 个元素为 values[..., k:k + span] 的极值。
+    窗口长度按倍增合并相邻的错位视图（1、2、4...），最后用两个重叠的 2^k 窗口覆盖整个窗口，
+    整条序列只需 O(log span) 次向量化比较；二维输入（股票 × 日期）同样适用，NaN会传播到包含它的窗口。
+    """
+    values = np.asarray(values)
+    count = values.shape[-1] - span + 1
+    if count <= 0:
+        return values[..., :0]
+    op = np.maximum if mode == 'max' else np.minimum
+    extreme = values
+    length = 1
+    while length * 2 <= span:
+        extreme = op(extreme[..., :-length], extreme[..., length:])
+        length *= 2
+    return op(extreme[..., :count], extreme[..., span - length:span - length + count])
+
+
+def centered_extreme(values: np.ndarray, window: int, mode: str = 'max') -> np.ndarray:
+    """以每个点为中心、前后各 window 个点的窗口极值
+
+    返回长度为 n - 2*window 的数组，第 k 个元素对应原序列第 k + window 个点。
+    """
+    return window_extreme(values, 2 * window + 1, mode)
+
+
+def rolling_extreme(values: np.ndarray, window: int, mode: str = 'max') -> np.ndarray:
+    """截至每个点的 window 根滚动极值（与 pandas rolling(window).max()/min() 一致，前 window-1 个为NaN）"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    extreme = window_extreme(values, window, mode)
+    if extreme.shape[-1]:
+        result[..., window - 1:] = extreme
+    return result
+
+
+def local_extrema_mask(values: np.ndarray, window: int, mode: str = 'max') -> np.ndarray:
+    """局部极值标记：第 i 个点不低于（mode='min' 时不高于）前后各 window 个点
+
+    前后不足 window 个点的位置为False。
+    """
+    values = np.asarray(values)
+    mask = np.zeros(len(values), dtype=bool)
+    extreme = centered_extreme(values, window, mode)
+    if len(extreme):
+        mask[window:len(values) - window] = values[window:len(values) - window] == extreme
+    return mask
+
+
+def find_peaks_and_troughs(prices: np.ndarray, window: int = 5) -> Tuple[List[Tuple[int, float]], List[Tuple[int, float]]]:
+    """波峰和波谷，返回 [(序号, 价格), ...]，按序号升序"""
+    prices = np.asarray(prices)
+    peak_index = np.flatnonzero(local_extrema_mask(prices, window, 'max'))
+    trough_index = np.flatnonzero(local_extrema_mask(prices, window, 'min'))
+    peaks = list(zip(peak_index.tolist(), prices[peak_index].tolist()))
+    troughs = list(zip(trough_index.tolist(), prices[trough_index].tolist()))
+    return peaks, troughs
+
+
+def support_resistance_levels(highs: np.ndarray, lows: np.ndarray, window: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """支撑位（局部最低价）和阻力位（局部最高价），按时间顺序"""
+    lows = np.asarray(lows)
+    highs = np.asarray(highs)
+    return lows[local_extrema_mask(lows, window, 'min')], highs[local_extrema_mask(highs, window, 'max')]
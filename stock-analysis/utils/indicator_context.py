@@ -0,0 +1,92 @@
+"""
+技术指标计算上下文
+"""
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Callable, Tuple, Union
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bars import Bars, as_bars
+
+
+class IndicatorContext:
+    """一次分析共用的指标基础量
+
+    滚动最小/最大/均值/标准差（按字段和窗口）、EMA（按周期）、涨跌额、收益率和真实波幅
+    在第一次使用时计算并缓存，之后各指标直接复用，完整分析中每个基础量只计算一遍。
+    返回的数组与缓存共享，调用方不应原地修改。
+    """
+
+    def __init__(self, bars: Bars):
+        self.bars = bars
+        self._cache: Dict[Tuple, Any] = {}
+        self.computations = 0
+
+    def __len__(self) -> int:
+        return len(self.bars)
+
+    def memo(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """按 key 缓存 compute() 的结果，指标的完整序列也通过这里共享"""
+        value = self._cache.get(key)
+        if value is None:
+            value = compute()
+            self._cache[key] = value
+            self.computations += 1
+        return value
+
+    def series(self, field: str) -> pd.Series:
+        """字段的 float64 Series（字段名或中文列名）"""
+        return self.memo(('series', field), lambda: pd.Series(self.bars.column(field), dtype=np.float64))
+
+    def rolling_mean(self, field: str, window: int) -> np.ndarray:
+        return self.memo(('mean', field, window),
+                         lambda: self.series(field).rolling(window=window).mean().to_numpy())
+
+    def rolling_std(self, field: str, window: int) -> np.ndarray:
+        """滚动样本标准差（ddof=1，与pandas一致）"""
+        return self.memo(('std', field, window),
+                         lambda: self.series(field).rolling(window=window).std().to_numpy())
+
+    def rolling_min(self, field: str, window: int) -> np.ndarray:
+        return self.memo(('min', field, window),
+                         lambda: self.series(field).rolling(window=window).min().to_numpy())
+
+    def rolling_max(self, field: str, window: int) -> np.ndarray:
+        return self.memo(('max', field, window),
+                         lambda: self.series(field).rolling(window=window).max().to_numpy())
+
+    def ema(self, field: str, span: int) -> np.ndarray:
+        """指数移动平均（与 calculate_ema 相同，adjust=True）"""
+        return self.memo(('ema', field, span),
+                         lambda: self.series(field).ewm(span=span).mean().to_numpy())
+
+    def change(self, field: str = 'close') -> np.ndarray:
+        """逐根涨跌额，第一根为NaN"""
+        return self.memo(('change', field), lambda: self.series(field).diff().to_numpy())
+
+    def returns(self, field: str = 'close') -> np.ndarray:
+        """逐根收益率，第一根为NaN"""
+        return self.memo(('returns', field), lambda: self.series(field).pct_change().to_numpy())
+
+    def true_range(self) -> np.ndarray:
+        """真实波幅，第一根为当根振幅"""
+        def compute():
+            high, low, close = self.bars.high, self.bars.low, self.bars.close
+            prev_close = np.r_[close[:1], close[:-1]]
+            return np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        return self.memo(('true_range',), compute)
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """MACD线、信号线和柱状图"""
+        def compute():
+            macd_line = self.ema('close', fast) - self.ema('close', slow)
+            signal_line = pd.Series(macd_line).ewm(span=signal).mean().to_numpy()
+            return macd_line, signal_line, macd_line - signal_line
+        return self.memo(('macd', fast, slow, signal), compute)
+
+
+def as_context(data: Union[IndicatorContext, Bars, pd.DataFrame]) -> IndicatorContext:
+    """技术指标的统一入口：单独调用时创建临时上下文，完整分析时传入共享上下文"""
+    return data if isinstance(data, IndicatorContext) else IndicatorContext(as_bars(data))
@@ -0,0 +1,316 @@
+"""
+路径依赖指标的计算内核（递推平滑、抛物线SAR、之字转向）
+
+这类指标的每一步依赖上一步的结果，无法直接用NumPy整体向量化。
+安装了numba时循环版本会被JIT编译；否则线性递推用 pandas ewm（Cython实现）计算，
+带分支的递推退回纯Python循环。两种实现的结果一致。
+输入的最后一维是时间，可以是一维（单只股票）或二维（股票 × 日期），NaN表示该位置缺失、跳过。
+"""
+import math
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+logger = logging.getLogger(__name__)
+
+
+def _as_rows(values: np.ndarray) -> np.ndarray:
+    """转为 float64 的二维连续数组（行 × 时间）"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.ascontiguousarray(values.reshape(-1, values.shape[-1]))
+
+
+# ---------------------------------------------------------------------------
+# 循环版本（numba可编译的子集：只用标量运算、np.empty 和 math.isnan）
+# ---------------------------------------------------------------------------
+
+def _recursive_smooth_loop(values, alpha, initial):
+    result = np.empty(values.shape)
+    for row in range(values.shape[0]):
+        state = initial
+        for t in range(values.shape[1]):
+            x = values[row, t]
+            if math.isnan(x):
+                result[row, t] = np.nan
+            else:
+                state = state * (1.0 - alpha) + x * alpha
+                result[row, t] = state
+    return result
+
+
+def _wilder_average_loop(values, period):
+    result = np.empty(values.shape)
+    for row in range(values.shape[0]):
+        count = 0
+        average = 0.0
+        for t in range(values.shape[1]):
+            x = values[row, t]
+            if math.isnan(x):
+                result[row, t] = np.nan
+                continue
+            count += 1
+            if count < period:
+                average += x
+                result[row, t] = np.nan
+            elif count == period:
+                average = (average + x) / period
+                result[row, t] = average
+            else:
+                average = (average * (period - 1) + x) / period
+                result[row, t] = average
+    return result
+
+
+def _parabolic_sar_loop(high, low, acceleration, maximum):
+    n = high.shape[0]
+    result = np.empty(n)
+    result[:] = np.nan
+    if n < 2:
+        return result
+    # 按前两根K线的方向动量确定初始方向（下跌动量更大时做空）
+    minus_dm = low[0] - low[1]
+    plus_dm = high[1] - high[0]
+    is_long = not (minus_dm > plus_dm and minus_dm > 0)
+    if is_long:
+        extreme = high[1]
+        sar = low[0]
+    else:
+        extreme = low[1]
+        sar = high[0]
+    factor = acceleration
+    new_high = high[0]
+    new_low = low[0]
+    for t in range(1, n):
+        prev_high = new_high
+        prev_low = new_low
+        new_high = high[t]
+        new_low = low[t]
+        if is_long:
+            if new_low <= sar:
+                # 跌破SAR，转为空头：SAR取多头期间的极值点
+                is_long = False
+                sar = max(extreme, prev_high, new_high)
+                result[t] = sar
+                factor = acceleration
+                extreme = new_low
+                sar = max(sar + factor * (extreme - sar), prev_high, new_high)
+            else:
+                result[t] = sar
+                if new_high > extreme:
+                    extreme = new_high
+                    factor = min(factor + acceleration, maximum)
+                sar = min(sar + factor * (extreme - sar), prev_low, new_low)
+        else:
+            if new_high >= sar:
+                is_long = True
+                sar = min(extreme, prev_low, new_low)
+                result[t] = sar
+                factor = acceleration
+                extreme = new_high
+                sar = min(sar + factor * (extreme - sar), prev_low, new_low)
+            else:
+                result[t] = sar
+                if new_low < extreme:
+                    extreme = new_low
+                    factor = min(factor + acceleration, maximum)
+                sar = max(sar + factor * (extreme - sar), prev_high, new_high)
+    return result
+
+
+def _zigzag_loop(prices, threshold):
+    n = prices.shape[0]
+    pivots = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return pivots
+    direction = 0
+    extreme_index = 0
+    high_index = 0
+    low_index = 0
+    for t in range(1, n):
+        price = prices[t]
+        if direction == 0:
+            # 尚未确定方向：先跟踪区间最高/最低，任一方向的反转幅度超过阈值后确定
+            if price > prices[high_index]:
+                high_index = t
+            if price < prices[low_index]:
+                low_index = t
+            if price <= prices[high_index] * (1.0 - threshold):
+                pivots[high_index] = 1
+                direction = -1
+                extreme_index = t
+            elif price >= prices[low_index] * (1.0 + threshold):
+                pivots[low_index] = -1
+                direction = 1
+                extreme_index = t
+        elif direction == 1:
+            if price >= prices[extreme_index]:
+                extreme_index = t
+            elif price <= prices[extreme_index] * (1.0 - threshold):
+                pivots[extreme_index] = 1
+                direction = -1
+                extreme_index = t
+        else:
+            if price <= prices[extreme_index]:
+                extreme_index = t
+            elif price >= prices[extreme_index] * (1.0 + threshold):
+                pivots[extreme_index] = -1
+                direction = 1
+                extreme_index = t
+    # 最后一段尚未被反转确认的极值点
+    if direction != 0:
+        pivots[extreme_index] = direction
+    return pivots
+
+
+# ---------------------------------------------------------------------------
+# NumPy/pandas 回退版本
+# ---------------------------------------------------------------------------
+
+# 行数较多（全市场截面）时按日期循环、每步对所有行做一次向量运算；行数少时用 pandas ewm 沿时间计算
+ROW_VECTORIZE_MIN_ROWS = 32
+
+
+def _recursive_smooth_numpy(values, alpha, initial):
+    if values.shape[0] >= ROW_VECTORIZE_MIN_ROWS:
+        result = np.empty(values.shape)
+        state = np.full(values.shape[0], initial)
+        for t in range(values.shape[1]):
+            x = values[:, t]
+            valid = ~np.isnan(x)
+            state = np.where(valid, state * (1.0 - alpha) + x * alpha, state)
+            result[:, t] = np.where(valid, state, np.nan)
+        return result
+    # 在最前面补一列初值后，递推 y = (1-alpha)*y + alpha*x 就是 adjust=False 的EWM，NaN跳过
+    seeded = np.concatenate([np.full((values.shape[0], 1), initial), values], axis=1)
+    smoothed = pd.DataFrame(seeded.T).ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy().T[:, 1:]
+    return np.where(np.isnan(values), np.nan, smoothed)
+
+
+def _wilder_average_numpy(values, period):
+    if values.shape[0] >= ROW_VECTORIZE_MIN_ROWS:
+        result = np.empty(values.shape)
+        count = np.zeros(values.shape[0], dtype=np.int64)
+        average = np.zeros(values.shape[0])
+        for t in range(values.shape[1]):
+            x = values[:, t]
+            valid = ~np.isnan(x)
+            count += valid
+            seeding = valid & (count <= period)
+            average = np.where(seeding, average + np.where(seeding, x, 0.0), average)
+            average = np.where(valid & (count == period), average / period, average)
+            average = np.where(valid & (count > period), (average * (period - 1) + x) / period, average)
+            result[:, t] = np.where(valid & (count >= period), average, np.nan)
+        return result
+    valid = ~np.isnan(values)
+    counts = np.cumsum(valid, axis=1)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=1)
+    ready = counts[:, -1] >= period
+    # 第 period 个有效值处取简单平均作为初值，之后按 alpha=1/period 的EWM递推
+    start = np.argmax(counts >= period, axis=1)
+    seeded = np.where(valid, values, np.nan)
+    column = np.arange(values.shape[1])
+    seeded[column[None, :] < start[:, None]] = np.nan
+    rows = np.flatnonzero(ready)
+    seeded[rows, start[rows]] = sums[rows, start[rows]] / period
+    seeded[~ready] = np.nan
+    smoothed = pd.DataFrame(seeded.T).ewm(alpha=1.0 / period, adjust=False, ignore_na=True).mean().to_numpy().T
+    return np.where(np.isnan(seeded), np.nan, smoothed)
+
+
+if HAS_NUMBA:
+    _recursive_smooth = njit(cache=True)(_recursive_smooth_loop)
+    _wilder_average = njit(cache=True)(_wilder_average_loop)
+    _parabolic_sar = njit(cache=True)(_parabolic_sar_loop)
+    _zigzag = njit(cache=True)(_zigzag_loop)
+else:
+    _recursive_smooth = _recursive_smooth_numpy
+    _wilder_average = _wilder_average_numpy
+    _parabolic_sar = _parabolic_sar_loop
+    _zigzag = _zigzag_loop
+
+
+# ---------------------------------------------------------------------------
+# 对外接口
+# ---------------------------------------------------------------------------
+
+def recursive_smooth(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """y_t = (1-alpha)*y_{t-1} + alpha*x_t，y 从 initial 开始；NaN位置输出NaN且不更新"""
+    values = np.asarray(values, dtype=np.float64)
+    return _recursive_smooth(_as_rows(values), float(alpha), float(initial)).reshape(values.shape)
+
+
+def wilder_average(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder平滑：前 period 个有效值的简单平均作为初值，之后 avg = (avg*(period-1)+x)/period"""
+    values = np.asarray(values, dtype=np.float64)
+    return _wilder_average(_as_rows(values), int(period)).reshape(values.shape)
+
+
+def wilder_rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Wilder RSI（与 talib.RSI 一致：前 period 根为NaN，涨跌均为0时为0）"""
+    close = np.asarray(close, dtype=np.float64)
+    change = np.full(close.shape, np.nan)
+    change[..., 1:] = close[..., 1:] - close[..., :-1]
+    gain = wilder_average(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), period)
+    loss = wilder_average(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0)), period)
+    total = gain + loss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, 100.0 * gain / total, np.where(np.isnan(total), np.nan, 0.0))
+
+
+def stochastic_kdj(highest_high: np.ndarray, lowest_low: np.ndarray, close: np.ndarray,
+                   k_smooth: int = 3, d_smooth: int = 3) -> Dict[str, np.ndarray]:
+    """KDJ：RSV按 1/k_smooth、K按 1/d_smooth 的权重递推平滑，K、D初值50，J = 3K - 2D
+
+    highest_high、lowest_low 为N日最高价/最低价（数据不足处为NaN），振幅为0时RSV取50。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    price_range = highest_high - lowest_low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = np.where(price_range > 0, (close - lowest_low) / price_range * 100, 50.0)
+    rsv = np.where(np.isnan(price_range) | np.isnan(close), np.nan, rsv)
+    k = recursive_smooth(rsv, 1.0 / k_smooth, 50.0)
+    d = recursive_smooth(k, 1.0 / d_smooth, 50.0)
+    return {"k": k, "d": d, "j": 3 * k - 2 * d}
+
+
+def parabolic_sar(high: np.ndarray, low: np.ndarray, acceleration: float = 0.02,
+                  maximum: float = 0.2) -> np.ndarray:
+    """抛物线转向指标（Wilder），第一根为NaN"""
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    return _parabolic_sar(high, low, float(acceleration), float(maximum))
+
+
+def zigzag(prices: np.ndarray, threshold: float = 0.05) -> np.ndarray:
+    """之字转向：价格从极值点反向变动超过 threshold（比例）时确认转折点
+
+    返回与 prices 等长的 int8 数组，1 为波峰、-1 为波谷、0 为非转折点；最后一个极值点尚未确认也会标出。
+    """
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    return _zigzag(prices, float(threshold))
+
+
+def warm_up() -> Tuple[str, float]:
+    """预先编译全部内核（numba首次调用需要编译，启动时执行，避免第一个请求承担编译延迟）
+
+    返回 (实现方式, 耗时秒数)。
+    """
+    import time
+    started = time.perf_counter()
+    prices = np.linspace(10.0, 12.0, 32) + np.sin(np.arange(32.0))
+    wilder_rsi(prices)
+    wilder_rsi(np.vstack([prices, prices]))
+    stochastic_kdj(prices + 1, prices - 1, prices)
+    parabolic_sar(prices + 1, prices - 1)
+    zigzag(prices)
+    backend = 'numba' if HAS_NUMBA else 'numpy'
+    elapsed = time.perf_counter() - started
+    logger.info(f"Indicator kernels ready ({backend}) in {elapsed:.3f}s")
+    return backend, elapsed
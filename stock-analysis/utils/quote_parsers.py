@@ -0,0 +1,131 @@
+"""
+行情接口响应解析工具函数
+"""
+import pandas as pd
+import numpy as np
+from typing import Union, BinaryIO
+import io
+import re
+
+# 腾讯: v_sh600519="1~贵州茅台~600519~最新价~昨收~今开~...";
+TENCENT_PATTERN = re.compile(r'v_([a-z]{2}\d+)="([^"]*)"')
+# 新浪: var hq_str_sh600519="贵州茅台,今开,昨收,最新价,最高,最低,...";
+SINA_PATTERN = re.compile(r'hq_str_([a-z]{2}\d+)="([^"]*)"')
+
+QUOTE_COLUMNS = ['symbol', 'name', 'current_price', 'change_percent']
+
+# 网易历史行情CSV：日期,股票代码,名称 之后按请求的 fields 顺序输出各列，表头为中文列名
+NETEASE_FIELDS = ['TCLOSE', 'HIGH', 'LOW', 'TOPEN', 'VOTURNOVER', 'VATURNOVER']
+# 网易表头 -> efinance列名
+NETEASE_COLUMNS = {
+    '收盘价': '收盘',
+    '最高价': '最高',
+    '最低价': '最低',
+    '开盘价': '开盘',
+    '成交量': '成交量',
+    '成交金额': '成交额'
+}
+# 必须有值的价格列，缺失时整行丢弃（成交量、成交额缺失时保留为NaN）
+NETEASE_PRICE_COLUMNS = ['收盘', '最高', '最低', '开盘']
+
+
+def format_symbol_for_api(symbol: str) -> str:
+    """转换为带市场前缀的股票代码（腾讯、新浪接口使用）"""
+    if symbol.startswith('6'):
+        return f"sh{symbol}"  # 上海股票
+    elif symbol.startswith('0') or symbol.startswith('3'):
+        return f"sz{symbol}"  # 深圳股票
+    else:
+        return symbol
+
+
+def format_symbol_for_netease(symbol: str) -> str:
+    """转换为网易接口的股票代码（上海前缀0，深圳前缀1）"""
+    return f"0{symbol}" if symbol.startswith('6') else f"1{symbol}"
+
+
+def _parse_quote_payloads(matches, separator: str, name_idx: int, price_idx: int,
+                          prev_close_idx: int) -> pd.DataFrame:
+    """将 (带前缀代码, 字段串) 列表整体拆分为列并计算涨跌幅"""
+    if not matches:
+        return pd.DataFrame(columns=QUOTE_COLUMNS)
+
+    codes, payloads = zip(*matches)
+    fields = pd.Series(payloads, dtype=object).str.split(separator, expand=True)
+    width = max(name_idx, price_idx, prev_close_idx) + 1
+    if fields.shape[1] < width:
+        # 所有股票都没有返回有效数据（如代码不存在时返回空串）
+        return pd.DataFrame(columns=QUOTE_COLUMNS)
+
+    names = fields[name_idx].fillna('')
+    prices = pd.to_numeric(fields[price_idx], errors='coerce').to_numpy(dtype=np.float64)
+    prev_close = pd.to_numeric(fields[prev_close_idx], errors='coerce').to_numpy(dtype=np.float64)
+    prev_close = np.where(np.isnan(prev_close), prices, prev_close)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_percent = np.where(prev_close > 0, (prices - prev_close) / prev_close * 100, 0.0)
+
+    quotes = pd.DataFrame({
+        'symbol': [code[2:] for code in codes],
+        'name': names.to_numpy(dtype=object),
+        'current_price': prices,
+        'change_percent': change_percent
+    })
+    valid = (quotes['name'] != '') & quotes['current_price'].notna()
+    return quotes[valid].reset_index(drop=True)
+
+
+def parse_tencent_quotes(content: str) -> pd.DataFrame:
+    """解析腾讯财经多股票行情响应"""
+    return _parse_quote_payloads(TENCENT_PATTERN.findall(content), '~',
+                                 name_idx=1, price_idx=3, prev_close_idx=4)
+
+
+def parse_sina_quotes(content: str) -> pd.DataFrame:
+    """解析新浪财经多股票行情响应"""
+    return _parse_quote_payloads(SINA_PATTERN.findall(content), ',',
+                                 name_idx=0, price_idx=3, prev_close_idx=2)
+
+
+def quotes_to_dict(quotes: pd.DataFrame) -> dict:
+    """将解析结果转换为 {代码: 股票数据} 字典"""
+    return {
+        symbol: {
+            'name': name,
+            'current_price': float(price),
+            'change_percent': float(change)
+        }
+        for symbol, name, price, change in zip(
+            quotes['symbol'], quotes['name'], quotes['current_price'], quotes['change_percent']
+        )
+    }
+
+
+def parse_netease_csv(content: Union[bytes, BinaryIO]) -> pd.DataFrame:
+    """解析网易历史行情CSV，返回按日期升序、与efinance列名一致的DataFrame
+
+    直接从字节流按表头选取列，不逐行构造Python对象；C解析器无法识别为数值的列再整列转换为float64，
+    无法解析的值（停牌日的空字段、None等）记为NaN。停牌日（收盘价为0）和价格缺失的行被丢弃。
+    """
+    if isinstance(content, (bytes, bytearray)):
+        content = io.BytesIO(content)
+
+    frame = pd.read_csv(
+        content,
+        encoding='gbk',
+        usecols=lambda column: column == '日期' or column in NETEASE_COLUMNS,
+        na_values=['None'],
+        engine='c'
+    ).rename(columns=NETEASE_COLUMNS)
+
+    if frame.empty:
+        return pd.DataFrame(columns=['日期'] + list(NETEASE_COLUMNS.values()))
+
+    frame['日期'] = pd.to_datetime(frame['日期'], format='%Y-%m-%d')
+    numeric = [column for column in frame.columns if column != '日期']
+    for column in numeric:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(np.float64)
+    prices = [column for column in NETEASE_PRICE_COLUMNS if column in frame.columns]
+    frame = frame[(frame['收盘'] > 0) & frame[prices].notna().all(axis=1)]
+    # 网易按日期倒序返回
+    return frame.sort_values('日期', kind='stable').reset_index(drop=True)
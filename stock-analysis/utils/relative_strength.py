@@ -0,0 +1,98 @@
+"""
+相对强度、滚动贝塔和相关系数（个股对指数）工具函数
+"""
+import numpy as np
+from typing import Dict, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rolling_regression import window_moments, flat_windows
+
+RS_PERIOD = 20      # 相对强度比较的区间（与原20日涨跌幅一致）
+BETA_WINDOW = 60    # 滚动贝塔和相关系数的窗口（日收益率个数）
+
+
+def align_to(dates: np.ndarray, index_dates: np.ndarray, index_values: np.ndarray) -> np.ndarray:
+    """把指数序列对齐到个股日期（二分查找，整列一次完成），指数没有的日期为NaN"""
+    dates = np.asarray(dates)
+    index_dates = np.asarray(index_dates)
+    aligned = np.full(dates.shape, np.nan)
+    if len(index_dates) == 0:
+        return aligned
+    positions = np.searchsorted(index_dates, dates)
+    positions = np.minimum(positions, len(index_dates) - 1)
+    matched = index_dates[positions] == dates
+    aligned[matched] = np.asarray(index_values, dtype=np.float64)[positions[matched]]
+    return aligned
+
+
+def simple_returns(values: np.ndarray) -> np.ndarray:
+    """沿最后一维的日收益率，第一个位置为NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    returns = np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[..., 1:] = values[..., 1:] / values[..., :-1] - 1
+    return returns
+
+
+def rolling_beta(returns: np.ndarray, benchmark_returns: np.ndarray,
+                 window: int = BETA_WINDOW) -> Dict[str, np.ndarray]:
+    """个股收益率对基准收益率的滚动贝塔和相关系数
+
+    各窗口的均值和二阶矩由分块前缀和一次求出（见 window_moments），整条序列 O(n)；
+    returns 可以是二维（股票 × 日期），基准按行广播。窗口内任一方有NaN、基准方差为0时为NaN。
+    """
+    y = np.asarray(returns, dtype=np.float64)
+    x = np.broadcast_to(np.asarray(benchmark_returns, dtype=np.float64), y.shape)
+    result = {key: np.full(y.shape, np.nan) for key in ('beta', 'correlation')}
+    if window < 2 or y.shape[-1] < window:
+        return result
+
+    moments, gaps = window_moments(x, y, window)
+    x_flat = flat_windows(x, window)
+    y_flat = flat_windows(y, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = np.where(x_flat, np.nan, moments['xy'] / moments['xx'])
+        correlation = np.where(x_flat | y_flat, np.nan, moments['xy'] / np.sqrt(moments['xx'] * moments['yy']))
+
+    result['beta'][..., window - 1:] = np.where(gaps, np.nan, beta)
+    result['correlation'][..., window - 1:] = np.where(gaps, np.nan, np.clip(correlation, -1, 1))
+    return result
+
+
+def relative_strength(close: np.ndarray, benchmark_close: np.ndarray,
+                      period: int = RS_PERIOD, window: int = BETA_WINDOW) -> Optional[Dict[str, float]]:
+    """个股与已对齐的基准收盘价比较，只使用两边都有数据的日期
+
+    返回最近 period 根的个股、基准涨跌幅（%）及其差值，相对强度比率（个股/基准）的区间变化（%）
+    和它相对自身 period 日均值的位置，最近 window 个日收益率的贝塔和相关系数；共同日期不足 period 根时返回None。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    benchmark_close = np.asarray(benchmark_close, dtype=np.float64)
+    common = ~np.isnan(close) & ~np.isnan(benchmark_close) & (benchmark_close > 0)
+    stock = close[common]
+    benchmark = benchmark_close[common]
+    if len(stock) < period:
+        return None
+
+    ratio = stock / benchmark
+    stock_change = (stock[-1] / stock[-period] - 1) * 100
+    benchmark_change = (benchmark[-1] / benchmark[-period] - 1) * 100
+    ratio_change = (ratio[-1] / ratio[-period] - 1) * 100
+    ratio_mean = ratio[-period:].mean()
+
+    # 只需要最新一个窗口：取最后 window + 1 根价格（window 个收益率）
+    tail = slice(-(window + 1), None)
+    statistics = rolling_beta(simple_returns(stock[tail]), simple_returns(benchmark[tail]), window)
+    return {
+        'stock_change': float(stock_change),
+        'benchmark_change': float(benchmark_change),
+        'relative_strength': float(stock_change - benchmark_change),
+        'rs_ratio': float(ratio[-1]),
+        'rs_ratio_change': float(ratio_change),
+        'rs_above_mean': bool(ratio[-1] > ratio_mean),
+        'beta': float(statistics['beta'][-1]),
+        'correlation': float(statistics['correlation'][-1]),
+        'common_days': int(len(stock))
+    }
@@ -0,0 +1,137 @@
+"""
+分钟K线周期合成工具函数
+"""
+import numpy as np
+from typing import Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bars import Bars
+
+# A股连续竞价时段（当天分钟数）：09:30-11:30、13:00-15:00，共240分钟
+MORNING_OPEN = 9 * 60 + 30
+MORNING_CLOSE = 11 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+SESSION_MINUTES = 240
+MORNING_MINUTES = MORNING_CLOSE - MORNING_OPEN
+
+SUPPORTED_MINUTES = (1, 5, 15, 30, 60)
+
+
+def session_ordinal(dates: np.ndarray) -> np.ndarray:
+    """1分钟K线（以结束时间标记）在当天交易时段中的序号 1..240
+
+    09:30 的集合竞价K线并入第一分钟，收盘后的K线并入最后一分钟。
+    """
+    minute_of_day = (dates % 86400) // 60
+    ordinal = np.where(minute_of_day <= MORNING_CLOSE,
+                       minute_of_day - MORNING_OPEN,
+                       minute_of_day - AFTERNOON_OPEN + MORNING_MINUTES)
+    return np.clip(ordinal, 1, SESSION_MINUTES)
+
+
+def bucket_keys(dates: np.ndarray, minutes: int) -> np.ndarray:
+    """周期编号：同一交易日内按交易分钟分组，午休不计入周期（如60分钟线为10:30、11:30、14:00、15:00）"""
+    return (dates // 86400) * SESSION_MINUTES + (session_ordinal(dates) - 1) // minutes
+
+
+def bucket_end(keys: np.ndarray, minutes: int) -> np.ndarray:
+    """周期结束时间（Unix秒），合成后的K线以结束时间标记，与efinance一致"""
+    end_ordinal = np.minimum((keys % SESSION_MINUTES + 1) * minutes, SESSION_MINUTES)
+    minute_of_day = np.where(end_ordinal <= MORNING_MINUTES,
+                             MORNING_OPEN + end_ordinal,
+                             AFTERNOON_OPEN + end_ordinal - MORNING_MINUTES)
+    return (keys // SESSION_MINUTES) * 86400 + minute_of_day * 60
+
+
+def _aggregate(bars: Bars, keys: np.ndarray, minutes: int) -> Bars:
+    """按已排序的周期编号整体聚合（reduceat，不逐行循环）"""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return Bars(
+        dates=bucket_end(keys[starts], minutes),
+        open=bars.open[starts],
+        high=np.maximum.reduceat(bars.high, starts),
+        low=np.minimum.reduceat(bars.low, starts),
+        close=bars.close[ends],
+        volume=np.add.reduceat(bars.volume, starts),
+        amount=np.add.reduceat(bars.amount, starts),
+        symbol=bars.symbol, name=bars.name
+    )
+
+
+class OHLCVAggregator:
+    """流式分钟K线合成器
+
+    按时间顺序推入1分钟K线，返回已经结束的周期K线；最后一个周期（包括只有1分钟的周期）暂存，
+    新数据到达时继续累加，可随时通过 partial() 取得当前正在形成的K线。
+    最新一分钟在盘中可能被上游修正，再次推入时替换而不是跳过；
+    因此只有更晚的分钟到达后，之前的周期才视为完成。
+    """
+
+    def __init__(self, minutes: int):
+        if minutes not in SUPPORTED_MINUTES:
+            raise ValueError(f"Unsupported timeframe: {minutes} minutes")
+        self.minutes = minutes
+        self._pending: Optional[Bars] = None
+        self._last_date: Optional[int] = None
+
+    def push(self, bars: Bars) -> Optional[Bars]:
+        """推入新的1分钟K线，返回本次完成的周期K线（没有时返回None）"""
+        if self._last_date is not None:
+            # 早于最新一分钟的K线已经推入过，不重复累加；最新一分钟重新推入（可能已被修正）
+            bars = bars.since(self._last_date)
+        if bars.empty:
+            return None
+        self._last_date = int(bars.dates[-1])
+
+        if self._pending is not None:
+            # 用新数据替换暂存中相同时间的分钟
+            kept = self._pending[:int(np.searchsorted(self._pending.dates, bars.dates[0]))]
+            bars = Bars.concat([kept, bars]) if len(kept) else bars
+        keys = bucket_keys(bars.dates, self.minutes) if self.minutes > 1 else bars.dates
+        # 最后一个周期留待后续数据（结束分钟也可能还会被修正）
+        split = int(np.searchsorted(keys, keys[-1]))
+
+        self._pending = bars[split:]
+        if split == 0:
+            return None
+        if self.minutes == 1:
+            return bars[:split]
+        return _aggregate(bars[:split], keys[:split], self.minutes)
+
+    def partial(self) -> Optional[Bars]:
+        """当前正在形成的周期K线"""
+        if self._pending is None:
+            return None
+        if self.minutes == 1:
+            return self._pending
+        return _aggregate(self._pending, bucket_keys(self._pending.dates, self.minutes), self.minutes)
+
+    def flush(self) -> Optional[Bars]:
+        """结束当前周期并返回其K线（之后再推入相同的分钟会作为新的周期）"""
+        pending = self.partial()
+        self._pending = None
+        return pending
+
+
+def resample_bars(bars: Bars, minutes: int) -> Bars:
+    """将1分钟K线合成为 minutes 分钟K线（最后一个未结束的周期同样输出）"""
+    if minutes == 1 or bars.empty:
+        return bars
+    aggregator = OHLCVAggregator(minutes)
+    parts = [aggregator.push(bars), aggregator.flush()]
+    parts = [part for part in parts if part is not None]
+    return Bars.concat(parts) if len(parts) > 1 else parts[0]
+
+
+def parse_timeframe(timeframe: str) -> Optional[int]:
+    """解析K线周期：'1d' 返回None（日K线），'1m'/'5m'/.../'60m' 返回分钟数"""
+    timeframe = timeframe.strip().lower()
+    if timeframe in ('1d', 'd', 'day', 'daily'):
+        return None
+    minutes = int(timeframe[:-1]) if timeframe.endswith('m') and timeframe[:-1].isdigit() else None
+    if minutes not in SUPPORTED_MINUTES:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return minutes
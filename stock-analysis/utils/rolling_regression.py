@@ -0,0 +1,162 @@
+"""
+滚动线性回归（趋势线）工具函数
+"""
+import numpy as np
+from typing import Dict, Tuple
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extrema import window_extreme
+
+# 趋势状态：斜率方向和相关系数强弱（与爱德华兹趋势分析的阈值一致）
+STRONG_CORRELATION = 0.7
+MEDIUM_CORRELATION = 0.3
+TREND_LABELS = {
+    2: ("上升趋势", "强"),
+    1: ("上升趋势", "中等"),
+    0: ("横盘整理", "弱"),
+    -1: ("下降趋势", "中等"),
+    -2: ("下降趋势", "强"),
+}
+
+
+def window_sums(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """沿最后一维的滚动窗口和（前缀和相减）及窗口内是否有NaN，长度 n - window + 1"""
+    missing = np.isnan(values)
+    prefix = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    if missing.any():
+        np.cumsum(np.where(missing, 0.0, values), axis=-1, out=prefix[..., 1:])
+        gaps = window_extreme(missing, window, 'max')
+    else:
+        np.cumsum(values, axis=-1, out=prefix[..., 1:])
+        gaps = np.zeros(prefix[..., window:].shape, dtype=bool)
+    return prefix[..., window:] - prefix[..., :-window], gaps
+
+
+# 分块中心化的块长：数值先减去所在块的均值再求前缀和，前缀和的量级只与块内波动有关
+BLOCK = 256
+
+
+def _center_blocks(values: np.ndarray, missing: np.ndarray, block: int) -> Tuple[np.ndarray, np.ndarray]:
+    """按每 block 根分块减去块均值（缺失位置为0），返回 (中心化后的数组, 每块的均值)"""
+    n = values.shape[-1]
+    total = -(-n // block) * block
+    padded = np.zeros(values.shape[:-1] + (total,))
+    padded[..., :n] = np.where(missing, 0.0, values)
+    shape = values.shape[:-1] + (total // block, block)
+    counts = np.add.reduceat(~missing, np.arange(0, n, block), axis=-1)
+    anchors = padded.reshape(shape).sum(axis=-1) / np.maximum(counts, 1)
+    centered = padded[..., :n] - np.repeat(anchors, block, axis=-1)[..., :n]
+    centered[missing] = 0.0
+    return centered, anchors
+
+
+def window_moments(x: np.ndarray, y: np.ndarray, window: int) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """沿最后一维每个 window 根窗口的均值和中心化二阶矩（Σ(x-x̄)²、Σ(y-ȳ)²、Σ(x-x̄)(y-ȳ)），长度 n - window + 1
+
+    直接对原始数值求前缀和再相减，长序列上前缀和远大于窗口内的波动，相减后只剩很少的有效位。
+    这里先按 block 根分块减去块均值，前缀和只累加块内偏差；窗口最多跨两个块，
+    后一块的部分按两块均值之差换算到前一块的基准上（均值差与块内波动同一量级，不产生大数相减）。
+    任一方为NaN的位置两边都视为缺失，返回 ({mean_x, mean_y, xx, yy, xy}, 窗口内是否有缺失)。
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    missing = np.isnan(x) | np.isnan(y)
+    n = x.shape[-1]
+    count = n - window + 1
+    block = max(BLOCK, window)
+    dx, anchor_x = _center_blocks(x, missing, block)
+    dy, anchor_y = _center_blocks(y, missing, block)
+
+    sums = {}
+    prefixes = {}
+    for name, values in (('x', dx), ('y', dy), ('xx', dx * dx), ('yy', dy * dy), ('xy', dx * dy)):
+        prefix = np.zeros(values.shape[:-1] + (n + 1,))
+        np.cumsum(values, axis=-1, out=prefix[..., 1:])
+        sums[name] = prefix[..., window:] - prefix[..., :-window]
+        prefixes[name] = prefix
+
+    # 以窗口起点所在块的均值为基准
+    sum_x, sum_y = sums['x'], sums['y']
+    sum_xx, sum_yy, sum_xy = sums['xx'], sums['yy'], sums['xy']
+    base_x = np.repeat(anchor_x, block, axis=-1)[..., :count]
+    base_y = np.repeat(anchor_y, block, axis=-1)[..., :count]
+
+    # 跨块的窗口（每块只有 window-1 个）：后一块的偏差加上两块均值之差
+    crossing = (np.arange(0, count, block)[:, None] + np.arange(block - window + 1, block)).ravel()
+    crossing = crossing[crossing < count]
+    if len(crossing):
+        k = crossing // block
+        boundary = (k + 1) * block
+        tail = (crossing + window - boundary).astype(np.float64)
+        shift_x = anchor_x[..., k + 1] - anchor_x[..., k]
+        shift_y = anchor_y[..., k + 1] - anchor_y[..., k]
+        stop = crossing + window
+        tail_x = prefixes['x'][..., stop] - prefixes['x'][..., boundary]
+        tail_y = prefixes['y'][..., stop] - prefixes['y'][..., boundary]
+        sum_xx[..., crossing] += 2 * shift_x * tail_x + tail * shift_x * shift_x
+        sum_yy[..., crossing] += 2 * shift_y * tail_y + tail * shift_y * shift_y
+        sum_xy[..., crossing] += shift_y * tail_x + shift_x * tail_y + tail * shift_x * shift_y
+        sum_x[..., crossing] += tail * shift_x
+        sum_y[..., crossing] += tail * shift_y
+
+    moments = {
+        'mean_x': base_x + sum_x / window,
+        'mean_y': base_y + sum_y / window,
+        'xx': np.maximum(sum_xx - sum_x * sum_x / window, 0.0),
+        'yy': np.maximum(sum_yy - sum_y * sum_y / window, 0.0),
+        'xy': sum_xy - sum_x * sum_y / window,
+    }
+    return moments, window_extreme(missing, window, 'max')
+
+
+def flat_windows(values: np.ndarray, window: int) -> np.ndarray:
+    """窗口内数值全部相等（方差为0）的窗口，长度 n - window + 1"""
+    return window_extreme(values, window, 'max') == window_extreme(values, window, 'min')
+
+
+def rolling_regression(values: np.ndarray, window: int = 20) -> Dict[str, np.ndarray]:
+    """每个 window 根窗口对 x = 0..window-1 做最小二乘直线拟合
+
+    返回与输入同形状的 slope、intercept（窗口第一根处的拟合值，与 np.polyfit 一致）和
+    correlation（x 与价格的相关系数）；前 window-1 个位置及窗口内有NaN时为NaN，价格不变的窗口相关系数为NaN。
+    各窗口的矩由分块前缀和得到（见 window_moments），整条序列 O(n)；二维输入（股票 × 日期）逐行计算。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = {key: np.full(values.shape, np.nan) for key in ('slope', 'intercept', 'correlation')}
+    n = values.shape[-1]
+    if window < 2 or n < window:
+        return result
+
+    moments, gaps = window_moments(np.arange(n, dtype=np.float64), values, window)
+    # x = 0..window-1 的离差平方和
+    x_variance = window * (window * window - 1) / 12
+    slope = moments['xy'] / x_variance
+    intercept = moments['mean_y'] - slope * (window - 1) / 2
+    flat = flat_windows(values, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.where(flat, np.nan, moments['xy'] / np.sqrt(x_variance * moments['yy']))
+
+    for key, computed in (('slope', slope), ('intercept', intercept), ('correlation', np.clip(correlation, -1, 1))):
+        result[key][..., window - 1:] = np.where(gaps, np.nan, computed)
+    return result
+
+
+def trend_states(slope: np.ndarray, correlation: np.ndarray) -> np.ndarray:
+    """趋势状态序列：2 强势上升、1 上升、0 横盘、-1 下降、-2 强势下降（数据不足处为0）"""
+    slope = np.asarray(slope)
+    correlation = np.asarray(correlation)
+    with np.errstate(invalid='ignore'):
+        conditions = [
+            (slope > 0) & (correlation > STRONG_CORRELATION),
+            (slope > 0) & (correlation > MEDIUM_CORRELATION),
+            (slope < 0) & (correlation < -STRONG_CORRELATION),
+            (slope < 0) & (correlation < -MEDIUM_CORRELATION),
+        ]
+    return np.select(conditions, [2, 1, -2, -1], default=0).astype(np.int8)
+
+
+def state_changes(states: np.ndarray) -> np.ndarray:
+    """状态发生变化的位置（一维），第 i 个元素表示 states[i] != states[i-1]"""
+    states = np.asarray(states)
+    return np.flatnonzero(states[1:] != states[:-1]) + 1
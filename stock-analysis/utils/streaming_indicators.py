@@ -0,0 +1,454 @@
+"""
+流式技术指标（逐根K线增量更新）
+"""
+import numpy as np
+import copy
+from collections import deque
+from typing import Dict, Any, Optional, List
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bars import Bars
+
+NAN = float('nan')
+
+
+class StreamingEMA:
+    """指数移动平均，与 pandas ewm(span).mean()（adjust=True）逐点一致
+
+    adjust=True 的EMA等于加权和/权重和，两者都可以按 (1-alpha) 递推，每根K线 O(1)。
+    """
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+
+    def update(self, value: float) -> float:
+        decay = 1.0 - self.alpha
+        self.weighted_sum = self.weighted_sum * decay + value
+        self.weight = self.weight * decay + 1.0
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.weighted_sum / self.weight if self.weight else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'span': self.span, 'weighted_sum': self.weighted_sum, 'weight': self.weight}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingEMA':
+        ema = cls(state['span'])
+        ema.weighted_sum = state['weighted_sum']
+        ema.weight = state['weight']
+        return ema
+
+
+class StreamingSMA:
+    """简单移动平均：固定长度队列加滚动和"""
+
+    # 每隔若干次更新按队列重新求和，消除浮点累计误差（均摊仍为 O(1)）
+    RESUM_INTERVAL = 1024
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window: deque = deque(maxlen=period)
+        self.total = 0.0
+        self._updates = 0
+
+    def update(self, value: float) -> float:
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        self._updates += 1
+        if self._updates % self.RESUM_INTERVAL == 0:
+            self.total = float(sum(self.window))
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.total / self.period if len(self.window) == self.period else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'window': list(self.window)}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingSMA':
+        sma = cls(state['period'])
+        sma.window.extend(state['window'])
+        sma.total = float(sum(sma.window))
+        return sma
+
+
+class MonotonicWindow:
+    """滑动窗口最大值/最小值：单调队列保存(序号, 值)，每次更新均摊 O(1)"""
+
+    def __init__(self, period: int, mode: str = 'max'):
+        if mode not in ('max', 'min'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.period = period
+        self.mode = mode
+        self.items: deque = deque()
+        self.count = 0
+
+    def update(self, value: float) -> float:
+        items = self.items
+        if self.mode == 'max':
+            while items and items[-1][1] <= value:
+                items.pop()
+        else:
+            while items and items[-1][1] >= value:
+                items.pop()
+        items.append((self.count, value))
+        self.count += 1
+        # 移出窗口之外的旧值
+        if items[0][0] <= self.count - 1 - self.period:
+            items.popleft()
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.items[0][1] if self.count >= self.period else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'mode': self.mode, 'items': [list(item) for item in self.items],
+                'count': self.count}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'MonotonicWindow':
+        window = cls(state['period'], state['mode'])
+        window.items.extend(tuple(item) for item in state['items'])
+        window.count = state['count']
+        return window
+
+
+class StreamingMACD:
+    """MACD(12, 26, 9)，与批量计算的 IndicatorContext.macd() 一致"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.macd = NAN
+
+    def update(self, close: float) -> Dict[str, float]:
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        self.signal.update(self.macd)
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        signal = self.signal.value
+        return {'macd': self.macd, 'signal': signal, 'histogram': self.macd - signal}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal': self.signal.to_dict(),
+                'macd': self.macd}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingMACD':
+        macd = cls()
+        macd.fast = StreamingEMA.from_dict(state['fast'])
+        macd.slow = StreamingEMA.from_dict(state['slow'])
+        macd.signal = StreamingEMA.from_dict(state['signal'])
+        macd.macd = state['macd']
+        return macd
+
+
+class StreamingRSI:
+    """Wilder RSI：前 period 个涨跌取简单平均作为初值，之后按 (avg*(n-1)+x)/n 平滑（与talib一致，涨跌均为0时为0）"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.changes = 0
+
+    def update(self, close: float) -> float:
+        if self.prev_close is not None:
+            change = close - self.prev_close
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self.changes += 1
+            if self.changes <= self.period:
+                # 初始阶段累计简单平均
+                self.avg_gain += (gain - self.avg_gain) / self.changes
+                self.avg_loss += (loss - self.avg_loss) / self.changes
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.changes < self.period:
+            return NAN
+        total = self.avg_gain + self.avg_loss
+        return 100.0 * self.avg_gain / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'prev_close': self.prev_close, 'avg_gain': self.avg_gain,
+                'avg_loss': self.avg_loss, 'changes': self.changes}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingRSI':
+        rsi = cls(state['period'])
+        rsi.prev_close = state['prev_close']
+        rsi.avg_gain = state['avg_gain']
+        rsi.avg_loss = state['avg_loss']
+        rsi.changes = state['changes']
+        return rsi
+
+
+class StreamingKDJ:
+    """KDJ(9, 3, 3)：RSV的最高/最低价用单调队列维护，K、D为1/3权重的递推平滑，初值50"""
+
+    def __init__(self, period: int = 9, k_smooth: int = 3, d_smooth: int = 3):
+        self.period = period
+        self.k_smooth = k_smooth
+        self.d_smooth = d_smooth
+        self.highest = MonotonicWindow(period, 'max')
+        self.lowest = MonotonicWindow(period, 'min')
+        self.k = 50.0
+        self.d = 50.0
+
+    def update(self, high: float, low: float, close: float) -> Dict[str, float]:
+        highest_high = self.highest.update(high)
+        lowest_low = self.lowest.update(low)
+        if not np.isnan(highest_high):
+            price_range = highest_high - lowest_low
+            rsv = (close - lowest_low) / price_range * 100 if price_range > 0 else 50.0
+            self.k = ((self.k_smooth - 1) * self.k + rsv) / self.k_smooth
+            self.d = ((self.d_smooth - 1) * self.d + self.k) / self.d_smooth
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        if self.highest.count < self.period:
+            return {'k': NAN, 'd': NAN, 'j': NAN}
+        return {'k': self.k, 'd': self.d, 'j': 3 * self.k - 2 * self.d}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'k_smooth': self.k_smooth, 'd_smooth': self.d_smooth,
+                'highest': self.highest.to_dict(), 'lowest': self.lowest.to_dict(), 'k': self.k, 'd': self.d}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingKDJ':
+        kdj = cls(state['period'], state['k_smooth'], state['d_smooth'])
+        kdj.highest = MonotonicWindow.from_dict(state['highest'])
+        kdj.lowest = MonotonicWindow.from_dict(state['lowest'])
+        kdj.k = state['k']
+        kdj.d = state['d']
+        return kdj
+
+
+class StreamingBollinger:
+    """布林带(20, 2)：窗口内均值和离差平方和按加入/移出增量更新（Welford），样本标准差 ddof=1"""
+
+    def __init__(self, period: int = 20, width: float = 2.0):
+        self.period = period
+        self.width = width
+        self.window: deque = deque(maxlen=period)
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, close: float) -> Dict[str, float]:
+        if len(self.window) == self.period:
+            # 同时移出最旧值、加入新值
+            oldest = self.window[0]
+            old_mean = self.mean
+            self.mean += (close - oldest) / self.period
+            self.m2 += (close - oldest) * (close - self.mean + oldest - old_mean)
+        else:
+            count = len(self.window) + 1
+            delta = close - self.mean
+            self.mean += delta / count
+            self.m2 += delta * (close - self.mean)
+        self.window.append(close)
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        if len(self.window) < self.period:
+            return {'upper': NAN, 'middle': NAN, 'lower': NAN}
+        std = (max(self.m2, 0.0) / (self.period - 1)) ** 0.5
+        return {'upper': self.mean + self.width * std, 'middle': self.mean, 'lower': self.mean - self.width * std}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'width': self.width, 'window': list(self.window)}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingBollinger':
+        boll = cls(state['period'], state['width'])
+        for close in state['window']:
+            boll.update(close)
+        return boll
+
+
+class StreamingWilliamsR:
+    """威廉指标(14)：最高/最低价用单调队列维护"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.highest = MonotonicWindow(period, 'max')
+        self.lowest = MonotonicWindow(period, 'min')
+        self.close = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.highest.update(high)
+        self.lowest.update(low)
+        self.close = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        highest_high, lowest_low = self.highest.value, self.lowest.value
+        if np.isnan(highest_high) or highest_high == lowest_low:
+            return NAN
+        return (highest_high - self.close) / (highest_high - lowest_low) * -100
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'period': self.period, 'highest': self.highest.to_dict(), 'lowest': self.lowest.to_dict(),
+                'close': self.close}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingWilliamsR':
+        wr = cls(state['period'])
+        wr.highest = MonotonicWindow.from_dict(state['highest'])
+        wr.lowest = MonotonicWindow.from_dict(state['lowest'])
+        wr.close = state['close']
+        return wr
+
+
+class StreamingIndicators:
+    """单只股票的流式指标集合
+
+    每根K线完成后调用 update()，所有指标 O(1) 更新；盘中正在形成的K线以 final=False 推入，
+    之后的每次 update 先撤销它再推入新值（相当于替换最后一根K线），K线完成时以 final=True 推入一次。
+    已完成K线的状态可通过 to_dict()/from_dict() 以JSON兼容的字典保存和恢复，
+    盘中为全市场维护实时指标时只需保存每只股票的状态。
+    """
+
+    MA_PERIODS = (5, 10, 20, 60)
+    # 正在形成的K线推入前需要保存的状态
+    STATE_FIELDS = ('last_date', 'bars', 'macd', 'kdj', 'rsi', 'boll', 'wr', 'ma')
+
+    def __init__(self, symbol: str = ''):
+        self.symbol = symbol
+        self.last_date: Optional[int] = None
+        self.bars = 0
+        self.macd = StreamingMACD()
+        self.kdj = StreamingKDJ()
+        self.rsi = StreamingRSI()
+        self.boll = StreamingBollinger()
+        self.wr = StreamingWilliamsR()
+        self.ma = {period: StreamingSMA(period) for period in self.MA_PERIODS}
+        # 推入正在形成的K线之前的状态；没有未完成的K线时为None
+        self._committed: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_bars(cls, bars: Bars, symbol: Optional[str] = None) -> 'StreamingIndicators':
+        """用历史K线初始化状态"""
+        indicators = cls(symbol if symbol is not None else bars.symbol)
+        indicators.extend(bars)
+        return indicators
+
+    @property
+    def forming(self) -> bool:
+        """最后推入的K线是否尚未完成"""
+        return self._committed is not None
+
+    @property
+    def committed_date(self) -> Optional[int]:
+        """最后一根已完成K线的日期"""
+        return self._committed['last_date'] if self._committed is not None else self.last_date
+
+    def extend(self, bars: Bars):
+        """按顺序推入多根已完成的K线，已完成过的日期跳过（正在形成的K线被其完成后的值替换）"""
+        if self.committed_date is not None:
+            bars = bars.since(self.committed_date + 1)
+        for date, high, low, close in zip(bars.dates.tolist(), bars.high.tolist(),
+                                          bars.low.tolist(), bars.close.tolist()):
+            self.update(high, low, close, date)
+
+    def update(self, high: float, low: float, close: float, date: Optional[int] = None,
+               final: bool = True) -> Dict[str, Any]:
+        """推入一根K线，返回最新指标值
+
+        上一次推入的K线未完成时先回到推入它之前的状态；final=False 时保存当前状态再推入，
+        只有未完成的K线需要复制状态（复制量与指标周期有关，与历史长度无关）。
+        """
+        if self._committed is not None:
+            self._restore(self._committed)
+        self._committed = None if final else self._snapshot()
+
+        self.macd.update(close)
+        self.kdj.update(high, low, close)
+        self.rsi.update(close)
+        self.boll.update(close)
+        self.wr.update(high, low, close)
+        for sma in self.ma.values():
+            sma.update(close)
+        self.bars += 1
+        if date is not None:
+            self.last_date = int(date)
+        return self.values()
+
+    def discard_forming(self):
+        """撤销正在形成的K线"""
+        if self._committed is not None:
+            self._restore(self._committed)
+            self._committed = None
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return copy.deepcopy({field: getattr(self, field) for field in self.STATE_FIELDS})
+
+    def _restore(self, state: Dict[str, Any]):
+        # 复制一份，同一快照可以被多次恢复（同一根未完成K线的多次更新）
+        for field, value in copy.deepcopy(state).items():
+            setattr(self, field, value)
+
+    def values(self) -> Dict[str, Any]:
+        return {
+            'macd': self.macd.value,
+            'kdj': self.kdj.value,
+            'rsi': {'rsi': self.rsi.value},
+            'boll': self.boll.value,
+            'wr': {'wr': self.wr.value},
+            'ma': {f"ma{period}": sma.value for period, sma in self.ma.items()}
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """已完成K线的状态（正在形成的K线不保存）"""
+        state = self._committed if self._committed is not None else \
+            {field: getattr(self, field) for field in self.STATE_FIELDS}
+        return {
+            'symbol': self.symbol,
+            'last_date': state['last_date'],
+            'bars': state['bars'],
+            'macd': state['macd'].to_dict(),
+            'kdj': state['kdj'].to_dict(),
+            'rsi': state['rsi'].to_dict(),
+            'boll': state['boll'].to_dict(),
+            'wr': state['wr'].to_dict(),
+            'ma': [sma.to_dict() for sma in state['ma'].values()]
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'StreamingIndicators':
+        indicators = cls(state['symbol'])
+        indicators.last_date = state['last_date']
+        indicators.bars = state['bars']
+        indicators.macd = StreamingMACD.from_dict(state['macd'])
+        indicators.kdj = StreamingKDJ.from_dict(state['kdj'])
+        indicators.rsi = StreamingRSI.from_dict(state['rsi'])
+        indicators.boll = StreamingBollinger.from_dict(state['boll'])
+        indicators.wr = StreamingWilliamsR.from_dict(state['wr'])
+        smas: List[StreamingSMA] = [StreamingSMA.from_dict(item) for item in state['ma']]
+        indicators.ma = {sma.period: sma for sma in smas}
+        return indicators
@@ -0,0 +1,133 @@
+"""
+合成行情数据生成工具函数
+"""
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional
+import zlib
+
+# 市场状态 0 为平稳、1 为动荡，以下数组按状态索引
+# 各状态下的日收益率漂移和波动率
+REGIME_DRIFT = np.array([0.0005, -0.0010])
+REGIME_VOLATILITY = np.array([0.012, 0.030])
+# 每个交易日从平稳转入动荡、从动荡回到平稳的概率
+REGIME_SWITCH_PROB = np.array([0.02, 0.08])
+
+MARKET_BETA_RANGE = (0.6, 1.4)   # 个股对市场因子的敏感度
+LIMIT_RETURN = 0.10              # A股涨跌停幅度
+GAP_RATIO = 0.3                  # 开盘跳空波动率相对当日波动率的比例
+INTRADAY_RANGE = 0.6             # 最高/最低价超出开收盘区间的幅度（相对当日波动率）
+
+VOLUME_PERSISTENCE = 0.8         # 对数成交量的自相关系数
+VOLUME_NOISE = 0.25
+VOLUME_SHOCK = 0.35              # 大幅波动对成交量的放大系数
+
+
+def symbol_seed(symbol: str) -> int:
+    """由股票代码得到稳定的随机种子（不受 PYTHONHASHSEED 影响）"""
+    return zlib.crc32(symbol.encode('utf-8'))
+
+
+def _simulate_regimes(rng: np.random.Generator, n_symbols: int, n_bars: int) -> np.ndarray:
+    """两状态马尔可夫链，每只股票各自切换，返回 (n_symbols, n_bars) 的状态矩阵"""
+    draws = rng.random((n_bars, n_symbols))
+    regimes = np.empty((n_bars, n_symbols), dtype=np.int8)
+    state = (rng.random(n_symbols) < 0.2).astype(np.int8)
+    for t in range(n_bars):
+        # 只对状态向量做逐日递推，随机数已整体生成
+        state = np.where(draws[t] < REGIME_SWITCH_PROB[state], 1 - state, state).astype(np.int8)
+        regimes[t] = state
+    return regimes.T
+
+
+def _simulate_log_volume(noise: np.ndarray, shocks: np.ndarray) -> np.ndarray:
+    """AR(1) 对数成交量偏离，叠加收益率冲击形成成交量聚集"""
+    deviation = np.empty_like(noise)
+    level = np.zeros(noise.shape[0])
+    for t in range(noise.shape[1]):
+        level = VOLUME_PERSISTENCE * level + noise[:, t] + shocks[:, t]
+        deviation[:, t] = level
+    return deviation
+
+
+def generate_market(n_symbols: int, n_bars: int, seed: int = 0,
+                    start_prices: Optional[np.ndarray] = None,
+                    dtype=np.float64) -> Dict[str, np.ndarray]:
+    """生成 n_symbols 只股票、n_bars 个交易日的合成日K线
+
+    收益率为带状态切换的几何布朗运动（市场因子 + 个股因子），按涨跌停幅度截断；
+    开盘价为前收盘加跳空，最高/最低价包住开收盘价，成交量随波动率聚集。
+    返回 open/high/low/close/volume 五个形状为 (n_symbols, n_bars) 的数组，相同 seed 结果相同。
+    """
+    rng = np.random.default_rng(seed)
+
+    if start_prices is None:
+        start_prices = np.exp(rng.uniform(np.log(3), np.log(200), n_symbols))
+    start_prices = np.asarray(start_prices, dtype=np.float64).reshape(n_symbols)
+
+    # 市场因子的状态对所有股票相同，个股因子的状态各自独立
+    market_regime = _simulate_regimes(rng, 1, n_bars)[0]
+    stock_regime = _simulate_regimes(rng, n_symbols, n_bars)
+    beta = rng.uniform(*MARKET_BETA_RANGE, (n_symbols, 1))
+
+    market_vol = REGIME_VOLATILITY[market_regime]
+    market_return = REGIME_DRIFT[market_regime] + market_vol * rng.standard_normal(n_bars)
+    stock_vol = REGIME_VOLATILITY[stock_regime]
+    idio_return = REGIME_DRIFT[stock_regime] * 0.5 + stock_vol * rng.standard_normal((n_symbols, n_bars))
+
+    log_return = beta * market_return + idio_return
+    bound = np.log1p(LIMIT_RETURN)
+    log_return = np.clip(log_return, -bound, bound)
+    daily_vol = np.sqrt((beta * market_vol) ** 2 + stock_vol ** 2)
+
+    close = start_prices[:, None] * np.exp(np.cumsum(log_return, axis=1))
+    prev_close = np.concatenate([start_prices[:, None], close[:, :-1]], axis=1)
+
+    gap = np.clip(GAP_RATIO * daily_vol * rng.standard_normal((n_symbols, n_bars)), -bound, bound)
+    open_ = prev_close * np.exp(gap)
+    upper = np.abs(rng.standard_normal((n_symbols, n_bars))) * INTRADAY_RANGE * daily_vol
+    lower = np.abs(rng.standard_normal((n_symbols, n_bars))) * INTRADAY_RANGE * daily_vol
+    high = np.maximum(open_, close) * np.exp(upper)
+    low = np.minimum(open_, close) * np.exp(-lower)
+
+    base_volume = np.exp(rng.uniform(np.log(2e5), np.log(5e7), (n_symbols, 1)))
+    # 标准化收益率绝对值减去其期望（约0.8），大涨大跌日放量
+    shocks = VOLUME_SHOCK * (np.abs(log_return - beta * REGIME_DRIFT[market_regime]) / daily_vol - 0.8)
+    log_volume = _simulate_log_volume(VOLUME_NOISE * rng.standard_normal((n_symbols, n_bars)), shocks)
+    volume = np.round(base_volume * np.exp(log_volume))
+
+    # 价格按分取整（取整单调，不破坏最高/最低价与开收盘价的大小关系）
+    return {
+        'open': np.maximum(np.round(open_, 2), 0.01).astype(dtype),
+        'high': np.maximum(np.round(high, 2), 0.01).astype(dtype),
+        'low': np.maximum(np.round(low, 2), 0.01).astype(dtype),
+        'close': np.maximum(np.round(close, 2), 0.01).astype(dtype),
+        'volume': volume.astype(dtype)
+    }
+
+
+def trading_dates(n_bars: int, end=None) -> np.ndarray:
+    """截至 end（默认今天）的 n_bars 个工作日"""
+    end = pd.Timestamp.now().normalize() if end is None else pd.Timestamp(end)
+    return pd.bdate_range(end=end, periods=n_bars).to_numpy().astype('datetime64[D]')
+
+
+def generate_bars(symbol: str, n_bars: int, last_close: Optional[float] = None, end=None) -> pd.DataFrame:
+    """按股票代码生成确定性的单只股票日K线DataFrame（efinance列名）
+
+    指定 last_close 时整体缩放价格，使最后一个收盘价等于 last_close。
+    """
+    market = generate_market(1, n_bars, seed=symbol_seed(symbol))
+    prices = {field: market[field][0] for field in ('open', 'high', 'low', 'close')}
+    if last_close is not None and last_close > 0:
+        scale = last_close / prices['close'][-1]
+        prices = {field: np.maximum(np.round(values * scale, 2), 0.01) for field, values in prices.items()}
+
+    return pd.DataFrame({
+        '日期': pd.to_datetime(trading_dates(n_bars, end)),
+        '开盘': prices['open'],
+        '收盘': prices['close'],
+        '最高': prices['high'],
+        '最低': prices['low'],
+        '成交量': market['volume'][0]
+    })
@@ -3,8 +3,19 @@
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
 import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bars import Bars
+from utils.candlestick_scanner import scan_patterns, latest_patterns, pattern_statistics
+from utils.extrema import find_peaks_and_troughs, support_resistance_levels
+from utils.indicator_context import IndicatorContext, as_context
+from utils.kernels import stochastic_kdj, wilder_rsi, parabolic_sar, zigzag
+from utils.rolling_regression import rolling_regression, trend_states, state_changes, TREND_LABELS
+from utils.relative_strength import align_to, relative_strength as compare_to_benchmark, RS_PERIOD
 
 # 尝试导入talib，如果失败则使用替代实现
 try:
@@ -16,30 +27,38 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+TRENDLINE_WINDOW = 20
+
 
 def calculate_ema(data: pd.Series, period: int) -> pd.Series:
     """计算指数移动平均线"""
     return data.ewm(span=period).mean()
 
-def calculate_macd(data: pd.DataFrame) -> Dict[str, Any]:
-    """计算MACD指标"""
-    try:
-        close_prices = data['收盘']
+def macd_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """MACD完整序列：macd、signal、histogram"""
+    ctx = as_context(data)
 
+    def compute():
         if HAS_TALIB:
             # 使用talib计算
-            macd, signal, histogram = talib.MACD(close_prices.values)
-            current_macd = macd[-1] if not np.isnan(macd[-1]) else 0
-            current_signal = signal[-1] if not np.isnan(signal[-1]) else 0
+            macd, signal, histogram = talib.MACD(ctx.bars.close)
         else:
-            # 使用pandas计算MACD
-            ema12 = calculate_ema(close_prices, 12)
-            ema26 = calculate_ema(close_prices, 26)
-            macd_line = ema12 - ema26
-            signal_line = calculate_ema(macd_line, 9)
-
-            current_macd = macd_line.iloc[-1] if len(macd_line) > 0 else 0
-            current_signal = signal_line.iloc[-1] if len(signal_line) > 0 else 0
+            # 使用共享的EMA12/EMA26计算MACD
+            macd, signal, histogram = ctx.macd()
+        return {"macd": macd, "signal": signal, "histogram": histogram}
+
+    return ctx.memo(('indicator', 'macd'), compute)
+
+
+def calculate_macd(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """计算MACD指标"""
+    ctx = as_context(data)
+    try:
+        series = macd_series(ctx)
+        macd, signal, histogram = series["macd"], series["signal"], series["histogram"]
+
+        current_macd = macd[-1] if not np.isnan(macd[-1]) else 0
+        current_signal = signal[-1] if not np.isnan(signal[-1]) else 0
         current_histogram = histogram[-1] if not np.isnan(histogram[-1]) else 0
         
         trend = "bullish" if current_histogram > 0 else "bearish"
@@ -55,38 +74,28 @@ def calculate_macd(data: pd.DataFrame) -> Dict[str, Any]:
         return {"macd": 0, "signal": 0, "histogram": 0, "trend": "neutral"}
 
 
-def calculate_kdj(data: pd.DataFrame) -> Dict[str, Any]:
-    """计算KDJ指标"""
-    try:
-        if HAS_TALIB:
-            high_prices = data['最高'].values
-            low_prices = data['最低'].values
-            close_prices = data['收盘'].values
+def kdj_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """KDJ完整序列：k、d、j（数据不足的位置为NaN）"""
+    ctx = as_context(data)
 
-            k, d = talib.STOCH(high_prices, low_prices, close_prices)
-            j = 3 * k - 2 * d
+    def compute():
+        # talib没有KDJ（STOCH的平滑方式不同），两种环境都用同一个递推内核
+        period = 9
+        return stochastic_kdj(ctx.rolling_max('high', period), ctx.rolling_min('low', period), ctx.bars.close)
 
-            current_k = k[-1] if not np.isnan(k[-1]) else 50
-            current_d = d[-1] if not np.isnan(d[-1]) else 50
-            current_j = j[-1] if not np.isnan(j[-1]) else 50
-        else:
-            # 简化的KDJ计算
-            high_prices = data['最高']
-            low_prices = data['最低']
-            close_prices = data['收盘']
-
-            # 计算RSV
-            period = 9
-            if len(data) >= period:
-                rsv = (close_prices.iloc[-1] - low_prices.rolling(period).min().iloc[-1]) / \
-                      (high_prices.rolling(period).max().iloc[-1] - low_prices.rolling(period).min().iloc[-1]) * 100
-            else:
-                rsv = 50
+    return ctx.memo(('indicator', 'kdj'), compute)
 
-            # 简化的K、D、J值
-            current_k = rsv * 0.6 + 50 * 0.4  # 简化计算
-            current_d = current_k * 0.6 + 50 * 0.4
-            current_j = 3 * current_k - 2 * current_d
+
+def calculate_kdj(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """计算KDJ指标"""
+    ctx = as_context(data)
+    try:
+        series = kdj_series(ctx)
+        k, d, j = series["k"], series["d"], series["j"]
+
+        current_k = k[-1] if np.isfinite(k[-1]) else 50
+        current_d = d[-1] if np.isfinite(d[-1]) else 50
+        current_j = j[-1] if np.isfinite(j[-1]) else 50
         
         if current_k > 80:
             signal = "overbought"
@@ -108,26 +117,27 @@ def calculate_kdj(data: pd.DataFrame) -> Dict[str, Any]:
         return {"k": 50, "d": 50, "j": 50, "signal": "neutral", "overbought": False, "oversold": False}
 
 
-def calculate_rsi(data: pd.DataFrame) -> Dict[str, Any]:
-    """计算RSI指标"""
-    try:
-        close_prices = data['收盘']
+def rsi_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """RSI完整序列"""
+    ctx = as_context(data)
 
+    def compute():
         if HAS_TALIB:
-            rsi = talib.RSI(close_prices.values)
-            current_rsi = rsi[-1] if not np.isnan(rsi[-1]) else 50
+            rsi = talib.RSI(ctx.bars.close)
         else:
-            # 简化的RSI计算
-            period = 14
-            if len(close_prices) >= period:
-                delta = close_prices.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                current_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-            else:
-                current_rsi = 50
+            # Wilder平滑，与talib.RSI结果一致
+            rsi = wilder_rsi(ctx.bars.close, 14)
+        return {"rsi": rsi}
+
+    return ctx.memo(('indicator', 'rsi'), compute)
+
+
+def calculate_rsi(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """计算RSI指标"""
+    ctx = as_context(data)
+    try:
+        rsi = rsi_series(ctx)["rsi"]
+        current_rsi = rsi[-1] if not np.isnan(rsi[-1]) else 50
         
         if current_rsi > 70:
             signal = "overbought"
@@ -147,30 +157,37 @@ def calculate_rsi(data: pd.DataFrame) -> Dict[str, Any]:
         return {"rsi": 50, "signal": "neutral", "overbought": False, "oversold": False}
 
 
-def calculate_bollinger_bands(data: pd.DataFrame) -> Dict[str, Any]:
-    """计算布林带指标"""
-    try:
-        close_prices = data['收盘']
-        current_price = close_prices.iloc[-1]
+def bollinger_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """布林带完整序列：upper、middle、lower"""
+    ctx = as_context(data)
 
+    def compute():
         if HAS_TALIB:
-            upper, middle, lower = talib.BBANDS(close_prices.values)
-            current_upper = upper[-1] if not np.isnan(upper[-1]) else current_price * 1.02
-            current_middle = middle[-1] if not np.isnan(middle[-1]) else current_price
-            current_lower = lower[-1] if not np.isnan(lower[-1]) else current_price * 0.98
+            upper, middle, lower = talib.BBANDS(ctx.bars.close)
         else:
             # 简化的布林带计算
             period = 20
-            if len(close_prices) >= period:
-                sma = close_prices.rolling(window=period).mean()
-                std = close_prices.rolling(window=period).std()
-                current_middle = sma.iloc[-1]
-                current_upper = current_middle + (std.iloc[-1] * 2)
-                current_lower = current_middle - (std.iloc[-1] * 2)
-            else:
-                current_middle = current_price
-                current_upper = current_price * 1.02
-                current_lower = current_price * 0.98
+            middle = ctx.rolling_mean('close', period)
+            std = ctx.rolling_std('close', period)
+            upper = middle + (std * 2)
+            lower = middle - (std * 2)
+        return {"upper": upper, "middle": middle, "lower": lower}
+
+    return ctx.memo(('indicator', 'boll'), compute)
+
+
+def calculate_bollinger_bands(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """计算布林带指标"""
+    ctx = as_context(data)
+    bars = ctx.bars
+    try:
+        current_price = bars.close[-1]
+        series = bollinger_series(ctx)
+        upper, middle, lower = series["upper"], series["middle"], series["lower"]
+
+        current_upper = upper[-1] if not np.isnan(upper[-1]) else current_price * 1.02
+        current_middle = middle[-1] if not np.isnan(middle[-1]) else current_price
+        current_lower = lower[-1] if not np.isnan(lower[-1]) else current_price * 0.98
         
         if current_price > current_upper:
             position = "upper"
@@ -192,7 +209,7 @@ def calculate_bollinger_bands(data: pd.DataFrame) -> Dict[str, Any]:
         }
     except Exception as e:
         logger.error(f"Bollinger Bands calculation error: {e}")
-        current_price = data['收盘'].iloc[-1]
+        current_price = bars.close[-1]
         return {
             "upper": float(current_price * 1.02),
             "middle": float(current_price),
@@ -202,30 +219,32 @@ def calculate_bollinger_bands(data: pd.DataFrame) -> Dict[str, Any]:
         }
 
 
-def calculate_williams_r(data: pd.DataFrame) -> Dict[str, Any]:
-    """计算威廉指标"""
-    try:
-        if HAS_TALIB:
-            high_prices = data['最高'].values
-            low_prices = data['最低'].values
-            close_prices = data['收盘'].values
+def williams_r_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """威廉指标完整序列"""
+    ctx = as_context(data)
 
-            wr = talib.WILLR(high_prices, low_prices, close_prices)
-            current_wr = wr[-1] if not np.isnan(wr[-1]) else -50
+    def compute():
+        bars = ctx.bars
+        if HAS_TALIB:
+            wr = talib.WILLR(bars.high, bars.low, bars.close)
         else:
             # 简化的威廉指标计算
-            high_prices = data['最高']
-            low_prices = data['最低']
-            close_prices = data['收盘']
-
             period = 14
-            if len(data) >= period:
-                highest_high = high_prices.rolling(window=period).max().iloc[-1]
-                lowest_low = low_prices.rolling(window=period).min().iloc[-1]
-                current_close = close_prices.iloc[-1]
-                current_wr = ((highest_high - current_close) / (highest_high - lowest_low)) * -100
-            else:
-                current_wr = -50
+            highest_high = ctx.rolling_max('high', period)
+            lowest_low = ctx.rolling_min('low', period)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                wr = ((highest_high - bars.close) / (highest_high - lowest_low)) * -100
+        return {"wr": wr}
+
+    return ctx.memo(('indicator', 'wr'), compute)
+
+
+def calculate_williams_r(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """计算威廉指标"""
+    ctx = as_context(data)
+    try:
+        wr = williams_r_series(ctx)["wr"]
+        current_wr = wr[-1] if np.isfinite(wr[-1]) else -50
         
         if current_wr > -20:
             signal = "overbought"
@@ -245,15 +264,21 @@ def calculate_williams_r(data: pd.DataFrame) -> Dict[str, Any]:
         return {"wr": -50, "signal": "neutral", "overbought": False, "oversold": False}
 
 
-def calculate_gann_lines(data: pd.DataFrame) -> Dict[str, Any]:
+def calculate_gann_lines(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
     """计算江恩线"""
+    ctx = as_context(data)
+    bars = ctx.bars
     try:
-        close_prices = data['收盘'].values
-        high_prices = data['最高'].values
-        low_prices = data['最低'].values
+        close_prices = bars.close
+        high_prices = bars.high
+        low_prices = bars.low
         
-        recent_high = np.max(high_prices[-20:])
-        recent_low = np.min(low_prices[-20:])
+        if len(bars) >= 20:
+            recent_high = ctx.rolling_max('high', 20)[-1]
+            recent_low = ctx.rolling_min('low', 20)[-1]
+        else:
+            recent_high = np.max(high_prices)
+            recent_low = np.min(low_prices)
         current_price = close_prices[-1]
         
         # 简化的江恩线计算
@@ -288,7 +313,7 @@ def calculate_gann_lines(data: pd.DataFrame) -> Dict[str, Any]:
         }
     except Exception as e:
         logger.error(f"Gann Lines calculation error: {e}")
-        current_price = data['收盘'].iloc[-1]
+        current_price = bars.close[-1]
         return {
             "gann_1x1": float(current_price),
             "gann_2x1": float(current_price),
@@ -302,28 +327,33 @@ def calculate_gann_lines(data: pd.DataFrame) -> Dict[str, Any]:
         }
 
 
-def calculate_moving_averages(data: pd.DataFrame) -> Dict[str, Any]:
-    """计算移动平均线"""
-    try:
-        close_prices = data['收盘']
-        current_price = close_prices.iloc[-1]
+def moving_average_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """均线完整序列：ma5、ma10、ma20、ma60"""
+    ctx = as_context(data)
 
+    def compute():
         if HAS_TALIB:
-            ma5 = talib.SMA(close_prices.values, timeperiod=5)
-            ma10 = talib.SMA(close_prices.values, timeperiod=10)
-            ma20 = talib.SMA(close_prices.values, timeperiod=20)
-            ma60 = talib.SMA(close_prices.values, timeperiod=60)
-
-            current_ma5 = ma5[-1] if not np.isnan(ma5[-1]) else current_price
-            current_ma10 = ma10[-1] if not np.isnan(ma10[-1]) else current_price
-            current_ma20 = ma20[-1] if not np.isnan(ma20[-1]) else current_price
-            current_ma60 = ma60[-1] if not np.isnan(ma60[-1]) else current_price
-        else:
-            # 使用pandas计算移动平均线
-            current_ma5 = close_prices.rolling(window=5).mean().iloc[-1] if len(close_prices) >= 5 else current_price
-            current_ma10 = close_prices.rolling(window=10).mean().iloc[-1] if len(close_prices) >= 10 else current_price
-            current_ma20 = close_prices.rolling(window=20).mean().iloc[-1] if len(close_prices) >= 20 else current_price
-            current_ma60 = close_prices.rolling(window=60).mean().iloc[-1] if len(close_prices) >= 60 else current_price
+            close_prices = ctx.bars.close
+            return {f"ma{period}": talib.SMA(close_prices, timeperiod=period) for period in (5, 10, 20, 60)}
+        # 与布林带、多时间框架分析共用滚动均值
+        return {f"ma{period}": ctx.rolling_mean('close', period) for period in (5, 10, 20, 60)}
+
+    return ctx.memo(('indicator', 'ma'), compute)
+
+
+def calculate_moving_averages(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """计算移动平均线"""
+    ctx = as_context(data)
+    bars = ctx.bars
+    try:
+        current_price = bars.close[-1]
+        series = moving_average_series(ctx)
+        ma5, ma10, ma20, ma60 = series["ma5"], series["ma10"], series["ma20"], series["ma60"]
+
+        current_ma5 = ma5[-1] if not np.isnan(ma5[-1]) else current_price
+        current_ma10 = ma10[-1] if not np.isnan(ma10[-1]) else current_price
+        current_ma20 = ma20[-1] if not np.isnan(ma20[-1]) else current_price
+        current_ma60 = ma60[-1] if not np.isnan(ma60[-1]) else current_price
         
         # 多头排列判断
         bullish_alignment = current_ma5 > current_ma10 > current_ma20 > current_ma60
@@ -353,7 +383,7 @@ def calculate_moving_averages(data: pd.DataFrame) -> Dict[str, Any]:
         }
     except Exception as e:
         logger.error(f"Moving Averages calculation error: {e}")
-        current_price = data['收盘'].iloc[-1]
+        current_price = bars.close[-1]
         return {
             "ma5": float(current_price),
             "ma10": float(current_price),
@@ -365,15 +395,17 @@ def calculate_moving_averages(data: pd.DataFrame) -> Dict[str, Any]:
         }
 
 
-def calculate_volume_analysis(data: pd.DataFrame) -> Dict[str, Any]:
+def calculate_volume_analysis(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
     """计算量能分析"""
+    ctx = as_context(data)
+    bars = ctx.bars
     try:
-        volume = data['成交量'].values
-        close_prices = data['收盘'].values
+        volume = bars.volume
+        close_prices = bars.close
         
         current_volume = volume[-1]
-        volume_ma5 = np.mean(volume[-5:]) if len(volume) >= 5 else current_volume
-        volume_ma10 = np.mean(volume[-10:]) if len(volume) >= 10 else current_volume
+        volume_ma5 = ctx.rolling_mean('volume', 5)[-1] if len(volume) >= 5 else current_volume
+        volume_ma10 = ctx.rolling_mean('volume', 10)[-1] if len(volume) >= 10 else current_volume
         
         volume_ratio = current_volume / volume_ma5 if volume_ma5 > 0 else 1
         
@@ -407,12 +439,14 @@ def calculate_volume_analysis(data: pd.DataFrame) -> Dict[str, Any]:
         }
 
 
-def calculate_turnover_rate(data: pd.DataFrame, current_price: float) -> Dict[str, Any]:
+def calculate_turnover_rate(data: Union[pd.DataFrame, Bars, IndicatorContext], current_price: float) -> Dict[str, Any]:
     """计算换手率分析"""
+    ctx = as_context(data)
+    bars = ctx.bars
     try:
         # 获取最近的成交量数据
-        recent_volume = data['成交量'].tail(5).mean()
-        current_volume = data['成交量'].iloc[-1]
+        recent_volume = ctx.rolling_mean('volume', 5)[-1] if len(bars) >= 5 else bars.volume.mean()
+        current_volume = bars.volume[-1]
 
         # 模拟流通股本（实际应该从基本面数据获取）
         # 这里基于股价估算一个合理的流通股本
@@ -440,8 +474,7 @@ def calculate_turnover_rate(data: pd.DataFrame, current_price: float) -> Dict[st
             signal = "bearish"
 
         # 计算5日平均换手率
-        volume_5d = data['成交量'].tail(5)
-        turnover_5d_avg = (volume_5d.mean() / estimated_shares) * 100
+        turnover_5d_avg = (recent_volume / estimated_shares) * 100
 
         return {
             "turnover_rate": float(turnover_rate),
@@ -463,31 +496,16 @@ def calculate_turnover_rate(data: pd.DataFrame, current_price: float) -> Dict[st
         }
 
 
-def calculate_elliott_wave(data: pd.DataFrame) -> Dict[str, Any]:
+def calculate_elliott_wave(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
     """计算艾略特波浪理论分析"""
+    ctx = as_context(data)
+    bars = ctx.bars
     try:
-        close_prices = data['收盘'].values
-        high_prices = data['最高'].values
-        low_prices = data['最低'].values
-
-        # 寻找波峰和波谷
-        def find_peaks_and_troughs(prices, window=5):
-            peaks = []
-            troughs = []
-
-            for i in range(window, len(prices) - window):
-                # 波峰：比前后window个点都高
-                if all(prices[i] >= prices[i-j] for j in range(1, window+1)) and \
-                   all(prices[i] >= prices[i+j] for j in range(1, window+1)):
-                    peaks.append((i, prices[i]))
-
-                # 波谷：比前后window个点都低
-                if all(prices[i] <= prices[i-j] for j in range(1, window+1)) and \
-                   all(prices[i] <= prices[i+j] for j in range(1, window+1)):
-                    troughs.append((i, prices[i]))
-
-            return peaks, troughs
+        close_prices = bars.close
+        high_prices = bars.high
+        low_prices = bars.low
 
+        # 寻找波峰和波谷（前后各5个点内的局部极值）
         peaks, troughs = find_peaks_and_troughs(close_prices)
 
         # 分析波浪结构
@@ -534,8 +552,8 @@ def calculate_elliott_wave(data: pd.DataFrame) -> Dict[str, Any]:
 
         # 计算斐波那契回调位
         if len(close_prices) >= 20:
-            recent_high = max(close_prices[-20:])
-            recent_low = min(close_prices[-20:])
+            recent_high = ctx.rolling_max('close', 20)[-1]
+            recent_low = ctx.rolling_min('close', 20)[-1]
             price_range = recent_high - recent_low
 
             fib_levels = {
@@ -601,69 +619,68 @@ def calculate_elliott_wave(data: pd.DataFrame) -> Dict[str, Any]:
         }
 
 
-def analyze_edwards_trend(data: pd.DataFrame) -> Dict[str, Any]:
-    """罗伯特·D·爱德华兹股市趋势技术分析"""
-    try:
-        close_prices = data['收盘'].values
-        high_prices = data['最高'].values
-        low_prices = data['最低'].values
-        volume = data['成交量'].values
-
-        # 1. 趋势线分析
-        def calculate_trendlines(prices, window=20):
-            if len(prices) < window:
-                return None, None, "数据不足"
-
-            recent_prices = prices[-window:]
-            x = np.arange(len(recent_prices))
-
-            # 计算趋势线斜率
-            slope, intercept = np.polyfit(x, recent_prices, 1)
-
-            # 趋势强度
-            correlation = np.corrcoef(x, recent_prices)[0, 1]
-
-            if slope > 0 and correlation > 0.7:
-                trend_direction = "上升趋势"
-                trend_strength = "强"
-            elif slope > 0 and correlation > 0.3:
-                trend_direction = "上升趋势"
-                trend_strength = "中等"
-            elif slope < 0 and correlation < -0.7:
-                trend_direction = "下降趋势"
-                trend_strength = "强"
-            elif slope < 0 and correlation < -0.3:
-                trend_direction = "下降趋势"
-                trend_strength = "中等"
-            else:
-                trend_direction = "横盘整理"
-                trend_strength = "弱"
+def trend_label(state: int) -> str:
+    """趋势状态的中文描述，如 上升趋势(强)"""
+    direction, strength = TREND_LABELS[int(state)]
+    return f"{direction}({strength})"
 
-            return slope, correlation, trend_direction, trend_strength
 
-        slope, correlation, trend_direction, trend_strength = calculate_trendlines(close_prices)
+def trendline_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """20日滚动趋势线完整序列：slope、intercept、correlation 和趋势状态 state（2 强势上升 … -2 强势下降）"""
+    ctx = as_context(data)
 
-        # 2. 支撑阻力位分析
-        def find_support_resistance(highs, lows, closes, window=10):
-            support_levels = []
-            resistance_levels = []
+    def compute():
+        trend = rolling_regression(ctx.bars.close, TRENDLINE_WINDOW)
+        trend["state"] = trend_states(trend["slope"], trend["correlation"])
+        return trend
 
-            for i in range(window, len(closes) - window):
-                # 支撑位：局部最低点
-                if lows[i] == min(lows[i-window:i+window+1]):
-                    support_levels.append(lows[i])
+    return ctx.memo(('indicator', 'trend'), compute)
 
-                # 阻力位：局部最高点
-                if highs[i] == max(highs[i-window:i+window+1]):
-                    resistance_levels.append(highs[i])
+
+def analyze_edwards_trend(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
+    """罗伯特·D·爱德华兹股市趋势技术分析"""
+    ctx = as_context(data)
+    bars = ctx.bars
+    try:
+        close_prices = bars.close
+        high_prices = bars.high
+        low_prices = bars.low
+        volume = bars.volume
+
+        # 1. 趋势线分析：整段历史的20日滚动回归，取最后一个窗口
+        trend = trendline_series(ctx)
+        slope, correlation = trend["slope"][-1], trend["correlation"][-1]
+        trend_duration = 0
+        recent_changes = []
+        if np.isnan(slope):
+            slope, correlation = None, None
+            trend_direction, trend_strength = "数据不足", "弱"
+        else:
+            trend_direction, trend_strength = TREND_LABELS[int(trend["state"][-1])]
+
+            # 趋势状态的历史变化：当前状态持续的K线数和最近5次转变
+            states = trend["state"][TRENDLINE_WINDOW - 1:]
+            changes = state_changes(states)
+            trend_duration = len(states) - (int(changes[-1]) if len(changes) else 0)
+            recent = changes[-5:]
+            dates = bars.date_strings(recent + TRENDLINE_WINDOW - 1)
+            recent_changes = [
+                {"date": str(date), "from": trend_label(states[i - 1]), "to": trend_label(states[i])}
+                for i, date in zip(recent, dates)
+            ]
+
+        # 2. 支撑阻力位分析
+        def find_support_resistance(highs, lows, closes, window=10):
+            # 支撑位：局部最低点；阻力位：局部最高点
+            support_levels, resistance_levels = support_resistance_levels(highs, lows, window)
 
             # 取最近的关键位
             current_price = closes[-1]
-            nearby_support = [s for s in support_levels if s < current_price]
-            nearby_resistance = [r for r in resistance_levels if r > current_price]
+            nearby_support = support_levels[support_levels < current_price]
+            nearby_resistance = resistance_levels[resistance_levels > current_price]
 
-            key_support = max(nearby_support) if nearby_support else min(lows[-20:])
-            key_resistance = min(nearby_resistance) if nearby_resistance else max(highs[-20:])
+            key_support = nearby_support.max() if len(nearby_support) else min(lows[-20:])
+            key_resistance = nearby_resistance.min() if len(nearby_resistance) else max(highs[-20:])
 
             return key_support, key_resistance
 
@@ -735,7 +752,9 @@ def analyze_edwards_trend(data: pd.DataFrame) -> Dict[str, Any]:
             "pattern": pattern,
             "pattern_signal": pattern_signal,
             "volume_trend": volume_trend,
-            "analysis_confidence": "高" if abs(correlation or 0) > 0.7 else "中等" if abs(correlation or 0) > 0.3 else "低"
+            "analysis_confidence": "高" if abs(correlation or 0) > 0.7 else "中等" if abs(correlation or 0) > 0.3 else "低",
+            "trend_duration": trend_duration,
+            "trend_changes": recent_changes
         }
 
     except Exception as e:
@@ -750,36 +769,49 @@ def analyze_edwards_trend(data: pd.DataFrame) -> Dict[str, Any]:
             "pattern": "无明显形态",
             "pattern_signal": "neutral",
             "volume_trend": "正常",
-            "analysis_confidence": "中等"
+            "analysis_confidence": "中等",
+            "trend_duration": 0,
+            "trend_changes": []
         }
 
 
-def analyze_murphy_intermarket(data: pd.DataFrame) -> Dict[str, Any]:
-    """约翰·墨菲金融市场技术分析（市场间分析）"""
+def analyze_murphy_intermarket(data: Union[pd.DataFrame, Bars, IndicatorContext],
+                               benchmarks: Optional[Dict[str, Bars]] = None) -> Dict[str, Any]:
+    """约翰·墨菲金融市场技术分析（市场间分析）
+
+    benchmarks 为 {指数名称: 指数日K线}，第一项作为大盘基准；未提供时不做相对强度比较。
+    """
+    ctx = as_context(data)
+    bars = ctx.bars
     try:
-        close_prices = data['收盘'].values
-        high_prices = data['最高'].values
-        low_prices = data['最低'].values
-        volume = data['成交量'].values
+        close_prices = bars.close
+        high_prices = bars.high
+        low_prices = bars.low
+        volume = bars.volume
 
         # 1. 多时间框架分析
         def multi_timeframe_analysis(prices):
             if len(prices) < 60:
                 return "数据不足", "neutral", "neutral", "neutral"
 
+            # 与均线指标共用滚动均值，前一周期均值即 window 根之前的滚动均值
+            ma5 = ctx.rolling_mean('close', 5)
+            ma20 = ctx.rolling_mean('close', 20)
+            ma60 = ctx.rolling_mean('close', 60)
+
             # 短期趋势（5日）
-            short_ma = np.mean(prices[-5:])
-            short_prev = np.mean(prices[-10:-5])
+            short_ma = ma5[-1]
+            short_prev = ma5[-6]
             short_trend = "上升" if short_ma > short_prev else "下降"
 
             # 中期趋势（20日）
-            medium_ma = np.mean(prices[-20:])
-            medium_prev = np.mean(prices[-40:-20])
+            medium_ma = ma20[-1]
+            medium_prev = ma20[-21]
             medium_trend = "上升" if medium_ma > medium_prev else "下降"
 
             # 长期趋势（60日）
-            long_ma = np.mean(prices[-60:])
-            long_prev = np.mean(prices[-120:-60]) if len(prices) >= 120 else np.mean(prices[:-60])
+            long_ma = ma60[-1]
+            long_prev = ma60[-61] if len(prices) >= 120 else np.mean(prices[:-60])
             long_trend = "上升" if long_ma > long_prev else "下降"
 
             # 趋势一致性分析
@@ -826,31 +858,50 @@ def analyze_murphy_intermarket(data: pd.DataFrame) -> Dict[str, Any]:
 
         momentum_strength, momentum_signal, avg_momentum = momentum_analysis(close_prices)
 
-        # 3. 相对强度分析（与大盘比较，这里简化处理）
-        def relative_strength_analysis(prices):
-            if len(prices) < 20:
-                return "数据不足", 0
-
-            # 计算20日涨跌幅
-            price_change = (prices[-1] / prices[-20] - 1) * 100
-
-            # 模拟大盘涨跌幅（实际应该获取指数数据）
-            market_change = price_change * 0.8  # 假设个股表现略好于大盘
+        # 3. 相对强度分析（与指数比较：按日期对齐后计算涨跌幅差、相对强度比率、滚动贝塔和相关系数）
+        def rating_of(strength):
+            if strength > 5:
+                return "强于大盘"
+            elif strength > 0:
+                return "略强于大盘"
+            elif strength > -5:
+                return "略弱于大盘"
+            return "弱于大盘"
 
-            relative_strength = price_change - market_change
+        def optional_float(value):
+            return round(value, 4) if np.isfinite(value) else None
 
-            if relative_strength > 5:
-                rs_rating = "强于大盘"
-            elif relative_strength > 0:
-                rs_rating = "略强于大盘"
-            elif relative_strength > -5:
-                rs_rating = "略弱于大盘"
-            else:
-                rs_rating = "弱于大盘"
-
-            return rs_rating, float(relative_strength)
-
-        rs_rating, relative_strength = relative_strength_analysis(close_prices)
+        def relative_strength_analysis(prices):
+            if len(prices) < RS_PERIOD:
+                return "数据不足", 0, []
+            if not benchmarks:
+                return "无基准数据", 0, []
+
+            comparisons = []
+            for index_name, index_bars in benchmarks.items():
+                stats = compare_to_benchmark(prices, align_to(bars.dates, index_bars.dates, index_bars.close))
+                if stats is None:
+                    continue
+                comparisons.append({
+                    "name": index_name,
+                    "code": index_bars.symbol,
+                    "stock_change": round(stats['stock_change'], 2),
+                    "index_change": round(stats['benchmark_change'], 2),
+                    "relative_strength": round(stats['relative_strength'], 2),
+                    "rating": rating_of(stats['relative_strength']),
+                    "rs_ratio_change": round(stats['rs_ratio_change'], 2),
+                    "rs_trend": "走强" if stats['rs_above_mean'] else "走弱",
+                    "beta": optional_float(stats['beta']),
+                    "correlation": optional_float(stats['correlation'])
+                })
+
+            if not comparisons:
+                return "无基准数据", 0, []
+            # 第一个可比较的指数作为大盘基准
+            primary = comparisons[0]
+            return primary["rating"], float(primary["relative_strength"]), comparisons
+
+        rs_rating, relative_strength, benchmark_comparisons = relative_strength_analysis(close_prices)
 
         # 4. 市场结构分析
         def market_structure_analysis(highs, lows, closes):
@@ -907,6 +958,7 @@ def analyze_murphy_intermarket(data: pd.DataFrame) -> Dict[str, Any]:
             "avg_momentum": avg_momentum,
             "relative_strength_rating": rs_rating,
             "relative_strength": relative_strength,
+            "benchmarks": benchmark_comparisons,
             "market_structure": market_structure,
             "structure_signal": structure_signal,
             "overall_signal": overall_signal,
@@ -925,6 +977,7 @@ def analyze_murphy_intermarket(data: pd.DataFrame) -> Dict[str, Any]:
             "avg_momentum": 0,
             "relative_strength_rating": "与大盘同步",
             "relative_strength": 0,
+            "benchmarks": [],
             "market_structure": "震荡结构",
             "structure_signal": "neutral",
             "overall_signal": "neutral",
@@ -932,13 +985,22 @@ def analyze_murphy_intermarket(data: pd.DataFrame) -> Dict[str, Any]:
         }
 
 
-def analyze_japanese_candlestick(data: pd.DataFrame) -> Dict[str, Any]:
+def candlestick_pattern_masks(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """整段历史的蜡烛图形态扫描结果 {形态键: 布尔数组}"""
+    ctx = as_context(data)
+    bars = ctx.bars
+    return ctx.memo(('candlestick_patterns',), lambda: scan_patterns(bars.open, bars.high, bars.low, bars.close))
+
+
+def analyze_japanese_candlestick(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, Any]:
     """日本蜡烛图技术分析"""
+    ctx = as_context(data)
+    bars = ctx.bars
     try:
-        open_prices = data['开盘'].values
-        high_prices = data['最高'].values
-        low_prices = data['最低'].values
-        close_prices = data['收盘'].values
+        open_prices = bars.open
+        high_prices = bars.high
+        low_prices = bars.low
+        close_prices = bars.close
 
         if len(close_prices) < 5:
             return {
@@ -948,138 +1010,16 @@ def analyze_japanese_candlestick(data: pd.DataFrame) -> Dict[str, Any]:
                 "reversal_probability": "无",
                 "continuation_probability": "无",
                 "key_patterns": [],
-                "overall_sentiment": "neutral"
+                "overall_sentiment": "neutral",
+                "patterns_count": 0,
+                "pattern_history": {}
             }
 
-        # 获取最近几根K线
-        recent_open = open_prices[-5:]
-        recent_high = high_prices[-5:]
-        recent_low = low_prices[-5:]
-        recent_close = close_prices[-5:]
-
-        patterns_found = []
-
-        # 1. 单根K线形态识别
-        def identify_single_candle_patterns(o, h, l, c, index=-1):
-            patterns = []
-
-            # 当前K线数据
-            open_price = o[index]
-            high_price = h[index]
-            low_price = l[index]
-            close_price = c[index]
-
-            body = abs(close_price - open_price)
-            upper_shadow = high_price - max(open_price, close_price)
-            lower_shadow = min(open_price, close_price) - low_price
-            total_range = high_price - low_price
-
-            if total_range == 0:
-                return patterns
-
-            # 十字星
-            if body / total_range < 0.1:
-                patterns.append(("十字星", "reversal", "中等"))
-
-            # 锤子线/上吊线
-            elif (lower_shadow > body * 2 and upper_shadow < body * 0.5):
-                if close_price > open_price:
-                    patterns.append(("锤子线", "bullish", "强"))
-                else:
-                    patterns.append(("上吊线", "bearish", "强"))
-
-            # 射击之星/倒锤子
-            elif (upper_shadow > body * 2 and lower_shadow < body * 0.5):
-                if close_price < open_price:
-                    patterns.append(("射击之星", "bearish", "强"))
-                else:
-                    patterns.append(("倒锤子", "bullish", "中等"))
+        # 对整段历史一次性扫描全部形态，最后一根K线上的形态即当前形态
+        masks = candlestick_pattern_masks(ctx)
+        patterns_found = latest_patterns(masks)
 
-            # 长阳线/长阴线
-            elif body / total_range > 0.7:
-                if close_price > open_price:
-                    patterns.append(("长阳线", "bullish", "强"))
-                else:
-                    patterns.append(("长阴线", "bearish", "强"))
-
-            # 纺锤线
-            elif (upper_shadow > body and lower_shadow > body):
-                patterns.append(("纺锤线", "neutral", "弱"))
-
-            return patterns
-
-        # 2. 多根K线组合形态识别
-        def identify_multi_candle_patterns(o, h, l, c):
-            patterns = []
-
-            if len(c) < 3:
-                return patterns
-
-            # 早晨之星/黄昏之星（三根K线）
-            if len(c) >= 3:
-                first_body = abs(c[-3] - o[-3])
-                second_body = abs(c[-2] - o[-2])
-                third_body = abs(c[-1] - o[-1])
-
-                # 早晨之星
-                if (c[-3] < o[-3] and  # 第一根阴线
-                    second_body < first_body * 0.5 and  # 第二根小实体
-                    c[-1] > o[-1] and  # 第三根阳线
-                    c[-1] > (c[-3] + o[-3]) / 2):  # 第三根收盘价超过第一根中点
-                    patterns.append(("早晨之星", "bullish", "强"))
-
-                # 黄昏之星
-                elif (c[-3] > o[-3] and  # 第一根阳线
-                      second_body < first_body * 0.5 and  # 第二根小实体
-                      c[-1] < o[-1] and  # 第三根阴线
-                      c[-1] < (c[-3] + o[-3]) / 2):  # 第三根收盘价低于第一根中点
-                    patterns.append(("黄昏之星", "bearish", "强"))
-
-            # 吞没形态（两根K线）
-            if len(c) >= 2:
-                prev_body = abs(c[-2] - o[-2])
-                curr_body = abs(c[-1] - o[-1])
-
-                # 看涨吞没
-                if (c[-2] < o[-2] and  # 前一根阴线
-                    c[-1] > o[-1] and  # 当前阳线
-                    o[-1] < c[-2] and  # 当前开盘低于前收盘
-                    c[-1] > o[-2]):    # 当前收盘高于前开盘
-                    patterns.append(("看涨吞没", "bullish", "强"))
-
-                # 看跌吞没
-                elif (c[-2] > o[-2] and  # 前一根阳线
-                      c[-1] < o[-1] and  # 当前阴线
-                      o[-1] > c[-2] and  # 当前开盘高于前收盘
-                      c[-1] < o[-2]):    # 当前收盘低于前开盘
-                    patterns.append(("看跌吞没", "bearish", "强"))
-
-            # 乌云盖顶/刺透形态
-            if len(c) >= 2:
-                # 乌云盖顶
-                if (c[-2] > o[-2] and  # 前一根阳线
-                    c[-1] < o[-1] and  # 当前阴线
-                    o[-1] > h[-2] * 0.99 and  # 当前开盘接近前高点
-                    c[-1] < (c[-2] + o[-2]) / 2):  # 当前收盘低于前K线中点
-                    patterns.append(("乌云盖顶", "bearish", "强"))
-
-                # 刺透形态
-                elif (c[-2] < o[-2] and  # 前一根阴线
-                      c[-1] > o[-1] and  # 当前阳线
-                      o[-1] < l[-2] * 1.01 and  # 当前开盘接近前低点
-                      c[-1] > (c[-2] + o[-2]) / 2):  # 当前收盘高于前K线中点
-                    patterns.append(("刺透形态", "bullish", "强"))
-
-            return patterns
-
-        # 识别形态
-        single_patterns = identify_single_candle_patterns(recent_open, recent_high, recent_low, recent_close)
-        multi_patterns = identify_multi_candle_patterns(recent_open, recent_high, recent_low, recent_close)
-
-        all_patterns = single_patterns + multi_patterns
-        patterns_found = all_patterns
-
-        # 3. 综合分析
+        # 1. 综合分析
         if not patterns_found:
             current_pattern = "普通K线"
             pattern_signal = "neutral"
@@ -1091,7 +1031,7 @@ def analyze_japanese_candlestick(data: pd.DataFrame) -> Dict[str, Any]:
             pattern_signal = strongest_pattern[1]
             pattern_strength = strongest_pattern[2]
 
-        # 4. 反转和持续概率评估
+        # 2. 反转和持续概率评估
         bullish_patterns = [p for p in patterns_found if p[1] == "bullish"]
         bearish_patterns = [p for p in patterns_found if p[1] == "bearish"]
         reversal_patterns = [p for p in patterns_found if p[1] == "reversal"]
@@ -1109,7 +1049,7 @@ def analyze_japanese_candlestick(data: pd.DataFrame) -> Dict[str, Any]:
             reversal_probability = "反转概率较低"
             continuation_probability = "持续概率中等"
 
-        # 5. 整体情绪判断
+        # 3. 整体情绪判断
         if len(bullish_patterns) > len(bearish_patterns):
             overall_sentiment = "bullish"
         elif len(bearish_patterns) > len(bullish_patterns):
@@ -1125,7 +1065,9 @@ def analyze_japanese_candlestick(data: pd.DataFrame) -> Dict[str, Any]:
             "continuation_probability": continuation_probability,
             "key_patterns": [{"name": p[0], "signal": p[1], "strength": p[2]} for p in patterns_found[:3]],
             "overall_sentiment": overall_sentiment,
-            "patterns_count": len(patterns_found)
+            "patterns_count": len(patterns_found),
+            # 各形态在本股历史上的出现次数及之后1/5/10根K线的平均收益率、上涨概率
+            "pattern_history": pattern_statistics(masks, close_prices)
         }
 
     except Exception as e:
@@ -1138,5 +1080,48 @@ def analyze_japanese_candlestick(data: pd.DataFrame) -> Dict[str, Any]:
             "continuation_probability": "无法判断",
             "key_patterns": [],
             "overall_sentiment": "neutral",
-            "patterns_count": 0
+            "patterns_count": 0,
+            "pattern_history": {}
         }
+
+
+# 可输出完整序列的指标（图表接口使用）
+def sar_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """抛物线SAR完整序列（加速因子0.02，上限0.2）"""
+    ctx = as_context(data)
+    return ctx.memo(('indicator', 'sar'), lambda: {"sar": parabolic_sar(ctx.bars.high, ctx.bars.low)})
+
+
+def zigzag_series(data: Union[pd.DataFrame, Bars, IndicatorContext]) -> Dict[str, np.ndarray]:
+    """之字转向（5%）：转折点处为收盘价，其余位置为NaN"""
+    ctx = as_context(data)
+
+    def compute():
+        close = ctx.bars.close
+        pivots = zigzag(close, 0.05)
+        return {"zigzag": np.where(pivots != 0, close, np.nan), "pivot": pivots.astype(np.float64)}
+
+    return ctx.memo(('indicator', 'zigzag'), compute)
+
+
+SERIES_INDICATORS = {
+    "macd": macd_series,
+    "kdj": kdj_series,
+    "rsi": rsi_series,
+    "boll": bollinger_series,
+    "wr": williams_r_series,
+    "ma": moving_average_series,
+    "sar": sar_series,
+    "zigzag": zigzag_series,
+    "trend": trendline_series
+}
+
+
+def indicator_series(data: Union[pd.DataFrame, Bars, IndicatorContext], names=None) -> Dict[str, Dict[str, np.ndarray]]:
+    """按名称计算多个指标的完整序列，与单值指标共用同一个计算上下文"""
+    ctx = as_context(data)
+    names = list(SERIES_INDICATORS) if names is None else names
+    unknown = [name for name in names if name not in SERIES_INDICATORS]
+    if unknown:
+        raise ValueError(f"Unsupported indicators: {', '.join(unknown)}")
+    return {name: SERIES_INDICATORS[name](ctx) for name in names}